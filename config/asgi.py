@@ -0,0 +1,27 @@
+"""
+ASGI config for inventory_manager project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+from django.core.asgi import get_asgi_application
+
+# Establece el módulo de configuración de Django por defecto
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+# Con ASGI los listados y detalles de la API se sirven con las vistas asíncronas
+# (inventory_app/async_views.py); las escrituras siguen en los ViewSets
+os.environ.setdefault('ASYNC_API_READS', '1')
+
+# Obtiene la aplicación ASGI para el proyecto
+application = get_asgi_application()
+
+# Ejecutar con un servidor ASGI, con el mismo número de workers que la WSGI:
+# gunicorn config.asgi:application -k uvicorn.workers.UvicornWorker -w 4
+#
+# Comparar ambos despliegues con:
+# python manage.py benchmark_load --url http://127.0.0.1:8000/api/dashboard/stats/
@@ -0,0 +1,69 @@
+"""
+Configuración de gunicorn para producción:
+
+    gunicorn -c config/gunicorn.conf.py
+
+La aplicación se carga en el proceso maestro (``preload_app``) y se calienta
+allí antes de crear los workers (ver ``inventory_app.utils.warmup``): cada
+worker nace con las plantillas compiladas, las URLs resueltas y las cachés
+de conteos listas, y comparte esa memoria con el maestro (copy-on-write).
+También los que sustituyen a los reciclados por ``max_requests``.
+
+``manage.py benchmark_first_request`` mide la primera petición de un proceso
+con y sin calentamiento.
+"""
+import gc
+import multiprocessing
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.production')
+
+wsgi_app = 'config.wsgi:application'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 2))
+preload_app = True
+
+# Reciclar workers de forma escalonada (fugas de memoria de dependencias)
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+# Los registros de la aplicación van por LOGGING; gunicorn solo los suyos
+accesslog = None
+errorlog = '-'
+
+# Desactivar con WARMUP=0 (por ejemplo, para depurar un arranque)
+warmup = os.environ.get('WARMUP', '1') != '0'
+
+
+def when_ready(server):
+    """Maestro, con la aplicación ya cargada y antes de crear los workers."""
+    if not warmup:
+        return
+    from inventory_app.utils.warmup import warm_up
+
+    summary = warm_up()
+    server.log.info('Warm-up finished in %ss: %s', summary['seconds'], summary)
+    # Lo cargado hasta aquí no lo revisará el recolector de cíclicos: si no,
+    # cada recolección en un worker tocaría esas páginas y rompería el
+    # copy-on-write
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Por si algo abrió una conexión en el maestro después del calentamiento:
+    # cada worker abre las suyas
+    from django.db import connections
+
+    for connection in connections.all(initialized_only=True):
+        connection.connection = None  # sin cerrarla: el socket es del maestro
+
+
+def worker_exit(server, worker):
+    # Las series desde el último volcado no se pierden al reciclar el worker
+    from inventory_app.utils import metrics
+
+    metrics.flush_worker()
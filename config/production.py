@@ -23,13 +23,28 @@ DATABASES = {
     )
 }
 
-# Configuración de archivos estáticos
+# Configuración de archivos estáticos: los sirve WhiteNoiseMiddleware desde
+# STATIC_ROOT. collectstatic deja cada fichero con su hash en el nombre y
+# precomprimido (.gz y, con Brotli instalado, .br), así que no se comprime por
+# petición y los nombres con hash van con "Cache-Control: immutable"
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+WHITENOISE_KEEP_ONLY_HASHED_FILES = True
+MIDDLEWARE = list(MIDDLEWARE)
+MIDDLEWARE.insert(
+    MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1,
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+)
 
-# Configuración de medios
+# Configuración de medios: los sirve la vista ``media`` (nunca se indexa el
+# directorio al arrancar). Con nginx delante, SENDFILE_BACKEND=x-accel-redirect
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
+SENDFILE_BACKEND = config('SENDFILE_BACKEND', default='')
+
+# Sesiones: sin consulta a la base de datos en cada petición
+SESSION_PROFILE = config('SESSION_PROFILE', default='cached_db')
+SESSION_ENGINE = SESSION_PROFILES[SESSION_PROFILE]
 
 # Configuración de seguridad
 SECURE_SSL_REDIRECT = True
@@ -49,26 +64,38 @@ EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=True, cast=bool)
 EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='noreply@tuempresa.com')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 
-# Logging en producción
+# Logging en producción: registros JSON encolados (ver
+# ``inventory_app.utils.request_logging``). La escritura y la rotación del
+# fichero ocurren en un hilo aparte, nunca en el de la petición
+LOG_DIR = config('LOG_DIR', default=os.path.join(BASE_DIR, 'logs'))
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
-    'handlers': {
-        'file': {
-            'level': 'ERROR',
-            'class': 'logging.FileHandler',
-            'filename': os.path.join(BASE_DIR, 'logs', 'django.log'),
+    'filters': {
+        'request_context': {
+            '()': 'inventory_app.utils.request_logging.RequestContextFilter',
         },
-        'console': {
-            'level': 'ERROR',
-            'class': 'logging.StreamHandler',
+    },
+    'handlers': {
+        'queue': {
+            'class': 'inventory_app.utils.request_logging.JsonQueueHandler',
+            'filters': ['request_context'],
+            'filename': os.path.join(LOG_DIR, 'django.log'),
+            'max_bytes': config('LOG_MAX_BYTES', default=50 * 1024 * 1024, cast=int),
+            'backup_count': config('LOG_BACKUP_COUNT', default=5, cast=int),
+            'queue_size': config('LOG_QUEUE_SIZE', default=10000, cast=int),
         },
     },
     'loggers': {
         'django': {
-            'handlers': ['file', 'console'],
+            'handlers': ['queue'],
             'level': 'ERROR',
-            'propagate': True,
+            'propagate': False,
+        },
+        'inventory_app': {
+            'handlers': ['queue'],
+            'level': config('LOG_LEVEL', default='INFO'),
+            'propagate': False,
         },
     },
 }
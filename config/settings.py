@@ -23,14 +23,20 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'inventory_app.middleware.MetricsMiddleware',
+    'inventory_app.middleware.RequestLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'inventory_app.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'inventory_app.middleware.CompanyUserMiddleware',
+    'inventory_app.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'inventory_app.middleware.QueryWorkloadMiddleware',
+    'inventory_app.middleware.QueryInspectionMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -94,6 +100,15 @@ STATICFILES_FINDERS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Media y backups se sirven desde las vistas (inventory_app.utils.file_serving),
+# en streaming y con Range. Con SENDFILE_BACKEND los envía el servidor web:
+#   'x-accel-redirect'  nginx: ubicaciones internas MEDIA_ACCEL_PREFIX y
+#                       BACKUP_ACCEL_PREFIX que apunten a MEDIA_ROOT y BACKUP_PATH
+#   'x-sendfile'        Apache (mod_xsendfile) o lighttpd: la ruta absoluta
+SENDFILE_BACKEND = os.environ.get('SENDFILE_BACKEND', '')
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+BACKUP_ACCEL_PREFIX = '/protected-backups/'
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_REDIRECT_URL = '/dashboard/'
@@ -103,6 +118,92 @@ LOGIN_URL = '/accounts/login/'
 # Configuración de email (opcional para desarrollo)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+# Captura de la carga SQL para el asesor de índices (manage.py index_advisor)
+# Ejemplo: QUERY_WORKLOAD_LOG=logs/query_workload.jsonl
+QUERY_WORKLOAD_LOG = os.environ.get('QUERY_WORKLOAD_LOG')
+QUERY_WORKLOAD_SAMPLE_RATE = float(os.environ.get('QUERY_WORKLOAD_SAMPLE_RATE', '1.0'))
+
+# Presupuestos de consultas y detección de N+1 (inventory_app.utils.query_budget):
+# fracción de peticiones inspeccionadas; las infracciones se registran en el
+# logger 'inventory_app.queries' (en los tests son errores)
+QUERY_INSPECTION_SAMPLE_RATE = float(os.environ.get('QUERY_INSPECTION_SAMPLE_RATE', '0.01'))
+QUERY_INSPECTION_RAISE = False
+
+# Lecturas asíncronas de la API (listados y detalles); lo activa config/asgi.py
+ASYNC_API_READS = os.environ.get('ASYNC_API_READS') == '1'
+
+# Tokens firmados de la API: validez (s) y recarga de la lista de revocados y
+# de las versiones de credenciales en caché (s): un token revocado puede
+# aceptarse en otros workers hasta ese tiempo
+API_TOKEN_TTL = 12 * 3600
+API_TOKEN_REVOCATION_REFRESH = 30
+
+# Respuestas de texto/JSON a partir de este tamaño se comprimen (gzip o brotli)
+COMPRESSION_MIN_SIZE = 1024
+
+# Cachés: 'default' vive en la memoria de cada proceso; 'shared' está en disco
+# y la comparten todos los workers de gunicorn (respuestas cacheadas de la API
+# y contadores de generación por tabla que las invalidan)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('SHARED_CACHE_DIR', os.path.join(BASE_DIR, 'cache')),
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+SHARED_CACHE_ALIAS = 'shared'
+API_RESPONSE_CACHE_TIMEOUT = int(os.environ.get('API_RESPONSE_CACHE_TIMEOUT', '300'))
+
+# Almacenamiento de sesiones (SESSION_PROFILE):
+#   db              una consulta por petición autenticada (por defecto de Django)
+#   cached_db       lecturas desde la caché 'sessions', común a los workers; la
+#                   base de datos solo al escribir o si la entrada no está
+#   signed_cookies  la sesión viaja firmada en la cookie, sin consultas; tamaño
+#                   limitado a SESSION_COOKIE_MAX_SIZE (ver inventory_app.sessions)
+SESSION_PROFILES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'inventory_app.sessions',
+}
+SESSION_PROFILE = os.environ.get('SESSION_PROFILE', 'db')
+SESSION_ENGINE = SESSION_PROFILES[SESSION_PROFILE]
+SESSION_CACHE_ALIAS = 'sessions'
+SESSION_COOKIE_MAX_SIZE = 3800
+CACHES['sessions'] = {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.path.join(CACHES['shared']['LOCATION'], 'sessions'),
+    'TIMEOUT': None,  # cached_db guarda cada sesión con su propia caducidad
+    'OPTIONS': {'MAX_ENTRIES': 20000},
+}
+
+# Throttling de la API: tabla de cubetas mapeada en memoria, común a los workers
+THROTTLE_TABLE_PATH = os.environ.get(
+    'THROTTLE_TABLE_PATH', os.path.join(CACHES['shared']['LOCATION'], 'throttle.bin')
+)
+
+# Métricas de peticiones para /metrics: un fichero por worker de gunicorn,
+# volcado cada METRICS_FLUSH_INTERVAL segundos (vacío desactiva las métricas).
+# METRICS_TOKEN permite a Prometheus leerlas con "Authorization: Bearer ..."
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(CACHES['shared']['LOCATION'], 'metrics'))
+METRICS_FLUSH_INTERVAL = 10
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Perfilado bajo demanda (X-Profile: 1 o ?_profile=1, solo administradores):
+# se guardan los PROFILE_RING_SIZE perfiles más recientes, visibles en
+# /admin/profiles/. Vacío desactiva el perfilado
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(CACHES['shared']['LOCATION'], 'profiles'))
+PROFILE_RING_SIZE = 50
+PROFILE_SAMPLE_INTERVAL = 0.005
+
+# Arranque en frío de un worker (django.setup() y URLconf), comprobado por
+# "manage.py profile_startup" y por los tests. Hoy ronda los 450 ms: pandas o
+# reportlab importados al arrancar lo superarían
+STARTUP_BUDGET_MS = 1500
+
 # Backup configuration
 BACKUP_PATH = os.path.join(BASE_DIR, 'backups')
 if not os.path.exists(BACKUP_PATH):
@@ -116,20 +217,30 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
-        # 'rest_framework.authentication.TokenAuthentication',  # Opcional para APIs externas
+        # Tokens firmados de api/v1/auth-token/: sin consultas ni hash por petición
+        'inventory_app.authentication.SignedTokenAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'inventory_app.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'inventory_app.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     
     # Configuración de throttling
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'inventory_app.throttling.SharedAnonRateThrottle',
+        'inventory_app.throttling.SharedUserRateThrottle'
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/day',
@@ -0,0 +1,32 @@
+"""
+Configuración para los tests; ``manage.py test`` la usa por defecto.
+Hereda de settings.py: los tests no deben ver respuestas, generaciones,
+sesiones, cubetas, métricas ni perfiles de ejecuciones anteriores, ni dejar
+nada en disco al terminar.
+"""
+
+from .settings import *
+import atexit
+import os
+import shutil
+import tempfile
+
+CACHES['shared'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'shared',
+}
+CACHES['sessions'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'sessions',
+}
+
+# Ficheros de estado en un directorio temporal que se borra al salir
+TEST_STATE_DIR = tempfile.mkdtemp(prefix='inventory-tests-')
+atexit.register(shutil.rmtree, TEST_STATE_DIR, ignore_errors=True)
+THROTTLE_TABLE_PATH = os.path.join(TEST_STATE_DIR, 'throttle.bin')
+METRICS_DIR = os.path.join(TEST_STATE_DIR, 'metrics')
+PROFILE_DIR = os.path.join(TEST_STATE_DIR, 'profiles')
+
+# Toda la suite comprueba los presupuestos de consultas de las vistas
+QUERY_INSPECTION_SAMPLE_RATE = 1.0
+QUERY_INSPECTION_RAISE = True
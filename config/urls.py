@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from django.contrib.auth import views as auth_views
@@ -9,6 +10,8 @@ urlpatterns = [
     path('admin/', custom_admin_site.urls),
     path('', views.dashboard, name='dashboard'),
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('metrics', views.metrics, name='metrics'),
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", views.media, name='media'),
     
     # URLs de autenticación estándar
     path('accounts/login/', auth_views.LoginView.as_view(template_name='registration/login.html'), name='login'),
@@ -16,17 +16,9 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 # Obtiene la aplicación WSGI para el proyecto
 application = get_wsgi_application()
 
-# Configuración adicional para producción
-# Puedes agregar middleware adicional aquí si es necesario
-
-# Ejemplo: Middleware para manejar errores en producción
-try:
-    from whitenoise import WhiteNoise
-    application = WhiteNoise(application, root=os.path.join(os.path.dirname(__file__), '..', 'staticfiles'))
-    application.add_files(os.path.join(os.path.dirname(__file__), '..', 'media'), prefix='media/')
-except ImportError:
-    # WhiteNoise no está instalado, continuar sin él
-    pass
+# Los estáticos los sirve WhiteNoiseMiddleware (ver config/production.py) y
+# los media la vista ``media``: aquí no se envuelve la aplicación ni se
+# recorre ningún directorio al arrancar cada worker
 
 # Ejemplo: Configuración para servir archivos estáticos en producción
 # Asegúrate de que los archivos estáticos estén recogidos con: python manage.py collectstatic
@@ -42,7 +34,7 @@ except ImportError:
 # 3. Configurar base de datos PostgreSQL para producción
 # 4. Configurar archivos estáticos: python manage.py collectstatic
 # 5. Configurar Gunicorn: pip install gunicorn
-# 6. Ejecutar con: gunicorn config.wsgi:application
+# 6. Ejecutar con: gunicorn -c config/gunicorn.conf.py
 
 # Nota: Para desarrollo, usa el servidor integrado de Django:
 # python manage.py runserver
\ No newline at end of file
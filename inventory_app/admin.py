@@ -2,13 +2,20 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import path
 from django.shortcuts import render
-from django.http import HttpResponseRedirect
+from django.http import Http404, HttpResponseRedirect
 from django.contrib import messages
-from django.db.models import Count, Sum, Q
+from django.db.models import Count, OuterRef, Subquery, Sum, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
 import csv
-from .models import Equipment, MaintenanceLog, CompanyUser, AuditLog, SupportTicket, Component
+from collections import Counter
+from .models import Equipment, MaintenanceLog, CompanyUser, AuditLog, SupportTicket, Component, Location, LocationRollup
+from .utils import profiling
+from .utils.bulk_actions import AuditEntry, run_bulk_action
+from .utils.counting import EstimatedCountAdminMixin
+from .utils.facets import facet_values
+from .utils.locations import adjust_rollups, equipment_rollup_key
+from .utils.sync import record_changes
 
 # =============================================================================
 # FILTROS PERSONALIZADOS
@@ -68,6 +75,27 @@ class MaintenanceStatusFilter(admin.SimpleListFilter):
                 maintenance_logs__start_date__gt=timezone.now() - timedelta(days=30)
             ).distinct()
 
+class FacetListFilter(admin.SimpleListFilter):
+    """Filtro cuyas opciones salen de la caché de facetas (sin DISTINCT por petición)"""
+    model = None
+    field_name = None
+
+    def lookups(self, request, model_admin):
+        return [
+            (value, f'{value} ({count})')
+            for value, count in facet_values(self.model, self.field_name)
+        ]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.field_name: self.value()})
+
+class LocationFilter(FacetListFilter):
+    title = 'Ubicación'
+    parameter_name = 'location'
+    model = Equipment
+    field_name = 'location'
+
 # =============================================================================
 # ACTION PERSONALIZADAS
 # =============================================================================
@@ -110,32 +138,75 @@ export_to_excel.short_description = "Exportar equipos seleccionados a Excel"
 
 def mark_for_maintenance(modeladmin, request, queryset):
     """Marcar equipos para mantenimiento preventivo"""
-    for equipment in queryset:
-        MaintenanceLog.objects.create(
-            equipment=equipment,
-            maintenance_type='PRE',
-            title='Mantenimiento Preventivo Programado',
-            description='Mantenimiento preventivo marcado desde el panel administrativo',
-            technician=CompanyUser.objects.first(),  # Técnico por defecto
-            start_date=timezone.now(),
-            priority='MED'
-        )
-    messages.success(request, f'{queryset.count()} equipos marcados para mantenimiento preventivo')
+    now = timezone.now()
+
+    def process_chunk(equipments, technician):
+        logs = MaintenanceLog.objects.bulk_create([
+            MaintenanceLog(
+                equipment=equipment,
+                maintenance_type='PRE',
+                title='Mantenimiento Preventivo Programado',
+                description='Mantenimiento preventivo marcado desde el panel administrativo',
+                technician=technician,  # Técnico resuelto una sola vez
+                start_date=now,
+                priority='MED'
+            )
+            for equipment in equipments
+        ])
+        record_changes(MaintenanceLog, [log.pk for log in logs])
+        return [
+            AuditEntry('CRE', 'MaintenanceLog', log.pk, f"Mantenimiento preventivo programado: {log.equipment}")
+            for log in logs
+        ]
+
+    result = run_bulk_action(request, queryset, process_chunk, touched_models=[MaintenanceLog])
+    messages.success(request, f'{result.processed} equipos marcados para mantenimiento preventivo ({result})')
 
 mark_for_maintenance.short_description = "Marcar para mantenimiento preventivo"
 
 def bulk_status_update(modeladmin, request, queryset):
     """Actualización masiva de estado de equipos"""
-    if request.method == 'POST':
-        new_status = request.POST.get('new_status')
-        if new_status:
-            updated = queryset.update(status=new_status)
-            messages.success(request, f'{updated} equipos actualizados al estado: {new_status}')
-            return HttpResponseRedirect(request.get_full_path())
+    status_labels = dict(Equipment.STATUS_CHOICES)
+    new_status = request.POST.get('new_status')
+
+    if new_status in status_labels:
+        now = timezone.now()
+
+        def process_chunk(equipments, actor):
+            changed = [equipment for equipment in equipments if equipment.status != new_status]
+            entries = [
+                AuditEntry(
+                    'STA', 'Equipment', equipment.id,
+                    f"Estado cambiado de {equipment.get_status_display()} a {status_labels[new_status]}"
+                )
+                for equipment in changed
+            ]
+            # bulk_update no dispara señales: ajustar aquí los conteos por ubicación
+            rollup_deltas = Counter()
+            for equipment in changed:
+                rollup_deltas[equipment_rollup_key(equipment)] -= 1
+                equipment.status = new_status
+                equipment.updated_at = now  # bulk_update no aplica auto_now
+                rollup_deltas[equipment_rollup_key(equipment)] += 1
+            Equipment.objects.bulk_update(changed, ['status', 'updated_at'])
+            adjust_rollups(rollup_deltas)
+            record_changes(Equipment, [equipment.pk for equipment in changed])
+            return entries
+
+        result = run_bulk_action(request, queryset, process_chunk, touched_models=[LocationRollup])
+        messages.success(request, f'{result.processed} equipos actualizados al estado: {status_labels[new_status]} ({result})')
+        return HttpResponseRedirect(request.get_full_path())
     
     return render(request, 'admin/bulk_status_update.html', {
+        **modeladmin.admin_site.each_context(request),
+        'title': 'Actualizar estado de equipos',
+        'opts': modeladmin.model._meta,
         'equipments': queryset,
-        'status_choices': Equipment.STATUS_CHOICES
+        'equipment_count': queryset.count(),
+        'select_across': request.POST.get('select_across') == '1',
+        'selected_ids': request.POST.getlist(admin.helpers.ACTION_CHECKBOX_NAME),
+        'status_choices': Equipment.STATUS_CHOICES,
+        'action_checkbox_name': admin.helpers.ACTION_CHECKBOX_NAME,
     })
 
 bulk_status_update.short_description = "Actualizar estado de equipos seleccionados"
@@ -145,14 +216,14 @@ bulk_status_update.short_description = "Actualizar estado de equipos seleccionad
 # =============================================================================
 
 @admin.register(Equipment)
-class EquipmentAdmin(admin.ModelAdmin):
+class EquipmentAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     list_display = [
         'serial_number', 'brand_model', 'type_display', 'location', 
         'status_badge', 'assigned_to_display', 'warranty_status', 
         'last_maintenance', 'created_ago'
     ]
     list_filter = [
-        'type', 'status', 'location', 'purchase_date', 
+        'type', 'status', LocationFilter, 'purchase_date', 
         WarrantyStatusFilter, MaintenanceStatusFilter
     ]
     search_fields = ['serial_number', 'brand', 'model', 'location', 'notes']
@@ -218,10 +289,20 @@ class EquipmentAdmin(admin.ModelAdmin):
         return '—'
     warranty_status.short_description = 'Garantía'
     
+    def get_queryset(self, request):
+        # Columnas del listado sin una consulta por fila. Una subconsulta y no
+        # un Max() sobre el JOIN: no agrupa toda la tabla y solo se evalúa
+        # para las filas de la página (salvo al ordenar por esa columna)
+        last_start = MaintenanceLog.objects.filter(equipment=OuterRef('pk')).order_by('-start_date')
+        return super().get_queryset(request).select_related('assigned_to__user').annotate(
+            last_maintenance_date=Subquery(last_start.values('start_date')[:1])
+        )
+    
     def last_maintenance(self, obj):
-        last = obj.maintenance_logs.order_by('-start_date').first()
-        return last.start_date.strftime('%d/%m/%Y') if last else '—'
+        last = obj.last_maintenance_date
+        return last.strftime('%d/%m/%Y') if last else '—'
     last_maintenance.short_description = 'Último Mantenimiento'
+    last_maintenance.admin_order_field = 'last_maintenance_date'
     
     def created_ago(self, obj):
         delta = timezone.now() - obj.created_at
@@ -239,7 +320,7 @@ class EquipmentAdmin(admin.ModelAdmin):
     equipment_qr.short_description = 'Código QR'
 
 @admin.register(MaintenanceLog)
-class MaintenanceLogAdmin(admin.ModelAdmin):
+class MaintenanceLogAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     list_display = [
         'equipment_display', 'maintenance_type_badge', 'title_short', 
         'technician_display', 'start_date', 'duration', 'cost_display', 
@@ -292,7 +373,7 @@ class MaintenanceLogAdmin(admin.ModelAdmin):
     priority_badge.short_description = 'Prioridad'
 
 @admin.register(SupportTicket)
-class SupportTicketAdmin(admin.ModelAdmin):
+class SupportTicketAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     list_display = [
         'id', 'title_short', 'priority_badge', 'status_badge', 
         'created_by_display', 'assigned_to_display', 'created_ago', 
@@ -352,6 +433,29 @@ class SupportTicketAdmin(admin.ModelAdmin):
         return '—'
     equipment_link.short_description = 'Equipo'
 
+@admin.register(AuditLog)
+class AuditLogAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
+    list_display = ['timestamp', 'user', 'action', 'model_name', 'object_id', 'ip_address']
+    list_filter = ['action', 'model_name']
+    list_select_related = ['user__user']
+    search_fields = ['details']
+
+@admin.register(Location)
+class LocationAdmin(admin.ModelAdmin):
+    list_display = ['path', 'name', 'level', 'depth', 'equipment_total']
+    list_filter = ['level']
+    search_fields = ['name', 'path']
+    readonly_fields = ['path', 'depth']
+    
+    def get_queryset(self, request):
+        # Conteo de subárbol precalculado, sin recorrer los equipos
+        return super().get_queryset(request).annotate(equipment_total=Sum('rollups__count'))
+    
+    def equipment_total(self, obj):
+        return obj.equipment_total or 0
+    equipment_total.short_description = 'Equipos (subárbol)'
+    equipment_total.admin_order_field = 'equipment_total'
+
 # =============================================================================
 # DASHBOARD ADMINISTRATIVO PERSONALIZADO
 # =============================================================================
@@ -367,6 +471,8 @@ class CustomAdminSite(admin.AdminSite):
             path('dashboard/', self.admin_view(self.custom_dashboard), name='custom_dashboard'),
             path('reports/', self.admin_view(self.custom_reports), name='custom_reports'),
             path('analytics/', self.admin_view(self.analytics_dashboard), name='analytics_dashboard'),
+            path('profiles/', self.admin_view(self.profile_list), name='profile_list'),
+            path('profiles/<str:profile_id>/', self.admin_view(self.profile_detail), name='profile_detail'),
         ]
         return custom_urls + urls
     
@@ -412,6 +518,30 @@ class CustomAdminSite(admin.AdminSite):
         }
         return render(request, 'admin/analytics_dashboard.html', context)
     
+    def profile_list(self, request):
+        # Perfiles bajo demanda (X-Profile: 1 o ?_profile=1), ver utils.profiling
+        context = {
+            **self.each_context(request),
+            'title': 'Perfiles de peticiones',
+            'profiles': profiling.list_profiles(),
+            'ring_size': profiling.ring_size(),
+        }
+        return render(request, 'admin/profile_list.html', context)
+    
+    def profile_detail(self, request, profile_id):
+        profile = profiling.load_profile(profile_id)
+        if profile is None:
+            raise Http404('Perfil no encontrado (puede haber salido del anillo)')
+        order = 'total' if request.GET.get('order') == 'total' else 'self'
+        context = {
+            **self.each_context(request),
+            'title': f"Perfil de {profile['method']} {profile['path']}",
+            'profile': profile,
+            'order': order,
+            'functions': sorted(profile['functions'], key=lambda row: row[order], reverse=True),
+        }
+        return render(request, 'admin/profile_detail.html', context)
+    
     def generate_alerts(self):
         alerts = []
         today = timezone.now().date()
@@ -462,5 +592,6 @@ custom_admin_site.register(Equipment, EquipmentAdmin)
 custom_admin_site.register(MaintenanceLog, MaintenanceLogAdmin)
 custom_admin_site.register(SupportTicket, SupportTicketAdmin)
 custom_admin_site.register(CompanyUser)
-custom_admin_site.register(AuditLog)
-custom_admin_site.register(Component)
\ No newline at end of file
+custom_admin_site.register(AuditLog, AuditLogAdmin)
+custom_admin_site.register(Component)
+custom_admin_site.register(Location, LocationAdmin)
\ No newline at end of file
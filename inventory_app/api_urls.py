@@ -1,7 +1,10 @@
-from django.urls import path, include
+from django.conf import settings
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
-from rest_framework.authtoken import views as authtoken_views
-from .api_views import EquipmentViewSet, MaintenanceLogViewSet, SupportTicketViewSet
+from .api_views import (
+    EquipmentViewSet, MaintenanceLogViewSet, SupportTicketViewSet, ObtainSignedToken,
+    batch_requests, revoke_auth_token, sync_changes,
+)
 
 router = DefaultRouter()
 router.register(r'equipment', EquipmentViewSet, basename='equipment')
@@ -13,9 +16,27 @@ urlpatterns = [
     # Endpoints principales
     path('api/v1/', include((router.urls, 'api'), namespace='api_v1')),
     
-    # Autenticación por tokens (opcional)
-    path('api/v1/auth-token/', authtoken_views.obtain_auth_token, name='api_token_auth'),
+    # Sincronización incremental para clientes sin conexión
+    path('api/v1/sync/', sync_changes, name='api_sync'),
+    
+    # Varias peticiones en una sola llamada
+    path('api/v1/batch/', batch_requests, name='api_batch'),
+    
+    # Autenticación por tokens firmados (Authorization: Bearer <token>)
+    path('api/v1/auth-token/', ObtainSignedToken.as_view(), name='api_token_auth'),
+    path('api/v1/auth-token/revoke/', revoke_auth_token, name='api_token_revoke'),
     
     # Documentación (futura)
     # path('api/v1/docs/', include_docs_urls(title='Inventory API')),
-]
\ No newline at end of file
+]
+
+# Despliegue ASGI: lectura asíncrona de listados y detalles (ver async_views)
+if settings.ASYNC_API_READS:
+    from .async_views import EquipmentAsyncReadView, MaintenanceAsyncReadView
+    
+    urlpatterns = [
+        path('api/v1/equipment/', EquipmentAsyncReadView.as_view()),
+        re_path(r'^api/v1/equipment/(?P<pk>[^/.]+)/$', EquipmentAsyncReadView.as_view(detail=True)),
+        path('api/v1/maintenance/', MaintenanceAsyncReadView.as_view()),
+        re_path(r'^api/v1/maintenance/(?P<pk>[^/.]+)/$', MaintenanceAsyncReadView.as_view(detail=True)),
+    ] + urlpatterns
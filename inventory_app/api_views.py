@@ -1,35 +1,55 @@
 from rest_framework import viewsets, permissions, filters
-from rest_framework.decorators import action
+from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.decorators import action, api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
+from rest_framework import status
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
-from .models import Equipment, MaintenanceLog, CompanyUser, SupportTicket
+from .authentication import SignedTokenAuthentication, issue_token, revoke_token
+from .models import AuditLog, Equipment, MaintenanceLog, CompanyUser, SupportTicket
 from .serializers import EquipmentSerializer, MaintenanceLogSerializer, SupportTicketSerializer
+from .utils.bulk_api import BULK_MAX_ITEMS, BULK_MAX_REPEATS, EquipmentBulkWriter
+from .utils.conditional import ConditionalRequestMixin
+from .utils.counting import bump_table_generation
+from .utils.facets import facet_counts
+from .utils.fast_serializers import FastListMixin
+from .utils.locations import subtree_q
+from .utils.response_cache import ResponseCacheMixin, cache_response
+from .utils import sync
+from .utils.batch import BatchExecutor, InvalidBatch, parse_operations
+from .utils.query_budget import UNLIMITED, query_budget
+from .utils.sync import record_changes
 
-# Definir la función helper FUERA de las clases
-def get_or_create_companyuser(user):
-    """
-    Obtener el CompanyUser asociado a un usuario, o crearlo si no existe
-    """
-    try:
-        return user.companyuser
-    except CompanyUser.DoesNotExist:
-        # Crear un CompanyUser por defecto
-        company_user = CompanyUser.objects.create(
-            user=user,
-            department='IT',
-            phone='000-000-0000',
-            email=f'{user.username}@tuempresa.com'
-        )
-        return company_user
+def bulk_response(summary):
+    """201/200 si todo se escribió, 207 si hubo errores parciales y 400 si ninguno"""
+    written = summary['created'] + summary['updated']
+    if not summary['errors']:
+        code = status.HTTP_201_CREATED if summary['created'] else status.HTTP_200_OK
+    elif written:
+        code = status.HTTP_207_MULTI_STATUS
+    else:
+        code = status.HTTP_400_BAD_REQUEST
+    return Response(summary, status=code)
+
+def get_bulk_items(request):
+    """Lista de elementos del cuerpo de una petición masiva"""
+    items = request.data
+    if not isinstance(items, list):
+        return None, Response({'error': 'Se esperaba una lista de objetos'}, status=400)
+    if len(items) > BULK_MAX_ITEMS:
+        return None, Response({'error': f'Máximo {BULK_MAX_ITEMS} elementos por petición'}, status=400)
+    return items, None
 
-class EquipmentViewSet(viewsets.ModelViewSet):
+@query_budget(max_queries=10)
+class EquipmentViewSet(ConditionalRequestMixin, ResponseCacheMixin, FastListMixin, viewsets.ModelViewSet):
     """
     API endpoint para gestionar equipos
     """
     queryset = Equipment.objects.all()
     serializer_class = EquipmentSerializer
+    fast_serializer_class = EquipmentSerializer
+    response_cache_models = (Equipment, CompanyUser)
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['type', 'status', 'location']
@@ -38,7 +58,7 @@ class EquipmentViewSet(viewsets.ModelViewSet):
     ordering = ['-created_at']
     
     def get_queryset(self):
-        queryset = super().get_queryset().select_related('assigned_to')
+        queryset = super().get_queryset().select_related('assigned_to__user')
         
         query = self.request.query_params.get('q')
         if query:
@@ -48,6 +68,10 @@ class EquipmentViewSet(viewsets.ModelViewSet):
                 models.Q(serial_number__icontains=query) |
                 models.Q(location__icontains=query)
             )
+        
+        location_path = self.request.query_params.get('location_path')
+        if location_path:
+            queryset = queryset.filter(subtree_q(location_path))
             
         return queryset
     
@@ -55,7 +79,7 @@ class EquipmentViewSet(viewsets.ModelViewSet):
         equipment = serializer.save()
         
         # Obtener o crear CompanyUser para el usuario actual
-        company_user = get_or_create_companyuser(self.request.user)
+        company_user = self.request.company_user
         
         # Registrar en auditoría
         try:
@@ -73,7 +97,7 @@ class EquipmentViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def maintenance_logs(self, request, pk=None):
         equipment = self.get_object()
-        logs = equipment.maintenance_logs.all().select_related('technician')
+        logs = equipment.maintenance_logs.all().select_related('equipment__assigned_to__user', 'technician__user')
         page = self.paginate_queryset(logs)
         
         if page is not None:
@@ -84,6 +108,7 @@ class EquipmentViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
+    @cache_response
     def statistics(self, request):
         from django.db.models import Count
         stats = {
@@ -92,13 +117,57 @@ class EquipmentViewSet(viewsets.ModelViewSet):
             'by_type': dict(self.get_queryset().values_list('type').annotate(count=Count('id'))),
         }
         return Response(stats)
+    
+    def run_bulk(self, request, mode):
+        from .views import get_client_ip
+        
+        items, error = get_bulk_items(request)
+        if error is not None:
+            return error
+        
+        writer = EquipmentBulkWriter(
+            actor=request.company_user,
+            ip_address=get_client_ip(request),
+        )
+        atomic = request.query_params.get('atomic') in ('1', 'true')
+        return bulk_response(writer.run(items, mode, atomic=atomic))
+    
+    @action(detail=False, methods=['post', 'patch'])
+    @query_budget(max_repeats=BULK_MAX_REPEATS)
+    def bulk(self, request):
+        """
+        POST: alta masiva (lista de equipos). PATCH: actualización parcial
+        masiva (cada elemento con su ``id``). Con ``?atomic=1`` no se escribe
+        nada si algún elemento es inválido
+        """
+        return self.run_bulk(request, 'create' if request.method == 'POST' else 'update')
+    
+    @action(detail=False, methods=['post'])
+    @query_budget(max_repeats=BULK_MAX_REPEATS)
+    def bulk_upsert(self, request):
+        """Alta o actualización parcial masiva por ``serial_number``"""
+        return self.run_bulk(request, 'upsert')
+    
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        Conteo de cada opción de filtro (estado, tipo, ubicación, marca) dentro
+        del resultado filtrado actual, calculado en una sola consulta. De
+        ubicación y marca solo las ``FACET_OPTION_LIMIT`` más frecuentes
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(facet_counts(queryset))
 
-class MaintenanceLogViewSet(viewsets.ModelViewSet):
+@query_budget(max_queries=10)
+class MaintenanceLogViewSet(ConditionalRequestMixin, ResponseCacheMixin, FastListMixin, viewsets.ModelViewSet):
     """
     API endpoint para gestionar registros de mantenimiento
     """
     queryset = MaintenanceLog.objects.all()
     serializer_class = MaintenanceLogSerializer
+    fast_serializer_class = MaintenanceLogSerializer
+    etag_version_field = None  # sin updated_at: versión desde ChangeLog
+    response_cache_models = (MaintenanceLog, Equipment, CompanyUser)
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['maintenance_type', 'priority', 'technician']
@@ -107,11 +176,11 @@ class MaintenanceLogViewSet(viewsets.ModelViewSet):
     ordering = ['-start_date']
     
     def get_queryset(self):
-        return super().get_queryset().select_related('equipment', 'technician')
+        return super().get_queryset().select_related('equipment__assigned_to__user', 'technician__user')
     
     def perform_create(self, serializer):
         # Obtener o crear CompanyUser para el usuario actual
-        company_user = get_or_create_companyuser(self.request.user)
+        company_user = self.request.company_user
         maintenance = serializer.save(technician=company_user)
         
         # Registrar en auditoría
@@ -128,6 +197,7 @@ class MaintenanceLogViewSet(viewsets.ModelViewSet):
             pass
     
     @action(detail=False, methods=['get'])
+    @cache_response
     def recent(self, request):
         recent_logs = self.get_queryset()[:10]
         serializer = self.get_serializer(recent_logs, many=True)
@@ -141,13 +211,68 @@ class MaintenanceLogViewSet(viewsets.ModelViewSet):
         
         serializer = self.get_serializer(maintenance)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['post'])
+    @query_budget(max_repeats=BULK_MAX_REPEATS)
+    def bulk_complete(self, request):
+        """Completar varios mantenimientos: ``{"ids": [...]}``"""
+        ids = request.data.get('ids') if isinstance(request.data, dict) else request.data
+        if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+            return Response({'error': 'Se esperaba una lista de ids'}, status=400)
+        if len(ids) > BULK_MAX_ITEMS:
+            return Response({'error': f'Máximo {BULK_MAX_ITEMS} elementos por petición'}, status=400)
+        
+        from .views import get_client_ip
+        
+        now = timezone.now()
+        logs = MaintenanceLog.objects.in_bulk(ids)
+        pending = [log for log in logs.values() if log.end_date is None]
+        for log in pending:
+            log.end_date = now
+        with transaction.atomic():
+            MaintenanceLog.objects.bulk_update(pending, ['end_date'], batch_size=500)
+            record_changes(MaintenanceLog, [log.pk for log in pending])
+            # bulk_create no pasa por las señales: una entrada de auditoría por mantenimiento
+            ip_address = get_client_ip(request)
+            AuditLog.objects.bulk_create([
+                AuditLog(
+                    user=request.company_user,
+                    action='UPD',
+                    model_name='MaintenanceLog',
+                    object_id=log.pk,
+                    details=f"Maintenance completed via API (bulk): {log.title}",
+                    ip_address=ip_address,
+                )
+                for log in pending
+            ], batch_size=500)
+        for model in (MaintenanceLog, AuditLog):
+            bump_table_generation(model._meta.db_table)
+        
+        completed = {log.pk for log in pending}
+        results = []
+        for pk in ids:
+            if pk in completed:
+                results.append({'id': pk, 'status': 'completed'})
+            elif pk in logs:
+                results.append({'id': pk, 'status': 'already_completed'})
+            else:
+                results.append({'id': pk, 'status': 'error', 'errors': {'id': ['No encontrado.']}})
+        
+        return Response({
+            'completed': len(completed),
+            'errors': len(ids) - len([pk for pk in ids if pk in logs]),
+            'end_date': now,
+            'results': results,
+        })
 
-class SupportTicketViewSet(viewsets.ModelViewSet):
+@query_budget(max_queries=10)
+class SupportTicketViewSet(ConditionalRequestMixin, ResponseCacheMixin, viewsets.ModelViewSet):
     """
     API endpoint para gestionar tickets de soporte
     """
     queryset = SupportTicket.objects.all()
     serializer_class = SupportTicketSerializer
+    response_cache_models = (SupportTicket, Equipment, CompanyUser)
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'priority', 'assigned_to']
@@ -156,11 +281,13 @@ class SupportTicketViewSet(viewsets.ModelViewSet):
     ordering = ['-created_at']
     
     def get_queryset(self):
-        return super().get_queryset().select_related('created_by', 'assigned_to', 'equipment')
+        return super().get_queryset().select_related(
+            'created_by__user', 'assigned_to__user', 'equipment__assigned_to__user'
+        )
     
     def perform_create(self, serializer):
         # Obtener o crear CompanyUser para el usuario actual
-        company_user = get_or_create_companyuser(self.request.user)
+        company_user = self.request.company_user
         ticket = serializer.save(created_by=company_user)
         
         # Registrar en auditoría
@@ -191,7 +318,7 @@ class SupportTicketViewSet(viewsets.ModelViewSet):
                 try:
                     from .models import AuditLog
                     AuditLog.objects.create(
-                        user=get_or_create_companyuser(self.request.user),
+                        user=self.request.company_user,
                         action='ASS',
                         model_name='SupportTicket',
                         object_id=ticket.id,
@@ -215,4 +342,81 @@ class SupportTicketViewSet(viewsets.ModelViewSet):
         ticket.resolution = resolution
         ticket.save()
         
-        return Response({'status': 'ticket closed'})
\ No newline at end of file
+        return Response({'status': 'ticket closed'})
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def sync_changes(request):
+    """
+    Sincronización incremental: altas/modificaciones y bajas desde ``cursor``.
+    
+    Sin cursor se recibe el inventario completo por páginas. Mientras
+    ``has_more`` sea verdadero hay que volver a pedir con el nuevo cursor.
+    Parámetros: ``cursor``, ``limit`` y ``models`` (p. ej. ``equipment,ticket``)
+    """
+    try:
+        since = sync.decode_cursor(request.query_params.get('cursor'))
+    except sync.InvalidCursor:
+        return Response({'error': 'Cursor inválido'}, status=400)
+    except sync.CursorExpired:
+        return Response({'error': 'Cursor caducado: es necesaria una sincronización completa', 'reset': True}, status=410)
+    
+    try:
+        limit = min(int(request.query_params.get('limit', sync.SYNC_PAGE_SIZE)), sync.SYNC_MAX_PAGE_SIZE)
+    except ValueError:
+        return Response({'error': 'limit debe ser un entero'}, status=400)
+    names = request.query_params.get('models')
+    names = [name.strip() for name in names.split(',')] if names else None
+    
+    changes, position, has_more = sync.collect_changes(since, max(limit, 1), names)
+    return Response({
+        'cursor': sync.encode_cursor(position),
+        'has_more': has_more,
+        'changes': changes,
+    })
+
+# Cada subpetición se comprueba con el presupuesto de su vista (ver utils.batch)
+@query_budget(max_repeats=UNLIMITED)
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def batch_requests(request):
+    """
+    Varias peticiones de la API en una sola llamada.
+    
+    Cuerpo: ``{"requests": [{"method": "GET", "path": "/api/v1/equipment/5/"}, ...],
+    "atomic": false}``. Cada petición admite ``params``, ``headers``, ``body`` e
+    ``id``. Con ``atomic`` se ejecutan en una transacción y un fallo deshace todo.
+    """
+    try:
+        operations, atomic = parse_operations(request.data)
+    except InvalidBatch as exc:
+        return Response({'error': str(exc)}, status=400)
+    
+    results, rolled_back = BatchExecutor(request).run(operations, atomic=atomic)
+    return Response(
+        {'rolled_back': rolled_back, 'results': results},
+        status=status.HTTP_400_BAD_REQUEST if rolled_back else status.HTTP_200_OK,
+    )
+
+class ObtainSignedToken(ObtainAuthToken):
+    """
+    Emitir un token firmado a partir de usuario y contraseña. El token no se
+    guarda: caduca a las ``API_TOKEN_TTL`` segundos o cuando se revoca
+    """
+    def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        token, expires_at = issue_token(serializer.validated_data['user'])
+        return Response({
+            'token': token,
+            'token_type': SignedTokenAuthentication.keyword,
+            'expires_at': expires_at,
+        })
+
+@api_view(['POST'])
+@authentication_classes([SignedTokenAuthentication])
+@permission_classes([permissions.IsAuthenticated])
+def revoke_auth_token(request):
+    """Revocar el token con el que se hace la petición (cierre de sesión)"""
+    revoke_token(request.auth)
+    return Response(status=status.HTTP_204_NO_CONTENT)
@@ -3,4 +3,8 @@ from django.apps import AppConfig
 class InventoryAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventory_app'
-    verbose_name = 'Gestión de Inventario IT'
\ No newline at end of file
+    verbose_name = 'Gestión de Inventario IT'
+
+    def ready(self):
+        # Registrar receptores de señales (invalidación de cachés)
+        from . import signals  # noqa: F401
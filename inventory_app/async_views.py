@@ -0,0 +1,223 @@
+"""
+Vistas asíncronas para el despliegue ASGI (``config/asgi.py``).
+
+Con ASGI una vista síncrona ocupa el hilo de la petición hasta que termina;
+las consultas de sondeo del dashboard y los listados de la API, que son las
+más frecuentes, tienen aquí una versión asíncrona con el ORM asíncrono de
+Django (``acount``, ``aaggregate``, ``async for``). Solo se enrutan con
+``ASYNC_API_READS``: con WSGI cada vista asíncrona correría en su propio
+bucle de eventos y se sirven las síncronas de ``views`` y ``api_views``.
+
+Los listados y detalles de la API reutilizan el ViewSet: autenticación,
+permisos, throttling, ETags y caché de respuestas se resuelven en una sola
+llamada síncrona y las consultas de datos (conteo y página) son asíncronas.
+Todo lo demás (escrituras, navegable, ``?fast=0``...) se delega en el ViewSet
+síncrono, así que la respuesta es la misma en los dos despliegues.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.views import View
+from rest_framework.response import Response
+
+from .api_views import EquipmentViewSet, MaintenanceLogViewSet
+from .models import Equipment, SupportTicket
+from .utils import dashboard
+from .utils.fast_json import FastJsonResponse
+from .utils.response_cache import response_cache
+
+LIST_ACTIONS = {'get': 'list', 'post': 'create'}
+DETAIL_ACTIONS = {
+    'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy',
+}
+
+
+def alogin_required(view_func):
+    """``login_required`` para vistas ``async def`` (el de Django 4.2 es solo síncrono)."""
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        # Resolver el usuario carga la sesión: fuera del bucle de eventos
+        is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if not is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+    return wrapper
+
+
+# -----------------------------------------------------------------------------
+# Dashboard (mismas consultas y respuesta que las vistas de ``views``)
+# -----------------------------------------------------------------------------
+
+@alogin_required
+async def dashboard_stats_api(request):
+    equipment = await Equipment.objects.aaggregate(**dashboard.equipment_aggregates())
+    tickets = await SupportTicket.objects.aaggregate(**dashboard.ticket_aggregates())
+    return FastJsonResponse(dashboard.stats_payload(
+        equipment, tickets, await dashboard.pending_maintenance().acount()
+    ))
+
+
+@alogin_required
+async def equipment_chart_data_api(request):
+    return FastJsonResponse(dashboard.chart_payload(
+        [item async for item in dashboard.equipment_by('type')],
+        [item async for item in dashboard.equipment_by('status')],
+    ))
+
+
+@alogin_required
+async def recent_activity_api(request):
+    return FastJsonResponse({
+        'maintenance': [dashboard.maintenance_item(m) async for m in dashboard.recent_maintenance()],
+        'tickets': [dashboard.ticket_item(t) async for t in dashboard.recent_tickets()],
+    })
+
+
+# -----------------------------------------------------------------------------
+# Listados y detalles de la API
+# -----------------------------------------------------------------------------
+
+class Delegate(Exception):
+    """La petición la atiende el ViewSet síncrono."""
+
+
+class AsyncReadView(View):
+    """
+    ``list``/``retrieve`` asíncronos de un ViewSet con ``FastListMixin``.
+
+    ``as_view(detail=...)`` se monta en la misma ruta que el router; los demás
+    métodos HTTP pasan a ``sync_view``.
+    """
+    viewset_class = None
+    basename = None
+    detail = False
+    sync_view = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        detail = initkwargs.get('detail', cls.detail)
+        sync_view = cls.viewset_class.as_view(
+            dict(DETAIL_ACTIONS if detail else LIST_ACTIONS), basename=cls.basename, detail=detail,
+        )
+        view = super().as_view(sync_view=sync_view, **initkwargs)
+        view.sync_view = sync_view
+        view.csrf_exempt = True  # como APIView: DRF comprueba el CSRF de la sesión
+        return view
+
+    @property
+    def action(self):
+        return 'retrieve' if self.detail else 'list'
+
+    async def delegate(self, request, *args, **kwargs):
+        return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+
+    post = put = patch = delete = options = delegate
+
+    # -------------------------------------------------------------------------
+    # Lectura
+    # -------------------------------------------------------------------------
+
+    def prepare(self, request, kwargs):
+        """
+        Parte síncrona: ViewSet inicializado, validadores y caché.
+
+        Devuelve una respuesta ya completa (error, 304 o acierto de caché) o
+        ``(viewset, queryset, validators, cache_key, total)``; ``total`` es el
+        número de filas del listado, ya contado para el ETag.
+        """
+        viewset = self.viewset_class(basename=self.basename, detail=self.detail, action=self.action)
+        viewset.action_map = {'get': self.action}
+        viewset.args, viewset.kwargs = (), kwargs
+        viewset.request = drf_request = viewset.initialize_request(request)
+        viewset.format_kwarg = None
+        viewset.headers = viewset.default_response_headers
+        try:
+            viewset.initial(drf_request)
+            fast = viewset.get_fast_serializer()
+            if fast is None or drf_request.accepted_renderer.format != 'json':
+                raise Delegate
+            queryset = viewset.filter_queryset(viewset.get_queryset())
+
+            total = None
+            if self.detail:
+                validators = viewset.get_object_validators()
+                if validators is None:
+                    raise Delegate  # 404 habitual
+            else:
+                validators = viewset.get_list_validators(queryset)
+                total = viewset.list_total
+            etag, last_modified = validators
+            conditional = get_conditional_response(drf_request, etag=etag, last_modified=last_modified)
+            if conditional is not None:
+                return conditional
+
+            cache_key = None
+            if not self.detail:
+                cache_key = viewset.get_response_cache_key(drf_request)
+                cached = response_cache().get(cache_key)
+                if cached is not None:
+                    status_code, data = cached
+                    response = Response(data, status=status_code)
+                    response['X-Cache'] = 'HIT'
+                    return self.finalize(viewset, viewset.set_validators(response, *validators))
+            return viewset, fast.values(queryset), validators, cache_key, total
+        except Delegate:
+            raise
+        except Exception as exc:
+            return self.finalize(viewset, viewset.handle_exception(exc))
+
+    def finalize(self, viewset, response):
+        response = viewset.finalize_response(viewset.request, response)
+        response.render()
+        # Respuesta ya renderizada: el manejador ASGI no cambia de hilo para hacerlo
+        return HttpResponse(response.content, status=response.status_code, headers=dict(response.items()))
+
+    async def fetch_page(self, viewset, rows, count):
+        paginator = viewset.paginator
+        if paginator is None:
+            return Response(viewset.get_fast_serializer().render([row async for row in rows]))
+        # El paginador trabaja sobre índices; la página se consulta después
+        if paginator.paginate_queryset(range(count), viewset.request, view=viewset) is None:
+            return Response(viewset.get_fast_serializer().render([row async for row in rows]))
+        page = paginator.page
+        bottom = (page.number - 1) * page.paginator.per_page
+        page = [row async for row in rows[bottom:bottom + len(page.object_list)]]
+        return paginator.get_paginated_response(viewset.get_fast_serializer().render(page))
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            prepared = await sync_to_async(self.prepare)(request, kwargs)
+        except Delegate:
+            return await self.delegate(request, *args, **kwargs)
+        if not isinstance(prepared, tuple):
+            return prepared
+        viewset, rows, validators, cache_key, total = prepared
+
+        if self.detail:
+            row = await rows.filter(pk=kwargs['pk']).afirst()
+            if row is None:
+                return await self.delegate(request, *args, **kwargs)
+            response = Response(viewset.get_fast_serializer().render([row])[0])
+        else:
+            try:
+                response = await self.fetch_page(viewset, rows, total)
+            except Exception as exc:
+                return self.finalize(viewset, viewset.handle_exception(exc))
+            timeout = getattr(settings, 'API_RESPONSE_CACHE_TIMEOUT', 300)
+            await response_cache().aset(cache_key, (response.status_code, response.data), timeout)
+            response['X-Cache'] = 'MISS'
+        return self.finalize(viewset, viewset.set_validators(response, *validators))
+
+
+class EquipmentAsyncReadView(AsyncReadView):
+    viewset_class = EquipmentViewSet
+    basename = 'equipment'
+
+
+class MaintenanceAsyncReadView(AsyncReadView):
+    viewset_class = MaintenanceLogViewSet
+    basename = 'maintenance'
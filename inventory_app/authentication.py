@@ -0,0 +1,220 @@
+"""
+Tokens de la API firmados y con caducidad, sin estado en la base de datos.
+
+El token lleva el usuario (id, nombre y permisos de personal) y la fecha de
+emisión, firmados con ``SECRET_KEY``. Autenticar una petición es comprobar una
+firma HMAC: ni consulta a la base de datos ni hash de contraseña (que sí hace
+``BasicAuthentication`` en cada llamada). Se emiten en ``api/v1/auth-token/``
+y se envían como ``Authorization: Bearer <token>``.
+
+El token lleva también una versión de las credenciales del usuario (una
+huella de la contraseña, ``is_active`` y los permisos de personal) que se
+compara con la actual, guardada en la caché compartida: desactivar al
+usuario o cambiar su contraseña o sus permisos invalida sus tokens en todos
+los workers con la siguiente petición. La versión se calcula de la base de
+datos cuando no está en la caché y se guarda como mucho
+``API_TOKEN_REVOCATION_REFRESH`` segundos.
+
+Las revocaciones de un token (cierre de sesión) se guardan en
+``RevokedToken`` y cada proceso mantiene una copia en memoria que recarga
+cada ``API_TOKEN_REVOCATION_REFRESH`` segundos (30 por defecto): el proceso
+que revoca lo aplica en el acto, pero en los demás workers un token revocado
+sigue aceptándose hasta su siguiente recarga, como mucho ese tiempo.
+"""
+import secrets
+import threading
+import time
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+from .models import RevokedToken
+
+TOKEN_SALT = 'inventory_app.api-token'
+
+
+def token_ttl():
+    return getattr(settings, 'API_TOKEN_TTL', 12 * 3600)
+
+
+def refresh_interval():
+    return getattr(settings, 'API_TOKEN_REVOCATION_REFRESH', 30)
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+class RevocationList:
+    """Copia en memoria de las revocaciones vigentes, recargada periódicamente."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.jtis = set()
+        self.users = {}  # user_id -> revocados los emitidos hasta (ms)
+        self.loaded_at = None
+
+    def is_stale(self):
+        return self.loaded_at is None or time.monotonic() - self.loaded_at >= refresh_interval()
+
+    def refresh(self, force=False):
+        if not force and not self.is_stale():
+            return
+        with self.lock:
+            if not force and not self.is_stale():
+                return  # otro hilo ya la recargó
+            jtis, users = set(), {}
+            rows = RevokedToken.objects.filter(expires_at__gt=timezone.now()).values_list(
+                'jti', 'user_id', 'revoked_at'
+            )
+            for jti, user_id, revoked_at in rows:
+                if jti:
+                    jtis.add(jti)
+                else:
+                    users[user_id] = max(users.get(user_id, 0), int(revoked_at.timestamp() * 1000))
+            self.jtis, self.users = jtis, users
+            self.loaded_at = time.monotonic()
+
+    def add(self, jti, user_id, revoked_ms):
+        # El proceso que revoca no espera a la siguiente recarga
+        with self.lock:
+            if jti:
+                self.jtis.add(jti)
+            else:
+                self.users[user_id] = max(self.users.get(user_id, 0), revoked_ms)
+
+    def is_revoked(self, payload):
+        self.refresh()
+        return payload['jti'] in self.jtis or payload['iat'] <= self.users.get(payload['uid'], -1)
+
+
+revocations = RevocationList()
+
+
+# Campos del usuario que forman la versión de sus credenciales
+CREDENTIAL_FIELDS = ('password', 'is_active', 'is_staff', 'is_superuser')
+
+
+def _credentials_cache():
+    return caches[getattr(settings, 'SHARED_CACHE_ALIAS', 'default')]
+
+
+def _credentials_key(user_id):
+    return f'api-token-credentials:{user_id}'
+
+
+def credential_version(values):
+    """Huella de los campos de ``CREDENTIAL_FIELDS``; ``''`` si el usuario no puede entrar."""
+    if values is None or not values['is_active']:
+        return ''
+    data = '|'.join(str(values[field]) for field in CREDENTIAL_FIELDS)
+    return salted_hmac(TOKEN_SALT, data).hexdigest()[:16]
+
+
+def current_credential_version(user_id):
+    cache = _credentials_cache()
+    key = _credentials_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        values = User.objects.filter(pk=user_id).values(*CREDENTIAL_FIELDS).first()
+        version = credential_version(values)
+        # Caducidad corta: una lectura anterior a un cambio que llegue a la
+        # caché después de borrarla no se mantiene más que eso
+        cache.set(key, version, timeout=refresh_interval())
+    return version
+
+
+def forget_credentials(user_id, using=None):
+    """Recalcular la versión de ``user_id`` al confirmarse la transacción en curso."""
+    transaction.on_commit(partial(_credentials_cache().delete, _credentials_key(user_id)), using=using)
+
+
+def issue_token(user):
+    """Devolver ``(token, caducidad)`` para ``user``."""
+    version = credential_version({field: getattr(user, field) for field in CREDENTIAL_FIELDS})
+    _credentials_cache().set(_credentials_key(user.pk), version, timeout=refresh_interval())
+    payload = {
+        'uid': user.pk,
+        'usr': user.get_username(),
+        'stf': user.is_staff,
+        'su': user.is_superuser,
+        'cv': version,
+        'iat': _now_ms(),
+        'jti': secrets.token_hex(8),
+    }
+    token = signing.dumps(payload, salt=TOKEN_SALT)
+    return token, timezone.now() + timedelta(seconds=token_ttl())
+
+
+def decode_token(token):
+    try:
+        return signing.loads(token, salt=TOKEN_SALT, max_age=token_ttl())
+    except signing.SignatureExpired:
+        raise exceptions.AuthenticationFailed('Token caducado.')
+    except signing.BadSignature:
+        raise exceptions.AuthenticationFailed('Token inválido.')
+
+
+def token_user(payload):
+    """Usuario construido desde el token; los demás campos quedan diferidos."""
+    values = {
+        'id': payload['uid'], 'username': payload['usr'],
+        'is_staff': payload['stf'], 'is_superuser': payload['su'], 'is_active': True,
+    }
+    # ``from_db`` espera los valores en el orden de los campos del modelo
+    fields = [field.attname for field in User._meta.concrete_fields if field.attname in values]
+    return User.from_db('default', fields, [values[name] for name in fields])
+
+
+def _revoke(jti, user_id):
+    revoked_at = timezone.now()
+    RevokedToken.objects.filter(expires_at__lte=revoked_at).delete()
+    RevokedToken.objects.create(
+        jti=jti, user_id=user_id, revoked_at=revoked_at,
+        expires_at=revoked_at + timedelta(seconds=token_ttl()),
+    )
+    revocations.add(jti, user_id, int(revoked_at.timestamp() * 1000))
+
+
+def revoke_token(payload):
+    _revoke(payload['jti'], payload['uid'])
+
+
+def revoke_user_tokens(user_id):
+    """Revocar todos los tokens emitidos hasta ahora para ``user_id``."""
+    _revoke('', user_id)
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """``Authorization: Bearer <token>`` con tokens de :func:`issue_token`."""
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Cabecera de token inválida.')
+        try:
+            token = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Cabecera de token inválida.')
+
+        payload = decode_token(token)
+        if revocations.is_revoked(payload):
+            raise exceptions.AuthenticationFailed('Token revocado.')
+        if payload.get('cv') != current_credential_version(payload['uid']):
+            raise exceptions.AuthenticationFailed('Token revocado.')
+        return token_user(payload), payload
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -1,32 +1,25 @@
- 
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth.models import User
-from django.db.models import Q
+
+from .utils.identities import find_login_identity
 
 class CompanyEmailBackend(ModelBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
-        try:
-            user = User.objects.get(
-                Q(username=username) | 
-                Q(email=username) |
-                Q(companyuser__email=username)
-            )
-            
-            if user.check_password(password):
-                # Verificar que el email sea del dominio empresarial
-                email = getattr(user, 'email', '')
-                if hasattr(user, 'companyuser'):
-                    email = user.companyuser.email
-                
-                if email.endswith('@tuempresa.com'):
-                    return user
-        except User.DoesNotExist:
-            return None
-        except Exception as e:
+        # Nombre de usuario, email o email de empresa: una búsqueda indexada
+        identity = find_login_identity(username)
+        if identity is None:
+            # Mismo coste que con un usuario existente (ver ModelBackend)
+            User().set_password(password)
             return None
+        
+        user = identity.user
+        # El dominio empresarial ya está comprobado en la tabla
+        if user.check_password(password) and identity.company_domain:
+            return user
+        return None
     
     def get_user(self, user_id):
         try:
             return User.objects.get(pk=user_id)
         except User.DoesNotExist:
-            return None
\ No newline at end of file
+            return None
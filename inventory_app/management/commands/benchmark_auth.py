@@ -0,0 +1,103 @@
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+import random
+import statistics
+import time
+
+from inventory_app.models import CompanyUser
+from inventory_app.utils.identities import find_login_identity, rebuild_identities
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    help = (
+        'Compare the login lookup of CompanyEmailBackend: the OR/LEFT JOIN query against '
+        'the login identity table (synthetic users, rolled back at the end). Password '
+        'hashing costs the same in both and is left out'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            nargs='+',
+            default=[10000, 100000],
+            help='User counts to benchmark',
+        )
+        parser.add_argument(
+            '--lookups',
+            type=int,
+            default=2000,
+            help='Lookups per measurement',
+        )
+    
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'users':>8} {'identifier':12} {'OR query':>10} {'identity':>10} {'speedup':>8}")
+        self.stdout.write('=' * 52)
+        try:
+            with transaction.atomic():
+                created = 0
+                for users in sorted(options['users']):
+                    self.create_users(users - created, created)
+                    created = users
+                    rebuild_identities()
+                    self.compare(users, options['lookups'])
+                raise Rollback
+        except Rollback:
+            pass
+    
+    def create_users(self, count, offset):
+        password = make_password('benchmark')  # un solo hash para todos
+        users = User.objects.bulk_create([
+            User(username=f'bench{offset + i}', email=f'bench{offset + i}@example.com', password=password)
+            for i in range(count)
+        ], batch_size=1000)
+        # La mitad con perfil de empresa
+        CompanyUser.objects.bulk_create([
+            CompanyUser(user=user, department='Bench', phone='-', email=f'{user.username}@tuempresa.com')
+            for user in users[::2]
+        ], batch_size=1000)
+    
+    def legacy_lookup(self, identifier):
+        try:
+            user = User.objects.get(
+                Q(username=identifier) | Q(email=identifier) | Q(companyuser__email=identifier)
+            )
+        except User.DoesNotExist:
+            return None
+        email = user.email
+        if hasattr(user, 'companyuser'):
+            email = user.companyuser.email
+        return user, email.endswith('@tuempresa.com')
+    
+    def identity_lookup(self, identifier):
+        identity = find_login_identity(identifier)
+        return None if identity is None else (identity.user, identity.company_domain)
+    
+    def timed(self, func, identifiers):
+        timings = []
+        for identifier in identifiers:
+            started = time.perf_counter()
+            func(identifier)
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
+    
+    def compare(self, users, lookups):
+        rng = random.Random(users)
+        kinds = {
+            'username': lambda n: f'bench{n}',
+            'email': lambda n: f'bench{n}@example.com',
+            'company': lambda n: f'bench{n - n % 2}@tuempresa.com',
+            'unknown': lambda n: f'nobody{n}',
+        }
+        for kind, make in kinds.items():
+            identifiers = [make(rng.randrange(users)) for _ in range(lookups)]
+            legacy = self.timed(self.legacy_lookup, identifiers)
+            indexed = self.timed(self.identity_lookup, identifiers)
+            self.stdout.write(
+                f'{users:>8} {kind:12} {legacy * 1e6:>8.0f}us {indexed * 1e6:>8.0f}us {legacy / indexed:>7.1f}x'
+            )
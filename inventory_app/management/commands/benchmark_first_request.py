@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from inventory_app.utils.warmup import WARMUP_PAGES, warm_up
+
+class Command(BaseCommand):
+    help = (
+        'Latency of the first and second request to each page in a fresh process, '
+        'cold and after the gunicorn warm-up (inventory_app.utils.warmup)'
+    )
+    # Las comprobaciones del sistema cargan las URLs y calentarían el proceso
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3, help='Fresh processes per mode')
+        parser.add_argument('--username', help='User to log in as (default: first superuser)')
+        parser.add_argument('--child', choices=['cold', 'warm'], help='Internal: measure in this process')
+        parser.add_argument('--paths', help='Internal: JSON {page: path} resolved by the parent')
+
+    def handle(self, *args, **options):
+        if options['child']:
+            return self.measure(options['child'], options['username'], json.loads(options['paths']))
+
+        # Resolver las rutas aquí: reverse() en el hijo poblaría sus URLs antes de medir
+        paths = json.dumps({page: reverse(page) for page in WARMUP_PAGES})
+        results = {mode: [self.run_child(mode, options['username'], paths) for _ in range(options['runs'])]
+                   for mode in ('cold', 'warm')}
+
+        self.stdout.write(f"{'mode':6} {'page':22} {'first':>10} {'second':>10}")
+        self.stdout.write('=' * 51)
+        for mode, runs in results.items():
+            for page in WARMUP_PAGES:
+                first = statistics.median(run['pages'][page][0] for run in runs)
+                second = statistics.median(run['pages'][page][1] for run in runs)
+                self.stdout.write(f'{mode:6} {page:22} {first:>8.1f}ms {second:>8.1f}ms')
+        warmup = statistics.median(run['warmup'] for run in results['warm'])
+        self.stdout.write(f'\nWarm-up (once per deploy, in the gunicorn master): {warmup:.0f}ms')
+
+    def run_child(self, mode, username, paths):
+        command = [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'),
+                   'benchmark_first_request', '--child', mode, '--paths', paths]
+        if username:
+            command += ['--username', username]
+        result = subprocess.run(command, cwd=settings.BASE_DIR, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise CommandError(f'{mode} run failed:\n{result.stderr[-2000:]}')
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def measure(self, mode, username, paths):
+        users = User.objects.filter(username=username) if username else User.objects.filter(is_superuser=True)
+        user = users.order_by('pk').first()
+        if user is None:
+            raise CommandError('No user to log in as')
+        if 'testserver' not in settings.ALLOWED_HOSTS:
+            settings.ALLOWED_HOSTS.append('testserver')
+
+        started = time.perf_counter()
+        if mode == 'warm':
+            warm_up()
+        warmup = (time.perf_counter() - started) * 1000
+
+        client = Client()
+        client.handler.load_middleware()  # como WSGIHandler al importar config.wsgi
+        client.force_login(user)
+        pages = {}
+        for page, url in paths.items():
+            timings = []
+            for _ in range(2):
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    raise CommandError(f'{url} returned {response.status_code}')
+            pages[page] = timings
+        self.stdout.write(json.dumps({'warmup': warmup, 'pages': pages}))
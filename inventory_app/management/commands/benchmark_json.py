@@ -0,0 +1,103 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+import time
+
+from inventory_app.middleware import brotli
+from inventory_app.models import CompanyUser, Equipment, MaintenanceLog
+from inventory_app.renderers import FastJSONRenderer
+from inventory_app.serializers import MaintenanceLogSerializer
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    help = (
+        'Compare the DRF JSON renderer with the orjson renderer on a maintenance list '
+        'page and report gzip/brotli sizes (synthetic rows, rolled back at the end)'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=20,
+            help='Rows per page',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=200,
+            help='Renders per measurement (the best one is reported)',
+        )
+    
+    def handle(self, *args, **options):
+        technician = CompanyUser.objects.select_related('user').first()
+        if technician is None:
+            self.stderr.write('At least one CompanyUser is required')
+            return
+        
+        try:
+            with transaction.atomic():
+                self.create_rows(options['page_size'], technician)
+                logs = MaintenanceLog.objects.select_related(
+                    'equipment__assigned_to__user', 'technician__user'
+                ).order_by('-id')[:options['page_size']]
+                page = {
+                    'count': options['page_size'], 'next': None, 'previous': None,
+                    'results': MaintenanceLogSerializer(logs, many=True).data,
+                }
+                self.report(page, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+    
+    def create_rows(self, count, technician):
+        now = timezone.now()
+        equipment = Equipment.objects.bulk_create([
+            Equipment(
+                type='LAP', brand='Bench', model=f'M{i % 20}', serial_number=f'BENCH-JSON-{i}',
+                purchase_date=now.date(), location=f'Sala {i % 50}', status='INU',
+                assigned_to=technician,
+            )
+            for i in range(count)
+        ])
+        MaintenanceLog.objects.bulk_create([
+            MaintenanceLog(
+                equipment=item, maintenance_type='PRE', title='Benchmark',
+                description='Revisión preventiva programada del equipo', technician=technician,
+                start_date=now, cost='10.00', priority='MED',
+            )
+            for item in equipment
+        ])
+    
+    def best_of(self, repeat, func):
+        best, result = None, None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+    
+    def report(self, page, repeat):
+        drf_time, drf_body = self.best_of(repeat, lambda: JSONRenderer().render(page))
+        fast_time, fast_body = self.best_of(repeat, lambda: FastJSONRenderer().render(page))
+        if drf_body != fast_body:
+            self.stderr.write('Renderer outputs differ')
+        
+        self.stdout.write(f"{'renderer':10} {'time':>10} {'bytes':>8}")
+        self.stdout.write('=' * 30)
+        self.stdout.write(f"{'drf':10} {drf_time * 1e6:>8.0f}us {len(drf_body):>8}")
+        self.stdout.write(f"{'orjson':10} {fast_time * 1e6:>8.0f}us {len(fast_body):>8}")
+        self.stdout.write(f'Speedup: {drf_time / fast_time:.1f}x')
+        
+        gzip_time, gzipped = self.best_of(repeat, lambda: compress_string(fast_body, max_random_bytes=100))
+        self.stdout.write(f"{'gzip':10} {gzip_time * 1e6:>8.0f}us {len(gzipped):>8}")
+        if brotli is not None:
+            br_time, compressed = self.best_of(repeat, lambda: brotli.compress(fast_body, quality=5))
+            self.stdout.write(f"{'brotli':10} {br_time * 1e6:>8.0f}us {len(compressed):>8}")
+        else:
+            self.stdout.write('brotli not installed')
@@ -0,0 +1,188 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from asgiref.sync import sync_to_async
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import base64
+import statistics
+import threading
+import time
+import urllib.request
+
+DEFAULT_PATHS = [
+    '/inventory/api/dashboard/stats/',
+    '/inventory/api/dashboard/recent-activity/',
+    '/inventory/api/dashboard/equipment-chart/',
+    '/api/v1/equipment/',
+    '/api/v1/maintenance/',
+]
+
+class Command(BaseCommand):
+    help = (
+        'Load benchmark: throughput and p50/p99 latency at a given concurrency. '
+        'With --url it drives a running server (compare gunicorn config.wsgi and '
+        'config.asgi with the same -w); without it, it compares the WSGI and ASGI '
+        'handlers in-process'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', help='Absolute URL to load (repeatable)')
+        parser.add_argument('--path', action='append', help='Path for the in-process mode (repeatable)')
+        parser.add_argument('--concurrency', type=int, default=20, help='Concurrent clients')
+        parser.add_argument('--requests', type=int, default=500, help='Total requests per run')
+        parser.add_argument('--workers', type=int, default=4, help='Workers (threads for WSGI, event loops for ASGI)')
+        parser.add_argument('--username', help='User to authenticate as (in-process: forced login)')
+        parser.add_argument('--password', help='Password for HTTP Basic auth against --url')
+        parser.add_argument('--header', action='append', default=[], help='Extra header, "Name: value"')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError('--concurrency and --requests must be positive')
+
+        self.stdout.write(f"{'mode':8} {'reqs':>6} {'errors':>6} {'req/s':>9} {'p50':>9} {'p99':>9}")
+        self.stdout.write('=' * 52)
+        if options['url']:
+            self.report('http', *self.run_http(options))
+            return
+
+        user = None
+        if options['username']:
+            user = User.objects.filter(username=options['username']).first()
+            if user is None:
+                raise CommandError(f"User {options['username']} does not exist")
+        paths = options['path'] or DEFAULT_PATHS
+        if 'testserver' not in settings.ALLOWED_HOSTS:
+            settings.ALLOWED_HOSTS.append('testserver')
+        self.report('wsgi', *self.run_wsgi(paths, user, options))
+        self.report('asgi', *self.run_asgi(paths, user, options))
+        if not settings.ASYNC_API_READS:
+            self.stdout.write('Note: ASYNC_API_READS is off, /api/v1/ reads ran through the sync viewsets')
+
+    def schedule(self, targets, total):
+        return [targets[i % len(targets)] for i in range(total)]
+
+    def report(self, mode, latencies, errors, elapsed):
+        if not latencies:
+            self.stdout.write(f'{mode:8} no successful requests ({errors} errors)')
+            return
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f'{mode:8} {len(latencies) + errors:>6} {errors:>6} {len(latencies) / elapsed:>9.1f} '
+            f'{statistics.median(latencies) * 1000:>7.1f}ms {p99 * 1000:>7.1f}ms'
+        )
+
+    # -------------------------------------------------------------------------
+    # Servidor en marcha
+    # -------------------------------------------------------------------------
+
+    def run_http(self, options):
+        headers = dict(header.split(':', 1) for header in options['header'])
+        headers = {name.strip(): value.strip() for name, value in headers.items()}
+        if options['username'] and options['password']:
+            token = base64.b64encode(f"{options['username']}:{options['password']}".encode()).decode()
+            headers['Authorization'] = f'Basic {token}'
+        queue = self.schedule(options['url'], options['requests'])
+        lock = threading.Lock()
+        latencies, errors = [], [0]
+
+        def client():
+            while True:
+                with lock:
+                    if not queue:
+                        return
+                    url = queue.pop()
+                started = time.perf_counter()
+                try:
+                    with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=30) as response:
+                        response.read()
+                    ok = True
+                except Exception:
+                    ok = False
+                with lock:
+                    if ok:
+                        latencies.append(time.perf_counter() - started)
+                    else:
+                        errors[0] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            futures = [pool.submit(client) for _ in range(options['concurrency'])]
+        for future in futures:
+            future.result()
+        return latencies, errors[0], time.perf_counter() - started
+
+    # -------------------------------------------------------------------------
+    # En proceso
+    # -------------------------------------------------------------------------
+
+    def run_wsgi(self, paths, user, options):
+        """
+        Manejador WSGI con ``workers`` peticiones a la vez, como workers
+        síncronos; los clientes que esperan turno cuentan en la latencia.
+        """
+        queue = self.schedule(paths, options['requests'])
+        lock = threading.Lock()
+        slots = threading.BoundedSemaphore(options['workers'])
+        latencies, errors = [], [0]
+
+        def client():
+            http = Client()
+            if user is not None:
+                http.force_login(user)
+            while True:
+                with lock:
+                    if not queue:
+                        return
+                    path = queue.pop()
+                started = time.perf_counter()
+                with slots:
+                    status = http.get(path, HTTP_ACCEPT='application/json').status_code
+                with lock:
+                    if status < 400:
+                        latencies.append(time.perf_counter() - started)
+                    else:
+                        errors[0] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            futures = [pool.submit(client) for _ in range(options['concurrency'])]
+        for future in futures:
+            future.result()
+        return latencies, errors[0], time.perf_counter() - started
+
+    def run_asgi(self, paths, user, options):
+        """``workers`` bucles de eventos con el manejador ASGI y la concurrencia repartida."""
+        queue = self.schedule(paths, options['requests'])
+        lock = threading.Lock()
+        latencies, errors = [], [0]
+        per_worker = max(1, options['concurrency'] // options['workers'])
+
+        async def client(http):
+            while True:
+                with lock:
+                    if not queue:
+                        return
+                    path = queue.pop()
+                started = time.perf_counter()
+                response = await http.get(path, headers={'accept': 'application/json'})
+                with lock:
+                    if response.status_code < 400:
+                        latencies.append(time.perf_counter() - started)
+                    else:
+                        errors[0] += 1
+
+        async def event_loop():
+            http = AsyncClient()
+            if user is not None:
+                await sync_to_async(http.force_login)(user)
+            await asyncio.gather(*(client(http) for _ in range(per_worker)))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['workers']) as pool:
+            futures = [pool.submit(asyncio.run, event_loop()) for _ in range(options['workers'])]
+        for future in futures:
+            future.result()
+        return latencies, errors[0], time.perf_counter() - started
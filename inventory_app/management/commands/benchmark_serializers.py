@@ -0,0 +1,97 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+import time
+
+from inventory_app.models import CompanyUser, Equipment, MaintenanceLog
+from inventory_app.serializers import EquipmentSerializer, MaintenanceLogSerializer
+from inventory_app.utils.fast_serializers import ValuesSerializer
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    help = (
+        'Compare ModelSerializer and the values() fast path for the equipment and '
+        'maintenance list payloads (synthetic rows, rolled back at the end)'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            nargs='+',
+            default=[1000, 10000],
+            help='Row counts to benchmark',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Runs per measurement (the best one is reported)',
+        )
+    
+    def handle(self, *args, **options):
+        technician = CompanyUser.objects.select_related('user').first()
+        if technician is None:
+            self.stderr.write('At least one CompanyUser is required')
+            return
+        
+        self.stdout.write(f"{'payload':14} {'rows':>7} {'serializer':>12} {'values()':>12} {'speedup':>8}")
+        self.stdout.write('=' * 57)
+        try:
+            with transaction.atomic():
+                created = 0
+                for rows in sorted(options['rows']):
+                    self.create_rows(rows - created, created, technician)
+                    created = rows
+                    
+                    equipment = Equipment.objects.select_related('assigned_to__user').order_by('-id')[:rows]
+                    logs = MaintenanceLog.objects.select_related(
+                        'equipment__assigned_to__user', 'technician__user'
+                    ).order_by('-id')[:rows]
+                    
+                    self.compare('equipment', rows, equipment, EquipmentSerializer, options['repeat'])
+                    self.compare('maintenance', rows, logs, MaintenanceLogSerializer, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+    
+    def create_rows(self, count, offset, technician):
+        now = timezone.now()
+        equipment = Equipment.objects.bulk_create([
+            Equipment(
+                type='LAP', brand='Bench', model=f'M{i % 20}', serial_number=f'BENCH-{offset + i}',
+                purchase_date=now.date(), location=f'Sala {i % 50}', status='INU',
+                assigned_to=technician,
+            )
+            for i in range(count)
+        ], batch_size=500)
+        MaintenanceLog.objects.bulk_create([
+            MaintenanceLog(
+                equipment=item, maintenance_type='PRE', title='Benchmark', description='-',
+                technician=technician, start_date=now, cost='10.00', priority='MED',
+            )
+            for item in equipment
+        ], batch_size=500)
+    
+    def best_of(self, repeat, func):
+        best, result = None, None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+    
+    def compare(self, label, rows, queryset, serializer_class, repeat):
+        fast = ValuesSerializer(serializer_class)
+        regular_time, regular = self.best_of(repeat, lambda: serializer_class(queryset, many=True).data)
+        fast_time, fast_data = self.best_of(repeat, lambda: fast.serialize(queryset))
+        
+        if list(map(dict, regular)) != fast_data:
+            self.stderr.write(f'{label}: outputs differ')
+        self.stdout.write(
+            f'{label:14} {rows:>7} {regular_time * 1000:>10.1f}ms {fast_time * 1000:>10.1f}ms '
+            f'{regular_time / fast_time:>7.1f}x'
+        )
@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+import statistics
+import time
+
+PAGES = ['dashboard', 'equipment_list']
+
+class Command(BaseCommand):
+    help = (
+        'Queries per request (total and against django_session) and median latency of '
+        'the dashboard and equipment list under each session profile'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Requests per page and profile')
+        parser.add_argument('--username', help='User to log in as (default: first superuser)')
+        parser.add_argument(
+            '--profile',
+            action='append',
+            choices=sorted(settings.SESSION_PROFILES),
+            help='Profiles to compare (default: all)',
+        )
+    
+    def handle(self, *args, **options):
+        users = User.objects.filter(username=options['username']) if options['username'] else \
+            User.objects.filter(is_superuser=True)
+        user = users.order_by('pk').first()
+        if user is None:
+            raise CommandError('No user to log in as')
+        if 'testserver' not in settings.ALLOWED_HOSTS:
+            settings.ALLOWED_HOSTS.append('testserver')
+        
+        self.stdout.write(f"{'profile':16} {'page':16} {'queries':>8} {'session':>8} {'median':>9}")
+        self.stdout.write('=' * 61)
+        for profile in options['profile'] or list(settings.SESSION_PROFILES):
+            with override_settings(SESSION_ENGINE=settings.SESSION_PROFILES[profile]):
+                client = Client()
+                client.force_login(user)
+                for page in PAGES:
+                    self.measure(client, profile, page, options['requests'])
+    
+    def measure(self, client, profile, page, requests):
+        url = reverse(page)
+        client.get(url)  # calentar cachés de conteos y plantillas
+        queries, session_queries, timings = [], [], []
+        for _ in range(requests):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise CommandError(f'{url} returned {response.status_code}')
+            queries.append(len(captured))
+            session_queries.append(sum('django_session' in query['sql'] for query in captured))
+        
+        self.stdout.write(
+            f'{profile:16} {page:16} {statistics.mean(queries):>8.1f} {statistics.mean(session_queries):>8.1f} '
+            f'{statistics.median(timings) * 1000:>7.1f}ms'
+        )
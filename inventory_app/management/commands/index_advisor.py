@@ -0,0 +1,94 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import migrations
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.writer import MigrationWriter
+import os
+
+from inventory_app.utils.query_workload import IndexAdvisor, load_workload
+
+class Command(BaseCommand):
+    help = (
+        'Analyze a captured SQL workload (QUERY_WORKLOAD_LOG) and propose composite '
+        'and partial indexes not covered by the current models'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'workload',
+            help='JSON Lines file written by QueryWorkloadMiddleware or capture_workload()',
+        )
+        parser.add_argument(
+            '--min-hits',
+            type=int,
+            default=5,
+            help='Minimum number of queries with the same shape to propose an index',
+        )
+        parser.add_argument(
+            '--write-migration',
+            action='store_true',
+            help='Write a migration with the proposed indexes',
+        )
+        parser.add_argument(
+            '--name',
+            default='advised_indexes',
+            help='Name of the generated migration',
+        )
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['workload']):
+            raise CommandError(f"Workload file not found: {options['workload']}")
+
+        advisor = IndexAdvisor(min_hits=options['min_hits'])
+        advisor.add_workload(load_workload(options['workload']))
+        suggestions = advisor.suggestions()
+
+        self.stdout.write(f'Query shapes analyzed: {len(advisor.shapes)}')
+        if not suggestions:
+            self.stdout.write(self.style.SUCCESS('All frequent query shapes are covered by existing indexes'))
+            return
+
+        self.stdout.write('Proposed indexes:')
+        self.stdout.write('=' * 50)
+        for suggestion in suggestions:
+            self.stdout.write(f'{suggestion}  [{suggestion.hits} queries]')
+            for route in suggestion.routes[:5]:
+                self.stdout.write(f'    {route}')
+
+        # Las migraciones deben ir acompañadas de Meta.indexes: si no, el siguiente
+        # makemigrations generaría un RemoveIndex (como ocurrió con la 0002)
+        self.stdout.write('')
+        self.stdout.write("Add to each model's Meta.indexes:")
+        for suggestion in suggestions:
+            index = suggestion.build_index()
+            self.stdout.write(f'    {suggestion.model.__name__}: {self.index_source(index)}')
+
+        if options['write_migration']:
+            path = self.write_migration(suggestions, options['name'])
+            self.stdout.write(self.style.SUCCESS(f'Migration written: {path}'))
+
+    def index_source(self, index):
+        source, _ = MigrationWriter.serialize(index)
+        return f'{source},'
+
+    def write_migration(self, suggestions, name):
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+        leaf_nodes = loader.graph.leaf_nodes('inventory_app')
+        number = max(
+            (int(migration_name.split('_')[0]) for _, migration_name in leaf_nodes),
+            default=0
+        ) + 1
+
+        migration = migrations.Migration(f'{number:04d}_{name}', 'inventory_app')
+        migration.dependencies = leaf_nodes
+        migration.operations = [
+            migrations.AddIndex(
+                model_name=suggestion.model._meta.model_name,
+                index=suggestion.build_index(),
+            )
+            for suggestion in suggestions
+        ]
+
+        writer = MigrationWriter(migration)
+        with open(writer.path, 'w', encoding='utf-8') as fh:
+            fh.write(writer.as_string())
+        return writer.path
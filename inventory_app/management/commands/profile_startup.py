@@ -0,0 +1,95 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from collections import defaultdict
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Lo que paga cada worker al arrancar: configuración, apps y URLconf completa
+STARTUP_CODE = (
+    'import django; django.setup(); '
+    'from django.urls import get_resolver; get_resolver().url_patterns'
+)
+
+# Dependencias que solo deben cargarse al generar un informe o una exportación
+HEAVY_MODULES = ('pandas', 'numpy', 'reportlab', 'openpyxl')
+
+def run_startup(importtime=False):
+    """Arrancar un intérprete nuevo; devuelve ``(segundos, salida de -X importtime)``."""
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'config.settings'))
+    started = time.perf_counter()
+    result = subprocess.run(
+        command + ['-c', STARTUP_CODE], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise CommandError(f'Startup failed:\n{result.stderr[-2000:]}')
+    return elapsed, result.stderr
+
+def parse_importtime(output):
+    """``{módulo: (propio_us, acumulado_us)}`` a partir de la salida de ``-X importtime``."""
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|', 2)
+        modules[name.strip()] = (int(own), int(cumulative))
+    return modules
+
+class Command(BaseCommand):
+    help = (
+        'Cold startup time of a worker (django.setup() plus the URLconf) in a fresh interpreter, '
+        'with the import-time breakdown by package and module'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Cold starts to time (the best one counts)')
+        parser.add_argument('--top', type=int, default=15, help='Packages and modules to list')
+        parser.add_argument(
+            '--budget',
+            type=float,
+            default=getattr(settings, 'STARTUP_BUDGET_MS', None),
+            help='Fail if the best cold start takes longer (ms; default: STARTUP_BUDGET_MS)',
+        )
+
+    def handle(self, *args, **options):
+        timings = [run_startup()[0] for _ in range(max(1, options['runs']))]
+        modules = parse_importtime(run_startup(importtime=True)[1])
+
+        packages = defaultdict(int)
+        for name, (own, _) in modules.items():
+            packages[name.partition('.')[0]] += own
+
+        self.stdout.write(f"{'package':32} {'self':>10}")
+        self.stdout.write('=' * 43)
+        for name, own in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:options['top']]:
+            self.stdout.write(f'{name:32} {own / 1000:>8.1f}ms')
+
+        self.stdout.write('')
+        self.stdout.write(f"{'module':48} {'self':>10} {'cumulative':>12}")
+        self.stdout.write('=' * 72)
+        slowest = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)[:options['top']]
+        for name, (own, cumulative) in slowest:
+            self.stdout.write(f'{name[:48]:48} {own / 1000:>8.1f}ms {cumulative / 1000:>10.1f}ms')
+
+        best = min(timings) * 1000
+        self.stdout.write('')
+        self.stdout.write(
+            f'Cold startup: best {best:.0f}ms, median {statistics.median(timings) * 1000:.0f}ms '
+            f'over {len(timings)} runs; {len(modules)} modules imported'
+        )
+
+        problems = []
+        heavy = sorted(name for name in modules if name.partition('.')[0] in HEAVY_MODULES and '.' not in name)
+        if heavy:
+            problems.append(f"Heavy modules imported at startup: {', '.join(heavy)}")
+        if options['budget'] is not None and best > options['budget']:
+            problems.append(f"Cold startup {best:.0f}ms exceeds the {options['budget']:.0f}ms budget")
+        if problems:
+            raise CommandError('\n'.join(problems))
+        self.stdout.write(self.style.SUCCESS('Startup within budget'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from inventory_app.utils.sync import prune_changelog, tombstone_retention_days
+
+class Command(BaseCommand):
+    help = 'Compact the sync change sequence and drop tombstones older than the retention period'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Tombstone retention in days (default: SYNC_TOMBSTONE_RETENTION_DAYS or 90)',
+        )
+    
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else tombstone_retention_days()
+        superseded, tombstones = prune_changelog(days)
+        
+        self.stdout.write(f'Superseded entries removed: {superseded}')
+        self.stdout.write(f'Tombstones removed (> {days} days): {tombstones}')
+        self.stdout.write(self.style.SUCCESS('Change log pruned successfully'))
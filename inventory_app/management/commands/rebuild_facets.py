@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from inventory_app.utils.facets import rebuild_facets
+
+class Command(BaseCommand):
+    help = 'Rebuild the cached facet values (location, brand, component type) from scratch'
+    
+    def handle(self, *args, **options):
+        rebuilt = rebuild_facets()
+        for facet, count in rebuilt.items():
+            self.stdout.write(f'{facet:30} {count} values')
+        
+        self.stdout.write(self.style.SUCCESS('Facet values rebuilt successfully'))
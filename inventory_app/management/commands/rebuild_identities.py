@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from inventory_app.utils.identities import rebuild_identities
+
+class Command(BaseCommand):
+    help = 'Rebuild the login identity table (username, email and company email per user) from scratch'
+    
+    def handle(self, *args, **options):
+        rows = rebuild_identities()
+        self.stdout.write(self.style.SUCCESS(f'Login identities rebuilt: {rows} rows'))
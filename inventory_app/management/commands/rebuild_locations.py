@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from inventory_app.models import Location, LocationRollup
+from inventory_app.utils.locations import link_unlinked_equipment, rebuild_rollups
+
+class Command(BaseCommand):
+    help = 'Link equipment to the location tree and rebuild the per-node subtree counts'
+    
+    def handle(self, *args, **options):
+        linked = link_unlinked_equipment()
+        rebuild_rollups()
+        
+        self.stdout.write(f'Equipment linked: {linked}')
+        self.stdout.write(f'Locations:        {Location.objects.count()}')
+        self.stdout.write(f'Rollup rows:      {LocationRollup.objects.count()}')
+        self.stdout.write(self.style.SUCCESS('Location rollups rebuilt successfully'))
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+import time
+
+class Command(BaseCommand):
+    help = (
+        'Delete expired session rows in small batches (unlike clearsessions, which issues '
+        'one DELETE over the whole table). Run it periodically, e.g. hourly from cron'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows deleted per batch')
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between batches')
+    
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE == settings.SESSION_PROFILES['signed_cookies']:
+            self.stdout.write('Signed-cookie sessions keep nothing on the server; rows left from a '
+                              'previous profile are swept anyway')
+        
+        now = timezone.now()
+        expired = Session.objects.filter(expire_date__lt=now).order_by()
+        deleted = 0
+        while True:
+            keys = list(expired.values_list('pk', flat=True)[:options['batch_size']])
+            if not keys:
+                break
+            deleted += Session.objects.filter(pk__in=keys).delete()[0]
+            if options['pause']:
+                time.sleep(options['pause'])
+        
+        self.stdout.write(f'Expired sessions removed: {deleted}')
+        self.stdout.write(self.style.SUCCESS('Sessions swept successfully'))
@@ -1,34 +1,169 @@
-from .models import CompanyUser
+import time
+from functools import partial
 
-class CompanyUserMiddleware:
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.utils.cache import patch_vary_headers
+from django.utils.functional import SimpleLazyObject
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from .utils import metrics, profiling, query_budget, request_logging
+from .utils.profiles import resolve_company_user
+from .utils.query_workload import QueryWorkloadRecorder, append_workload, should_sample
+
+class AsyncCapableMiddleware:
+    """
+    Base para middlewares que funcionan con WSGI y con ASGI: en ASGI no
+    obligan a Django a ejecutar la petición en un hilo. Las subclases
+    implementan ``process_response``.
+    """
+    sync_capable = True
+    async_capable = True
+    
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+    
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+    
+    def process_response(self, request, response):
+        return response
 
+class MetricsMiddleware(AsyncCapableMiddleware):
+    """
+    Latencia, consultas SQL, tamaño y estado de cada petición por ruta, para
+    ``/metrics`` (ver ``utils.metrics``). Va la primera de ``MIDDLEWARE`` para
+    medir la petición completa. Se desactiva con ``METRICS_DIR`` vacío.
+    """
+    def __init__(self, get_response):
+        if not metrics.metrics_dir():
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        connection_created.connect(metrics.install_sql_timer)
+        metrics.install_sql_timers()
+    
     def __call__(self, request):
-        # Asegurar que cada usuario autenticado tenga un CompanyUser
-        if request.user.is_authenticated:
-            try:
-                # Intentar acceder al companyuser para forzar la creación si no existe
-                request.user.companyuser
-            except CompanyUser.DoesNotExist:
-                # Crear CompanyUser por defecto
-                CompanyUser.objects.create(
-                    user=request.user,
-                    department='IT',
-                    phone='000-000-0000',
-                    email=f'{request.user.username}@tuempresa.com'
-                )
-        
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token, started = metrics.start_request(), time.perf_counter()
         response = self.get_response(request)
+        metrics.finish_request(request, response, started, token)
         return response
     
-class SecurityHeadersMiddleware:
+    async def __acall__(self, request):
+        token, started = metrics.start_request(), time.perf_counter()
+        response = await self.get_response(request)
+        metrics.finish_request(request, response, started, token)
+        return response
+
+class RequestLogMiddleware(AsyncCapableMiddleware):
+    """
+    Identificador de petición (``X-Request-ID``) y un registro por petición
+    con ruta, usuario, estado, duración y consultas SQL en
+    ``inventory_app.requests`` (ver ``utils.request_logging``). Va justo
+    después de ``MetricsMiddleware``, que cuenta las consultas.
+    """
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token, started = request_logging.start_request(request)
+        response = self.get_response(request)
+        return request_logging.finish_request(request, response, started, token)
+    
+    async def __acall__(self, request):
+        token, started = request_logging.start_request(request)
+        response = await self.get_response(request)
+        return request_logging.finish_request(request, response, started, token)
+
+class CompanyUserMiddleware(AsyncCapableMiddleware):
+    """
+    ``request.company_user``: el perfil del usuario, resuelto la primera vez
+    que se usa (ver ``utils.profiles``)
+    """
+    def __call__(self, request):
+        request.company_user = SimpleLazyObject(partial(resolve_company_user, request))
+        return super().__call__(request)
+    
+class ProfilingMiddleware(AsyncCapableMiddleware):
+    """
+    Perfilado de una petición a petición de un administrador (``X-Profile: 1``
+    o ``?_profile=1``); ver ``utils.profiling``. Se desactiva con
+    ``PROFILE_DIR`` vacío.
+    """
     def __init__(self, get_response):
-        self.get_response = get_response
+        if not profiling.profile_dir():
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+    
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        mode = profiling.requested_mode(request)
+        if mode is None:
+            return self.get_response(request)
+        with profiling.ProfiledRequest(request, mode) as profiled:
+            response = self.get_response(request)
+        return profiled.finish(response)
+    
+    async def __acall__(self, request):
+        if profiling.profile_flag(request) is None:
+            return await self.get_response(request)
+        # Comprobar el usuario carga la sesión: fuera del bucle de eventos
+        mode = await sync_to_async(profiling.requested_mode)(request, is_async=True)
+        if mode is None:
+            return await self.get_response(request)
+        with profiling.ProfiledRequest(request, mode) as profiled:
+            response = await self.get_response(request)
+        return await sync_to_async(profiled.finish)(response)
 
+class QueryInspectionMiddleware(AsyncCapableMiddleware):
+    """
+    Presupuestos de consultas y detección de N+1 (ver ``utils.query_budget``)
+    en una fracción ``QUERY_INSPECTION_SAMPLE_RATE`` de las peticiones. Con
+    ``QUERY_INSPECTION_RAISE`` (tests) una infracción es un error.
+    """
+    def __init__(self, get_response):
+        self.sample_rate = getattr(settings, 'QUERY_INSPECTION_SAMPLE_RATE', 0)
+        if not self.sample_rate:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.raise_errors = getattr(settings, 'QUERY_INSPECTION_RAISE', False)
+    
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not should_sample(self.sample_rate):
+            return self.get_response(request)
+        inspector, token = query_budget.push_inspector()
         response = self.get_response(request)
-        
+        query_budget.finish_request(request, inspector, token, self.raise_errors)
+        return response
+    
+    async def __acall__(self, request):
+        if not should_sample(self.sample_rate):
+            return await self.get_response(request)
+        inspector, token = query_budget.push_inspector()
+        response = await self.get_response(request)
+        query_budget.finish_request(request, inspector, token, self.raise_errors)
+        return response
+    
+class SecurityHeadersMiddleware(AsyncCapableMiddleware):
+    def process_response(self, request, response):
         # Headers de seguridad
         response['X-Content-Type-Options'] = 'nosniff'
         response['X-Frame-Options'] = 'DENY'
@@ -36,3 +171,106 @@ class SecurityHeadersMiddleware:
         response['Referrer-Policy'] = 'same-origin'
         
         return response
+
+class QueryWorkloadMiddleware:
+    """
+    Registrar las consultas SQL reales de cada petición para el asesor de
+    índices (``manage.py index_advisor``). Solo se activa si está definido
+    ``QUERY_WORKLOAD_LOG``.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.log_path = getattr(settings, 'QUERY_WORKLOAD_LOG', None)
+        self.sample_rate = getattr(settings, 'QUERY_WORKLOAD_SAMPLE_RATE', 1.0)
+        if not self.log_path:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        if not should_sample(self.sample_rate):
+            return self.get_response(request)
+
+        recorder = QueryWorkloadRecorder()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match is not None else request.path
+        append_workload(self.log_path, recorder.entries, route)
+        return response
+
+def accepted_encodings(header):
+    """Codificaciones aceptadas (``q`` > 0) de una cabecera Accept-Encoding"""
+    accepted = set()
+    for part in header.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name and quality > 0:
+            accepted.add(name.strip())
+    return accepted
+
+class CompressionMiddleware(AsyncCapableMiddleware):
+    """
+    Compresión negociada de las respuestas de texto y JSON a partir de
+    ``COMPRESSION_MIN_SIZE`` bytes: brotli si el cliente lo acepta y el paquete
+    está instalado, si no gzip (con la mitigación de BREACH de Django).
+    
+    Las respuestas que fijan la cookie CSRF (las páginas con formularios) no
+    se comprimen: llevan un secreto en el cuerpo y brotli no tiene mitigación
+    contra BREACH.
+    """
+    COMPRESSIBLE_TYPES = (
+        'application/json', 'text/', 'application/javascript', 'image/svg+xml',
+    )
+    gzip_max_random_bytes = 100
+    
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        self.brotli_quality = getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5)
+    
+    def choose_encoding(self, request):
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in accepted:
+            return 'br'
+        if 'gzip' in accepted:
+            return 'gzip'
+        return None
+    
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if settings.CSRF_COOKIE_NAME in response.cookies:
+            return response
+        if len(response.content) < self.min_size:
+            return response
+        content_type = response.get('Content-Type', '')
+        if not content_type.startswith(self.COMPRESSIBLE_TYPES):
+            return response
+        
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = self.choose_encoding(request)
+        if encoding is None:
+            return response
+        
+        if encoding == 'br':
+            compressed = brotli.compress(response.content, quality=self.brotli_quality)
+        else:
+            compressed = compress_string(response.content, max_random_bytes=self.gzip_max_random_bytes)
+        if len(compressed) >= len(response.content):
+            return response
+        
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # La representación comprimida es distinta: el ETag fuerte pasa a débil
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:10
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+FACET_FIELDS = {
+    'Equipment': ('location', 'brand'),
+    'Component': ('component_type',),
+}
+
+
+def backfill_facets(apps, schema_editor):
+    FacetValue = apps.get_model('inventory_app', 'FacetValue')
+    for model_name, fields in FACET_FIELDS.items():
+        model = apps.get_model('inventory_app', model_name)
+        for field in fields:
+            rows = model.objects.order_by().values(field).annotate(total=Count('pk'))
+            FacetValue.objects.bulk_create([
+                FacetValue(facet=f'{model_name.lower()}.{field}', value=row[field], count=row['total'])
+                for row in rows if row[field]
+            ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0003_restore_baseline_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(max_length=50)),
+                ('value', models.CharField(max_length=100)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['facet', '-count', 'value'],
+                'indexes': [models.Index(fields=['facet', '-count'], name='facetvalue_facet_count_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='facetvalue',
+            constraint=models.UniqueConstraint(fields=('facet', 'value'), name='facetvalue_facet_value_uniq'),
+        ),
+        migrations.RunPython(backfill_facets, migrations.RunPython.noop),
+    ]
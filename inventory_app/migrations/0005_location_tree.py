@@ -0,0 +1,136 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:12
+
+import re
+from collections import Counter
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils.text import slugify
+
+# Copia de inventory_app.utils.locations en el momento de esta migración: los
+# cambios posteriores del módulo no deben alterar cómo se construyó el árbol
+
+PATH_SEPARATOR = '/'
+
+LEVEL_SPLIT_RE = re.compile(r'\s*(?:/|>|»|→|\\|\|)\s*|\s+-\s+|\s*,\s*')
+
+LEVEL_KEYWORDS = (
+    ('SIT', re.compile(r'^(sede|site|campus|planta industrial)\b', re.IGNORECASE)),
+    ('BLD', re.compile(r'^(edificio|edif\.?|building|bldg|torre|bloque|nave)\b', re.IGNORECASE)),
+    ('FLO', re.compile(r'^(piso|planta|floor|nivel|level)\b', re.IGNORECASE)),
+    ('ROO', re.compile(r'^(sala|oficina|office|room|aula|despacho|laboratorio|lab|almac[eé]n)\b', re.IGNORECASE)),
+)
+
+LEVELS_BY_DEPTH = ('SIT', 'BLD', 'FLO', 'ROO')
+
+
+def parse_location(text):
+    parts = [part.strip() for part in LEVEL_SPLIT_RE.split(text or '') if part and part.strip()]
+    parsed = []
+    for depth, name in enumerate(parts):
+        level = None
+        for code, pattern in LEVEL_KEYWORDS:
+            if pattern.match(name):
+                level = code
+                break
+        if level is None:
+            level = LEVELS_BY_DEPTH[min(depth, len(LEVELS_BY_DEPTH) - 1)]
+        parsed.append((name[:100], level))
+    return parsed
+
+
+def segment(name):
+    return slugify(name)[:40] or 'x'
+
+
+def ancestor_paths(path):
+    segments = [s for s in path.split(PATH_SEPARATOR) if s]
+    return [
+        PATH_SEPARATOR.join(segments[:i]) + PATH_SEPARATOR
+        for i in range(1, len(segments) + 1)
+    ]
+
+
+def build_location_tree(apps, schema_editor):
+    """Convertir los textos de ubicación existentes en nodos y precalcular conteos"""
+    Equipment = apps.get_model('inventory_app', 'Equipment')
+    Location = apps.get_model('inventory_app', 'Location')
+    LocationRollup = apps.get_model('inventory_app', 'LocationRollup')
+
+    nodes = {}
+    for text in Equipment.objects.order_by().values_list('location', flat=True).distinct():
+        parent = None
+        for depth, (name, level) in enumerate(parse_location(text)):
+            path = (parent.path if parent else '') + segment(name) + PATH_SEPARATOR
+            if len(path) > 255:
+                break
+            if path not in nodes:
+                nodes[path] = Location.objects.create(
+                    name=name, parent=parent, level=level, depth=depth, path=path
+                )
+            parent = nodes[path]
+        if parent is not None:
+            Equipment.objects.filter(location=text).update(location_node=parent, location_path=parent.path)
+
+    totals = Counter()
+    rows = (
+        Equipment.objects.exclude(location_path='').order_by()
+        .values('location_path', 'status', 'type').annotate(total=models.Count('pk'))
+    )
+    for row in rows:
+        for path in ancestor_paths(row['location_path']):
+            totals[(path, row['status'], row['type'])] += row['total']
+    LocationRollup.objects.bulk_create([
+        LocationRollup(location=nodes[path], status=status, type=type_, count=count)
+        for (path, status, type_), count in totals.items()
+        if path in nodes
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0004_facet_values'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('level', models.CharField(choices=[('SIT', 'Sede'), ('BLD', 'Edificio'), ('FLO', 'Piso'), ('ROO', 'Sala')], max_length=3)),
+                ('depth', models.PositiveSmallIntegerField(default=0)),
+                ('path', models.CharField(max_length=255, unique=True)),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='inventory_app.location')),
+            ],
+            options={
+                'ordering': ['path'],
+            },
+        ),
+        migrations.AddField(
+            model_name='equipment',
+            name='location_path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.CreateModel(
+            name='LocationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('AVA', 'Available'), ('INU', 'In Use'), ('REP', 'In Repair'), ('RET', 'Retired'), ('LOS', 'Lost'), ('DIS', 'Disposed')], max_length=3)),
+                ('type', models.CharField(choices=[('LAP', 'Laptop'), ('DES', 'Desktop'), ('MON', 'Monitor'), ('PRI', 'Printer'), ('NET', 'Network Device'), ('SER', 'Server'), ('PHO', 'Phone'), ('TAB', 'Tablet'), ('OTH', 'Other')], max_length=3)),
+                ('count', models.IntegerField(default=0)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='inventory_app.location')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='equipment',
+            name='location_node',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='equipment', to='inventory_app.location'),
+        ),
+        migrations.AddConstraint(
+            model_name='locationrollup',
+            constraint=models.UniqueConstraint(fields=('location', 'status', 'type'), name='locationrollup_uniq'),
+        ),
+        migrations.RunPython(build_location_tree, migrations.RunPython.noop),
+    ]
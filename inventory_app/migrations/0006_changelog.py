@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:18
+
+from django.db import migrations, models
+
+
+BACKFILL_CHUNK_SIZE = 2000
+
+
+def backfill_changelog(apps, schema_editor):
+    # Una entrada por objeto existente: la primera sincronización (sin cursor)
+    # descarga el inventario completo desde la secuencia. Las claves se leen
+    # por bloques para no cargar en memoria las de tablas enteras
+    ChangeLog = apps.get_model('inventory_app', 'ChangeLog')
+    for sync_name, model_name in [('equipment', 'Equipment'), ('component', 'Component'),
+                                  ('maintenance', 'MaintenanceLog'), ('ticket', 'SupportTicket')]:
+        model = apps.get_model('inventory_app', model_name)
+        last = 0
+        while True:
+            pks = list(
+                model.objects.filter(pk__gt=last).order_by('pk')
+                .values_list('pk', flat=True)[:BACKFILL_CHUNK_SIZE]
+            )
+            if not pks:
+                break
+            ChangeLog.objects.bulk_create([
+                ChangeLog(model_name=sync_name, object_id=pk, operation='U') for pk in pks
+            ], batch_size=500)
+            last = pks[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0005_location_tree'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('model_name', models.CharField(max_length=50)),
+                ('object_id', models.PositiveIntegerField()),
+                ('operation', models.CharField(choices=[('U', 'Upsert'), ('D', 'Delete')], max_length=1)),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['model_name', 'object_id', 'id'], name='changelog_object_idx'), models.Index(fields=['changed_at'], name='changelog_changed_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_changelog, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0006_changelog'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['model_name', 'id'], name='changelog_model_seq_idx'),
+        ),
+    ]
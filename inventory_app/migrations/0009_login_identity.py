@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_identities(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    LoginIdentity = apps.get_model('inventory_app', 'LoginIdentity')
+    rows = []
+    for pk, username, email, company_email in User.objects.values_list(
+        'pk', 'username', 'email', 'companyuser__email'
+    ):
+        effective = company_email if company_email is not None else (email or '')
+        company_domain = effective.endswith('@tuempresa.com')
+        identifiers = {value or '' for value in (username, email, company_email)}
+        identifiers.discard('')
+        rows.extend(
+            LoginIdentity(identifier=identifier, user_id=pk, company_domain=company_domain)
+            for identifier in identifiers
+        )
+    LoginIdentity.objects.bulk_create(rows, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory_app', '0008_revoked_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoginIdentity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('identifier', models.CharField(max_length=254)),
+                ('company_domain', models.BooleanField(default=False)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='login_identities', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='loginidentity',
+            constraint=models.UniqueConstraint(fields=('identifier', 'user'), name='loginidentity_identifier_user_uniq'),
+        ),
+        migrations.RunPython(backfill_identities, migrations.RunPython.noop),
+    ]
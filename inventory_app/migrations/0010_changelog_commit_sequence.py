@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:31
+
+from django.db import migrations, models
+
+
+def number_existing_changes(apps, schema_editor):
+    # Los cambios ya registrados conservan su id como número de secuencia:
+    # los cursores emitidos hasta ahora siguen siendo válidos
+    ChangeLog = apps.get_model('inventory_app', 'ChangeLog')
+    ChangeSequence = apps.get_model('inventory_app', 'ChangeSequence')
+    ChangeLog.objects.update(sequence=models.F('id'))
+    last = ChangeLog.objects.aggregate(last=models.Max('id'))['last']
+    ChangeSequence.objects.create(pk=1, value=last or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0009_login_identity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='changelog',
+            name='changelog_model_seq_idx',
+        ),
+        migrations.AddField(
+            model_name='changelog',
+            name='sequence',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['model_name', 'sequence'], name='changelog_model_sequence_idx'),
+        ),
+        migrations.RunPython(number_existing_changes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0010_changelog_commit_sequence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='maintenancelog',
+            index=models.Index(fields=['equipment', '-start_date'], name='maintenance_equipment_idx'),
+        ),
+    ]
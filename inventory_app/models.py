@@ -17,6 +17,32 @@ class CompanyUser(models.Model):
     def __str__(self):
         return f"{self.user.first_name} {self.user.last_name} ({self.department})"
 
+class Location(models.Model):
+    """
+    Jerarquía de ubicaciones sede → edificio → piso → sala.
+
+    ``path`` es una ruta materializada (``sede-central/edificio-3/``) que
+    permite obtener todo un subárbol con una única búsqueda por rango indexada.
+    """
+    LEVEL_CHOICES = (
+        ('SIT', 'Sede'),
+        ('BLD', 'Edificio'),
+        ('FLO', 'Piso'),
+        ('ROO', 'Sala'),
+    )
+    
+    name = models.CharField(max_length=100)
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children')
+    level = models.CharField(max_length=3, choices=LEVEL_CHOICES)
+    depth = models.PositiveSmallIntegerField(default=0)
+    path = models.CharField(max_length=255, unique=True)
+    
+    class Meta:
+        ordering = ['path']
+    
+    def __str__(self):
+        return f"{self.get_level_display()} {self.name}"
+
 class Equipment(models.Model):
     EQUIPMENT_TYPES = (
         ('LAP', 'Laptop'),
@@ -46,6 +72,9 @@ class Equipment(models.Model):
     purchase_date = models.DateField()
     warranty_expiry = models.DateField(null=True, blank=True)
     location = models.CharField(max_length=100)
+    # Nodo normalizado y su ruta materializada (se derivan de ``location``)
+    location_node = models.ForeignKey(Location, on_delete=models.SET_NULL, null=True, blank=True, related_name='equipment', editable=False)
+    location_path = models.CharField(max_length=255, blank=True, db_index=True, editable=False)
     status = models.CharField(max_length=3, choices=STATUS_CHOICES, default='AVA')
     assigned_to = models.ForeignKey(CompanyUser, on_delete=models.SET_NULL, null=True, blank=True)
     notes = models.TextField(blank=True)
@@ -54,10 +83,32 @@ class Equipment(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'type'], name='inventory_a_status_aa0ee1_idx'),
+            models.Index(fields=['purchase_date'], name='inventory_a_purchas_752e8a_idx'),
+            models.Index(fields=['warranty_expiry'], name='equipment_warranty_idx'),
+            models.Index(fields=['location'], name='equipment_location_idx'),
+            models.Index(fields=['-created_at'], name='equipment_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_type_display()} - {self.brand} {self.model} ({self.serial_number})"
 
+class LocationRollup(models.Model):
+    """Número de equipos de todo el subárbol de una ubicación, por estado y tipo"""
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='rollups')
+    status = models.CharField(max_length=3, choices=Equipment.STATUS_CHOICES)
+    type = models.CharField(max_length=3, choices=Equipment.EQUIPMENT_TYPES)
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['location', 'status', 'type'], name='locationrollup_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.location} - {self.status}/{self.type}: {self.count}"
+
 class Component(models.Model):
     equipment = models.ForeignKey(Equipment, related_name='components', on_delete=models.CASCADE)
     component_type = models.CharField(max_length=50)
@@ -101,6 +152,16 @@ class MaintenanceLog(models.Model):
     
     class Meta:
         ordering = ['-start_date']
+        indexes = [
+            models.Index(fields=['-start_date'], name='maintenance_start_idx'),
+            # Último mantenimiento de cada equipo (listado del admin)
+            models.Index(fields=['equipment', '-start_date'], name='maintenance_equipment_idx'),
+            # Mantenimientos pendientes/atrasados (dashboard y alertas)
+            models.Index(
+                fields=['start_date'], condition=models.Q(end_date__isnull=True),
+                name='maintenance_pending_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.get_maintenance_type_display()} - {self.equipment} - {self.title}"
@@ -127,6 +188,11 @@ class AuditLog(models.Model):
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['timestamp'], name='inventory_a_timesta_70855e_idx'),
+            models.Index(fields=['user', 'timestamp'], name='inventory_a_user_id_c1aff7_idx'),
+            models.Index(fields=['model_name', 'object_id'], name='inventory_a_model_n_261f0e_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user} - {self.get_action_display()} - {self.model_name} at {self.timestamp}"
@@ -159,6 +225,115 @@ class SupportTicket(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'priority'], name='inventory_a_status_898764_idx'),
+            models.Index(fields=['created_by', 'created_at'], name='inventory_a_created_a5ad85_idx'),
+            models.Index(fields=['-created_at'], name='ticket_created_idx'),
+            # Tickets activos por prioridad (tickets críticos del dashboard)
+            models.Index(
+                fields=['priority'], condition=models.Q(status__in=['OPEN', 'IN_PROGRESS']),
+                name='ticket_active_priority_idx'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.title} - {self.get_status_display()}"
+
+class FacetValue(models.Model):
+    """
+    Valores distintos de campos de texto libre usados como filtro (ubicación,
+    marca, tipo de componente) con su número de registros. Se mantiene de forma
+    incremental en cada escritura (ver ``utils.facets``).
+    """
+    facet = models.CharField(max_length=50)
+    value = models.CharField(max_length=100)
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['facet', '-count', 'value']
+        constraints = [
+            models.UniqueConstraint(fields=['facet', 'value'], name='facetvalue_facet_value_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['facet', '-count'], name='facetvalue_facet_count_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.facet}: {self.value} ({self.count})"
+
+class ChangeLog(models.Model):
+    """
+    Secuencia monótona de cambios (altas, modificaciones y bajas) de los modelos
+    sincronizables. ``sequence`` es el número que avanza el cursor de
+    ``/api/v1/sync/``; se asigna después del commit, en orden de confirmación
+    (ver ``utils.sync``). Las bajas quedan como lápidas.
+    """
+    OPERATION_CHOICES = (
+        ('U', 'Upsert'),
+        ('D', 'Delete'),
+    )
+    
+    id = models.BigAutoField(primary_key=True)
+    model_name = models.CharField(max_length=50)
+    object_id = models.PositiveIntegerField()
+    operation = models.CharField(max_length=1, choices=OPERATION_CHOICES)
+    changed_at = models.DateTimeField(auto_now_add=True)
+    sequence = models.BigIntegerField(null=True, blank=True, unique=True, editable=False)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['model_name', 'object_id', 'id'], name='changelog_object_idx'),
+            models.Index(fields=['model_name', 'sequence'], name='changelog_model_sequence_idx'),
+            models.Index(fields=['changed_at'], name='changelog_changed_idx'),
+        ]
+    
+    def __str__(self):
+        return f"#{self.id} {self.get_operation_display()} {self.model_name} {self.object_id}"
+
+class ChangeSequence(models.Model):
+    """
+    Último ``ChangeLog.sequence`` asignado. Una sola fila, que además
+    serializa la numeración: se actualiza al empezar y queda bloqueada hasta
+    el commit.
+    """
+    value = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return str(self.value)
+
+class RevokedToken(models.Model):
+    """
+    Revocaciones de los tokens firmados de la API (ver ``authentication``): un
+    token concreto (``jti``) o, sin ``jti``, todos los emitidos para
+    ``user_id`` antes de ``revoked_at``. Se conservan hasta ``expires_at``,
+    cuando los tokens afectados ya han caducado.
+    """
+    jti = models.CharField(max_length=32, blank=True)
+    user_id = models.PositiveIntegerField()
+    revoked_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f"{self.jti or 'todos'} (usuario {self.user_id})"
+
+class LoginIdentity(models.Model):
+    """
+    Identificadores de inicio de sesión (nombre de usuario, email y email de
+    empresa, tal cual: se comparan de forma exacta) de cada usuario, para que
+    ``CompanyEmailBackend`` lo encuentre con una búsqueda indexada.
+    ``company_domain`` guarda si el email efectivo del usuario es del dominio
+    de la empresa. Se mantiene en cada alta o cambio de ``User`` y
+    ``CompanyUser`` (ver ``utils.identities``).
+    """
+    identifier = models.CharField(max_length=254)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='login_identities')
+    company_domain = models.BooleanField(default=False)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['identifier', 'user'], name='loginidentity_identifier_user_uniq'),
+        ]
     
     def __str__(self):
-        return f"{self.title} - {self.get_status_display()}"
\ No newline at end of file
+        return f"{self.identifier} → {self.user_id}"
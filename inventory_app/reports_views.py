@@ -1,6 +1,6 @@
 from django.views.generic import View
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import JsonResponse, HttpResponse
+from django.http import HttpResponse
 from django.db.models import Count, Sum, Avg, Q
 from django.utils import timezone
 from django.shortcuts import render
@@ -8,15 +8,10 @@ from datetime import datetime, timedelta
 import json
 import csv
 from io import StringIO, BytesIO
-import pandas as pd
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
 
-from .models import Equipment, MaintenanceLog, SupportTicket
+from .models import Equipment, MaintenanceLog, SupportTicket, LocationRollup
 from .forms import AdvancedReportForm
+from .utils.fast_json import FastJsonResponse
 
 class AdvancedReportsView(LoginRequiredMixin, View):
     def get(self, request):
@@ -82,11 +77,24 @@ class AdvancedReportsView(LoginRequiredMixin, View):
             'by_type': list(equipment_data.values('type').annotate(count=Count('id'))),
             'by_status': list(equipment_data.values('status').annotate(count=Count('id'))),
             'by_location': list(equipment_data.values('location').annotate(count=Count('id')).order_by('-count')[:10]),
+            'by_location_tree': self.get_location_rollup(form_data),
             'acquisition_timeline': self.get_acquisition_timeline(equipment_data, start_date, end_date)
         }
         
         return {'equipment_summary': summary}
     
+    def get_location_rollup(self, form_data, max_depth=1):
+        # Totales por sede y edificio desde los conteos de subárbol precalculados
+        rollups = LocationRollup.objects.filter(location__depth__lte=max_depth)
+        if form_data.get('equipment_type'):
+            rollups = rollups.filter(type__in=form_data['equipment_type'])
+        if form_data.get('status_filter'):
+            rollups = rollups.filter(status__in=form_data['status_filter'])
+        
+        return list(rollups.values(
+            'location__path', 'location__name', 'location__level', 'location__depth'
+        ).annotate(count=Sum('count')).filter(count__gt=0).order_by('location__path'))
+    
     def maintenance_costs_report(self, start_date, end_date, form_data):
         maintenance_data = MaintenanceLog.objects.filter(
             start_date__range=[start_date, end_date]
@@ -208,6 +216,11 @@ class AdvancedReportsView(LoginRequiredMixin, View):
         return HttpResponse("Formato no soportado")
     
     def export_to_pdf(self, report_data, form_data):
+        # reportlab solo se carga al generar un PDF, no al arrancar cada worker
+        from reportlab.lib.pagesizes import letter
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.platypus import SimpleDocTemplate, Paragraph
+        
         response = HttpResponse(content_type='application/pdf')
         response['Content-Disposition'] = f'attachment; filename="report_{datetime.now().strftime("%Y%m%d_%H%M")}.pdf"'
         
@@ -238,7 +251,7 @@ class ChartsDataAPIView(LoginRequiredMixin, View):
         date_range = request.GET.get('date_range', 'last_30_days')
         
         data = self.get_chart_data(chart_type, date_range)
-        return JsonResponse(data)
+        return FastJsonResponse(data)
     
     def get_chart_data(self, chart_type, date_range):
         # Lógica para generar datos de gráficos específicos
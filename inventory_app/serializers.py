@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Equipment, MaintenanceLog, CompanyUser, SupportTicket
+from .models import Equipment, MaintenanceLog, CompanyUser, SupportTicket, Component
 
 class CompanyUserSerializer(serializers.ModelSerializer):
     full_name = serializers.CharField(source='user.get_full_name', read_only=True)
@@ -25,6 +25,26 @@ class EquipmentSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['created_at', 'updated_at']
 
+class EquipmentBulkItemSerializer(EquipmentSerializer):
+    """
+    Elemento de una escritura masiva. La unicidad de ``serial_number`` y la
+    existencia de ``assigned_to`` se comprueban por lote en la vista, no aquí
+    """
+    serial_number = serializers.CharField(max_length=100)
+    assigned_to = serializers.IntegerField(allow_null=True, required=False)
+    
+    class Meta(EquipmentSerializer.Meta):
+        pass
+
+class ComponentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Component
+        fields = [
+            'id', 'equipment', 'component_type', 'brand', 'model',
+            'serial_number', 'specifications', 'installed_date'
+        ]
+        read_only_fields = ['installed_date']
+
 class MaintenanceLogSerializer(serializers.ModelSerializer):
     equipment_detail = EquipmentSerializer(source='equipment', read_only=True)
     technician_detail = CompanyUserSerializer(source='technician', read_only=True)
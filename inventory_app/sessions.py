@@ -0,0 +1,47 @@
+"""
+Sesiones en cookie firmada con límite de tamaño (``SESSION_PROFILE=signed_cookies``).
+
+Los navegadores descartan sin avisar las cookies de más de ~4 KB, lo que
+cerraría la sesión del usuario. Al guardar, si la cookie supera
+``SESSION_COOKIE_MAX_SIZE`` se quitan primero las claves que son solo caché
+(se recalculan en la siguiente petición) y, si aun así no cabe, se lanza
+:class:`SessionTooLarge` en lugar de enviar una cookie que se perdería.
+"""
+import logging
+
+from django.conf import settings
+from django.contrib.sessions.backends import signed_cookies
+
+from .utils.profiles import PROFILE_SESSION_KEY
+
+logger = logging.getLogger(__name__)
+
+# Claves que se pueden descartar: se reconstruyen desde la base de datos
+DISPOSABLE_KEYS = (PROFILE_SESSION_KEY,)
+
+
+class SessionTooLarge(Exception):
+    pass
+
+
+def cookie_max_size():
+    return getattr(settings, 'SESSION_COOKIE_MAX_SIZE', 3800)
+
+
+class SessionStore(signed_cookies.SessionStore):
+    def save(self, must_create=False):
+        super().save(must_create)
+        if len(self._session_key) <= cookie_max_size():
+            return
+        
+        for key in DISPOSABLE_KEYS:
+            self._session.pop(key, None)
+        super().save(must_create)
+        if len(self._session_key) > cookie_max_size():
+            logger.error(
+                'Sesión de %s bytes (máximo %s): claves %s',
+                len(self._session_key), cookie_max_size(), sorted(self._session),
+            )
+            raise SessionTooLarge(
+                f'La sesión firmada ocupa {len(self._session_key)} bytes (máximo {cookie_max_size()})'
+            )
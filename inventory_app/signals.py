@@ -0,0 +1,147 @@
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from . import authentication
+from .models import Equipment, Component, MaintenanceLog, AuditLog, SupportTicket, CompanyUser, Location, LocationRollup
+from .utils import facets, identities, locations, sync
+from .utils.counting import bump_table_generation
+from .utils.profiles import bump_profile_version
+
+TRACKED_MODELS = (Equipment, Component, MaintenanceLog, AuditLog, SupportTicket, CompanyUser, Location)
+
+# Campos cuyo valor previo se necesita para mantener facetas y conteos de subárbol
+SNAPSHOT_FIELDS = {
+    Equipment: ('location', 'brand', 'status', 'type', 'location_path'),
+    Component: ('component_type',),
+}
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_cached_counts(sender, using=None, **kwargs):
+    """Invalidar los conteos cacheados de la tabla modificada"""
+    if sender in TRACKED_MODELS:
+        bump_table_generation(sender._meta.db_table, using=using)
+
+
+@receiver(post_save, sender=User)
+def invalidate_company_user_data(sender, update_fields=None, using=None, **kwargs):
+    """El nombre y el email del usuario aparecen en los datos de CompanyUser"""
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return  # cada inicio de sesión guarda last_login
+    bump_table_generation(User._meta.db_table, using=using)
+    bump_table_generation(CompanyUser._meta.db_table, using=using)
+
+
+@receiver(post_save, sender=CompanyUser)
+@receiver(post_delete, sender=CompanyUser)
+def invalidate_cached_profile(sender, instance, **kwargs):
+    """El perfil cacheado en las sesiones del usuario deja de valer"""
+    bump_profile_version(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def sync_user_login_identities(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Nombre de usuario y email en la tabla de inicio de sesión"""
+    if raw or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    identities.sync_user_identities(instance)
+
+
+@receiver(post_save, sender=CompanyUser)
+def sync_company_login_identities(sender, instance, raw=False, **kwargs):
+    if not raw:
+        identities.sync_user_identities(instance.user, company_user=instance)
+
+
+@receiver(post_delete, sender=CompanyUser)
+def remove_company_login_identity(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, User):
+        return  # se borra el usuario y, en cascada, sus identificadores
+    user = User.objects.filter(pk=instance.user_id).first()
+    if user is not None:
+        identities.sync_user_identities(user, company_user=None)
+
+
+@receiver(post_save, sender=User)
+def forget_credentials_on_change(sender, instance, raw=False, update_fields=None, using=None, **kwargs):
+    """Un cambio de contraseña, de estado o de permisos invalida los tokens emitidos"""
+    if raw:
+        return
+    if update_fields is not None and not set(update_fields) & set(authentication.CREDENTIAL_FIELDS):
+        return
+    authentication.forget_credentials(instance.pk, using=using)
+
+
+@receiver(post_delete, sender=User)
+def forget_credentials_on_delete(sender, instance, using=None, **kwargs):
+    authentication.forget_credentials(instance.pk, using=using)
+
+
+def _touches(sender, update_fields):
+    return update_fields is None or bool(set(update_fields) & set(SNAPSHOT_FIELDS[sender]))
+
+
+@receiver(pre_save, sender=Equipment)
+@receiver(pre_save, sender=Component)
+def remember_previous_values(sender, instance, update_fields=None, **kwargs):
+    """Guardar los valores previos para calcular los deltas tras el guardado"""
+    instance._previous_values = None
+    if not _touches(sender, update_fields):
+        return
+    if not instance._state.adding and instance.pk is not None:
+        instance._previous_values = sender._default_manager.filter(
+            pk=instance.pk
+        ).values(*SNAPSHOT_FIELDS[sender]).first()
+
+    if sender is Equipment:
+        # Enlazar el texto libre de ubicación con su nodo de la jerarquía
+        previous = instance._previous_values
+        if previous is None or previous['location'] != instance.location or not instance.location_path:
+            node = locations.resolve_location(instance.location)
+            instance.location_node = node
+            instance.location_path = node.path if node else ''
+
+
+@receiver(post_save, sender=Equipment)
+@receiver(post_save, sender=Component)
+def update_derived_data_on_save(sender, instance, created, update_fields=None, using=None, **kwargs):
+    if not _touches(sender, update_fields):
+        return
+    previous = getattr(instance, '_previous_values', None)
+    facets.apply_save(instance, previous, created)
+
+    if sender is Equipment:
+        deltas = Counter()
+        if previous is not None and not created:
+            deltas[locations.rollup_key(previous)] -= 1
+        deltas[locations.equipment_rollup_key(instance)] += 1
+        locations.adjust_rollups(deltas)
+        bump_table_generation(LocationRollup._meta.db_table, using=using)
+    instance._previous_values = None
+
+
+@receiver(post_delete, sender=Equipment)
+@receiver(post_delete, sender=Component)
+def update_derived_data_on_delete(sender, instance, using=None, **kwargs):
+    facets.adjust_facets_for_objects(sender, [instance], sign=-1)
+    if sender is Equipment:
+        locations.adjust_rollups({locations.equipment_rollup_key(instance): -1})
+        bump_table_generation(LocationRollup._meta.db_table, using=using)
+
+
+@receiver(post_save)
+def record_sync_upsert(sender, instance, raw=False, **kwargs):
+    """Añadir el cambio a la secuencia de sincronización"""
+    if sender in sync.SYNC_NAMES and not raw:
+        sync.record_change(instance, 'U')
+
+
+@receiver(post_delete)
+def record_sync_delete(sender, instance, **kwargs):
+    """Las bajas (también en cascada) quedan como lápidas"""
+    if sender in sync.SYNC_NAMES:
+        sync.record_change(instance, 'D')
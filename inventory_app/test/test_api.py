@@ -1,8 +1,19 @@
- from rest_framework.test import APITestCase, APIClient
+import gzip
+import json
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
-from django.contrib.auth.models import User
+from django.conf import settings
+from django.core.cache import caches
+from django.contrib.auth.models import AnonymousUser, User
+from django.test import Client
 from django.urls import reverse
-from ..models import CompanyUser, Equipment
+from ..models import AuditLog, ChangeLog, CompanyUser, Equipment, MaintenanceLog, SupportTicket
+from ..utils.bulk_api import EquipmentBulkWriter
+from ..utils.facets import facet_values
 
 class APITestCase(APITestCase):
     def setUp(self):
@@ -36,3 +47,421 @@ class APITestCase(APITestCase):
         response = self.client.get(f'/api/v1/equipment/{self.equipment.id}/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['brand'], 'Dell')
+    
+    def test_api_equipment_facets(self):
+        self.client.force_authenticate(user=self.user)
+        Equipment.objects.create(
+            type='MON', brand='Dell', model='P2419H',
+            serial_number='TEST456', purchase_date='2023-01-01',
+            location='Office 102', status='INU'
+        )
+        response = self.client.get('/api/v1/equipment/facets/', {'status': 'AVA'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total'], 1)
+        locations = {item['value']: item['count'] for item in response.data['facets']['location']}
+        self.assertEqual(locations, {'Office 101': 1, 'Office 102': 0})
+    
+    def test_api_equipment_bulk_create(self):
+        self.client.force_authenticate(user=self.user)
+        items = [
+            {'type': 'LAP', 'brand': 'Lenovo', 'model': 'T14', 'serial_number': f'BULK{i}',
+             'purchase_date': '2023-01-01', 'location': 'Office 101'}
+            for i in range(3)
+        ]
+        items.append(dict(items[0], serial_number='TEST123'))
+        items.append({'type': 'XXX', 'brand': 'Lenovo'})
+        
+        response = self.client.post('/api/v1/equipment/bulk/', items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(response.data['errors'], 2)
+        self.assertIn('serial_number', response.data['results'][3]['errors'])
+        self.assertIn('type', response.data['results'][4]['errors'])
+        self.assertEqual(AuditLog.objects.filter(action='CRE', model_name='Equipment').count(), 3)
+        self.assertEqual(facet_values(Equipment, 'location'), [('Office 101', 4)])
+        
+        # Con atomic=1 un elemento inválido impide toda la escritura
+        response = self.client.post('/api/v1/equipment/bulk/?atomic=1', [
+            dict(items[0], serial_number='BULK9'), dict(items[0], serial_number='BULK0'),
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Equipment.objects.filter(serial_number='BULK9').exists())
+    
+    def test_api_equipment_bulk_update_and_upsert(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.patch('/api/v1/equipment/bulk/', [
+            {'id': self.equipment.id, 'status': 'REP'},
+            {'id': 999999, 'status': 'REP'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.equipment.refresh_from_db()
+        self.assertEqual(self.equipment.status, 'REP')
+        
+        response = self.client.post('/api/v1/equipment/bulk_upsert/', [
+            {'serial_number': 'TEST123', 'location': 'Office 202'},
+            {'serial_number': 'NEW1', 'type': 'MON', 'brand': 'LG', 'model': '27UL',
+             'purchase_date': '2023-01-01', 'location': 'Office 202'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['created'], response.data['updated']), (1, 1))
+        self.equipment.refresh_from_db()
+        self.assertEqual(self.equipment.location, 'Office 202')
+        self.assertEqual(self.equipment.location_path, 'office-202/')
+        self.assertEqual(facet_values(Equipment, 'location'), [('Office 202', 2)])
+        
+        # Otra petición da de alta el mismo número de serie tras la validación
+        validate = EquipmentBulkWriter.validate
+        def racing_validate(writer, items, mode):
+            rows = validate(writer, items, mode)
+            Equipment.objects.create(
+                type='MON', brand='LG', model='27UL', serial_number='RACE1',
+                purchase_date='2023-01-01', location='Office 101', status='AVA'
+            )
+            return rows
+        item = {'type': 'MON', 'brand': 'LG', 'model': '27UL', 'purchase_date': '2023-01-01',
+                'location': 'Office 303'}
+        with mock.patch.object(EquipmentBulkWriter, 'validate', racing_validate):
+            response = self.client.post('/api/v1/equipment/bulk_upsert/', [
+                dict(item, serial_number='RACE1'), dict(item, serial_number='RACE2'),
+            ], format='json')
+        self.assertEqual((response.data['created'], response.data['updated']), (1, 1))
+        self.assertEqual(Equipment.objects.get(serial_number='RACE1').location, 'Office 303')
+        self.assertEqual(dict(facet_values(Equipment, 'location'))['Office 303'], 2)
+    
+    def test_api_maintenance_bulk_complete(self):
+        self.client.force_authenticate(user=self.user)
+        logs = [
+            MaintenanceLog.objects.create(
+                equipment=self.equipment, maintenance_type='REP', title=f'Repair {i}',
+                description='Test', technician=self.company_user, start_date='2023-01-01T10:00:00Z'
+            )
+            for i in range(2)
+        ]
+        response = self.client.post('/api/v1/maintenance/bulk_complete/', {
+            'ids': [logs[0].id, logs[1].id, 999999]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['completed'], 2)
+        self.assertEqual(response.data['results'][2]['status'], 'error')
+        self.assertEqual(MaintenanceLog.objects.filter(end_date__isnull=True).count(), 0)
+        self.assertEqual(
+            sorted(AuditLog.objects.filter(model_name='MaintenanceLog', user=self.company_user)
+                   .values_list('object_id', flat=True)),
+            sorted(log.id for log in logs)
+        )
+    
+    def test_api_sync_upserts_and_tombstones(self):
+        self.client.force_authenticate(user=self.user)
+        ticket = SupportTicket.objects.create(
+            title='No enciende', description='Test', created_by=self.company_user, equipment=self.equipment
+        )
+        response = self.client.get('/api/v1/sync/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['has_more'])
+        self.assertEqual([e['serial_number'] for e in response.data['changes']['equipment']['upserts']], ['TEST123'])
+        cursor = response.data['cursor']
+        
+        # Sin cambios: la respuesta está vacía
+        response = self.client.get('/api/v1/sync/', {'cursor': cursor})
+        self.assertEqual(response.data['changes']['equipment'], {'upserts': [], 'deletes': []})
+        
+        other = Equipment.objects.create(
+            type='MON', brand='LG', model='27UL', serial_number='SYNC1',
+            purchase_date='2023-01-01', location='Office 102'
+        )
+        equipment_id, ticket_id = self.equipment.id, ticket.id
+        self.equipment.delete()  # también borra el ticket en cascada
+        response = self.client.get('/api/v1/sync/', {'cursor': cursor})
+        changes = response.data['changes']
+        self.assertEqual([e['id'] for e in changes['equipment']['upserts']], [other.id])
+        self.assertEqual(changes['equipment']['deletes'], [equipment_id])
+        self.assertEqual(changes['ticket']['deletes'], [ticket_id])
+        
+        # Una transacción larga confirma un id menor que otro ya entregado
+        cursor = response.data['cursor']
+        last_id = ChangeLog.objects.order_by('-id').values_list('id', flat=True).first()
+        ChangeLog.objects.create(id=last_id + 2, model_name='equipment', object_id=other.id, operation='U')
+        response = self.client.get('/api/v1/sync/', {'cursor': cursor})
+        self.assertEqual([e['id'] for e in response.data['changes']['equipment']['upserts']], [other.id])
+        cursor = response.data['cursor']
+        ChangeLog.objects.create(id=last_id + 1, model_name='ticket', object_id=ticket_id, operation='D')
+        response = self.client.get('/api/v1/sync/', {'cursor': cursor})
+        self.assertEqual(response.data['changes']['ticket']['deletes'], [ticket_id])
+        
+        response = self.client.get('/api/v1/sync/', {'cursor': 'invalido'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_api_fast_list_matches_serializer(self):
+        self.client.force_authenticate(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name, self.user.last_name = 'Ana', 'Pérez'
+            self.user.save()
+            Equipment.objects.create(
+                type='MON', brand='LG', model='27UL', serial_number='FAST1',
+                purchase_date='2023-01-01', warranty_expiry='2026-01-01',
+                location='Office 102', status='INU', assigned_to=self.company_user
+            )
+            MaintenanceLog.objects.create(
+                equipment=self.equipment, maintenance_type='PRE', title='Limpieza', description='Test',
+                technician=self.company_user, start_date='2023-01-01T10:00:00Z', cost='12.5', priority='HIG'
+            )
+        
+        for url in ['/api/v1/equipment/', '/api/v1/maintenance/']:
+            fast = self.client.get(url)
+            regular = self.client.get(url, {'fast': '0'})
+            self.assertEqual(fast.status_code, status.HTTP_200_OK)
+            self.assertEqual(fast.content, regular.content)
+    
+    def test_api_conditional_requests(self):
+        self.client.force_authenticate(user=self.user)
+        url = f'/api/v1/equipment/{self.equipment.id}/'
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code,
+            status.HTTP_304_NOT_MODIFIED
+        )
+        
+        list_etag = self.client.get('/api/v1/equipment/', {'status': 'AVA'})['ETag']
+        response = self.client.get('/api/v1/equipment/', {'status': 'AVA'}, HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertNotEqual(self.client.get('/api/v1/equipment/', {'status': 'REP'})['ETag'], list_etag)
+        
+        # If-Match: la primera escritura pasa, la segunda con el ETag viejo falla
+        response = self.client.patch(url, {'notes': 'Revisado'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        response = self.client.patch(url, {'notes': 'Otra vez'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        
+        response = self.client.get('/api/v1/equipment/', {'status': 'AVA'}, HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        # Editar el usuario anidado cambia la representación y el ETag, pero
+        # no invalida un If-Match sobre el propio equipo
+        Equipment.objects.filter(pk=self.equipment.pk).update(assigned_to=self.company_user)
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Ana'
+            self.user.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['assigned_to_detail']['full_name'], 'Ana')
+        response = self.client.patch(url, {'notes': 'Asignado'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        # Mantenimientos: versión desde la secuencia de cambios
+        log = MaintenanceLog.objects.create(
+            equipment=self.equipment, maintenance_type='REP', title='Repair', description='Test',
+            technician=self.company_user, start_date='2023-01-01T10:00:00Z'
+        )
+        url = f'/api/v1/maintenance/{log.id}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.client.post(f'{url}complete/')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+        
+        # Un pk no numérico es un 404, como con get_object_or_404
+        for prefix in ('equipment', 'maintenance', 'support-tickets'):
+            self.assertEqual(self.client.get(f'/api/v1/{prefix}/abc/').status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.patch('/api/v1/equipment/abc/', {'notes': 'x'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_api_response_cache(self):
+        self.client.force_authenticate(user=self.user)
+        url = '/api/v1/equipment/'
+        self.assertEqual(self.client.get(url, {'status': 'AVA', 'type': 'LAP'})['X-Cache'], 'MISS')
+        # El orden de los parámetros no cambia la clave
+        response = self.client.get(url, {'type': 'LAP', 'status': 'AVA'})
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['count'], 1)
+        
+        # La generación cambia al confirmar la escritura
+        with self.captureOnCommitCallbacks(execute=True):
+            Equipment.objects.create(
+                type='LAP', brand='HP', model='840', serial_number='CACHE1',
+                purchase_date='2023-01-01', location='Office 101', status='AVA'
+            )
+        response = self.client.get(url, {'status': 'AVA', 'type': 'LAP'})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['count'], 2)
+        
+        self.assertEqual(self.client.get(f'{url}statistics/')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(f'{url}statistics/')['X-Cache'], 'HIT')
+        
+        # Los datos anidados del usuario también invalidan
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Ana'
+            self.user.save()
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+    
+    def test_api_fast_json_and_compression(self):
+        from django.http import JsonResponse
+        from rest_framework.renderers import JSONRenderer
+        from ..renderers import FastJSONRenderer
+        from ..utils.fast_json import FastJsonResponse
+        data = {
+            'nombre': 'Café', 'fecha': self.equipment.created_at, 'coste': Decimal('10.50'), 'sep': '\u2028',
+            'hora': datetime(2023, 1, 1, 10, 0, 0, 123456, tzinfo=dt_timezone.utc), 'dia': date(2023, 1, 1),
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        # Y FastJsonResponse, los mismos valores que JsonResponse (milisegundos)
+        fast = json.loads(FastJsonResponse(data).content)
+        self.assertEqual(fast, json.loads(JsonResponse(data).content))
+        self.assertEqual(fast['hora'], '2023-01-01T10:00:00.123Z')
+        # Diferencia documentada: orjson escribe NaN como null, DRF lo rechaza
+        self.assertEqual(FastJSONRenderer().render({'x': float('nan')}), b'{"x":null}')
+        
+        self.client.force_authenticate(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            for index in range(30):
+                Equipment.objects.create(
+                    type='LAP', brand='Dell', model='XPS 13', serial_number=f'GZ{index}',
+                    purchase_date='2023-01-01', location='Office 101', status='AVA'
+                )
+        url = '/api/v1/equipment/'
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        self.assertEqual(json.loads(gzip.decompress(response.content))['count'], 31)
+        self.assertFalse(self.client.get(url).has_header('Content-Encoding'))
+        
+        # BREACH: no se comprimen las páginas que fijan la cookie CSRF
+        response = Client().get(reverse('login'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertIn(settings.CSRF_COOKIE_NAME, response.cookies)
+        self.assertGreater(len(response.content), 1024)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        
+        # El ETag débil recibido con compresión sirve para If-Match
+        detail = f'/api/v1/equipment/{self.equipment.id}/'
+        etag = 'W/' + self.client.get(detail)['ETag']
+        response = self.client.patch(detail, {'notes': 'Revisado'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+    
+    def test_api_batch_requests(self):
+        self.client.force_authenticate(user=self.user)
+        detail = f'/api/v1/equipment/{self.equipment.id}/'
+        response = self.client.post('/api/v1/batch/', {'requests': [
+            {'id': 'equipo', 'path': detail},
+            {'path': '/api/v1/support-tickets/', 'params': {'equipment': self.equipment.id}},
+            {'path': '/api/v1/equipment/statistics/'},
+            {'path': '/admin/'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual(results[0]['id'], 'equipo')
+        self.assertEqual(results[0]['body']['serial_number'], 'TEST123')
+        self.assertIn('ETag', results[0]['headers'])
+        self.assertEqual(results[1]['body']['count'], 0)
+        self.assertEqual(results[2]['status'], 200)
+        self.assertEqual(results[3]['status'], 404)
+        
+        # Transacción compartida: el fallo de la segunda deshace la primera
+        response = self.client.post('/api/v1/batch/', {'atomic': True, 'requests': [
+            {'method': 'PATCH', 'path': detail, 'body': {'notes': 'Lote'}},
+            {'method': 'PATCH', 'path': detail, 'body': {'status': 'XXX'}},
+            {'path': detail},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(response.data['rolled_back'])
+        self.assertEqual([r['status'] for r in response.data['results']], [200, 400, 424])
+        self.equipment.refresh_from_db()
+        self.assertNotEqual(self.equipment.notes, 'Lote')
+    
+    async def test_api_async_reads_match_viewset(self):
+        from asgiref.sync import sync_to_async
+        from django.test import AsyncRequestFactory
+        from ..async_views import EquipmentAsyncReadView
+        
+        factory = AsyncRequestFactory()
+        
+        async def async_get(path, view, **kwargs):
+            request = factory.get(path, {'status': 'AVA'} if not kwargs else {})
+            request.user = self.user
+            return await view(request, **kwargs)
+        
+        self.client.force_authenticate(user=self.user)
+        sync_get = sync_to_async(self.client.get)
+        list_view = EquipmentAsyncReadView.as_view()
+        response = await async_get('/api/v1/equipment/', list_view)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        expected = await sync_get('/api/v1/equipment/', {'status': 'AVA', 'fast': '0'})
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual((await sync_get('/api/v1/equipment/', {'status': 'AVA'}))['X-Cache'], 'HIT')
+        
+        detail_view = EquipmentAsyncReadView.as_view(detail=True)
+        path = f'/api/v1/equipment/{self.equipment.id}/'
+        response = await async_get(path, detail_view, pk=str(self.equipment.id))
+        expected = await sync_get(path)
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(response['ETag'], expected['ETag'])
+        response = await async_get('/api/v1/equipment/abc/', detail_view, pk='abc')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        
+        # Sin usuario: la misma respuesta de error que el ViewSet
+        request = factory.get('/api/v1/equipment/')
+        request.user = AnonymousUser()
+        self.assertEqual((await list_view(request)).status_code, status.HTTP_403_FORBIDDEN)
+    
+    def test_api_signed_tokens(self):
+        from rest_framework.test import APIRequestFactory
+        from ..authentication import SignedTokenAuthentication, revocations
+        revocations.refresh(force=True)
+        
+        response = self.client.post('/api/v1/auth-token/', {'username': 'testuser', 'password': 'Testpass123!'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        token = response.data['token']
+        
+        # Autenticar no consulta la base de datos
+        request = APIRequestFactory().get('/api/v1/equipment/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        with self.assertNumQueries(0):
+            user, payload = SignedTokenAuthentication().authenticate(request)
+        self.assertEqual((user.pk, user.username, user.is_staff), (self.user.pk, 'testuser', False))
+        
+        client = APIClient(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(client.get('/api/v1/equipment/').status_code, status.HTTP_200_OK)
+        self.assertEqual(client.post('/api/v1/auth-token/revoke/').status_code, status.HTTP_204_NO_CONTENT)
+        response = client.get('/api/v1/equipment/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.data['detail'], 'Token revocado.')
+        
+        # Un cambio de contraseña revoca los tokens ya emitidos
+        token = self.client.post('/api/v1/auth-token/', {'username': 'testuser', 'password': 'Testpass123!'}).data['token']
+        client = APIClient(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(client.get('/api/v1/equipment/').status_code, status.HTTP_200_OK)
+        self.user.set_password('Otra123!')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(client.get('/api/v1/equipment/').status_code, status.HTTP_403_FORBIDDEN)
+        
+        # Desactivar al usuario invalida sus tokens sin esperar a ninguna
+        # recarga (la versión de las credenciales está en la caché compartida)
+        token = self.client.post('/api/v1/auth-token/', {'username': 'testuser', 'password': 'Otra123!'}).data['token']
+        client = APIClient(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(client.get('/api/v1/equipment/').status_code, status.HTTP_200_OK)
+        with mock.patch.object(revocations, 'refresh'):
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+            self.assertEqual(client.get('/api/v1/equipment/').status_code, status.HTTP_200_OK)  # aún en caché
+            caches[settings.SHARED_CACHE_ALIAS].clear()
+            response = client.get('/api/v1/equipment/')
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+            self.assertEqual(response.data['detail'], 'Token revocado.')
+            User.objects.filter(pk=self.user.pk).update(is_active=True)
+            self.user.refresh_from_db()
+            self.user.is_active = False
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.save()
+            self.assertEqual(client.get('/api/v1/equipment/').status_code, status.HTTP_403_FORBIDDEN)
+        
+        # Otros procesos lo ven al recargar la lista
+        revocations.refresh(force=True)
+        self.assertTrue(revocations.is_revoked(payload))
+        self.assertEqual(
+            APIClient(HTTP_AUTHORIZATION=f'Bearer {token}x').get('/api/v1/equipment/').data['detail'],
+            'Token inválido.'
+        )
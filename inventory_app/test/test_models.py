@@ -1,7 +1,10 @@
- from django.test import TestCase
+from django.test import TestCase
 from django.contrib.auth.models import User
 from django.utils import timezone
-from ..models import Equipment, CompanyUser, MaintenanceLog
+from ..admin import LocationFilter
+from ..models import Equipment, CompanyUser, FacetValue, MaintenanceLog, Location
+from ..utils.facets import FACET_OPTION_LIMIT, facet_options, facet_values
+from ..utils.locations import subtree_counts, subtree_q
 
 class ModelTestCase(TestCase):
     def setUp(self):
@@ -44,8 +47,69 @@ class ModelTestCase(TestCase):
             description='Replaced broken screen',
             technician=self.company_user,
             start_date=timezone.now(),
-            priority='HIGH'
+            priority='HIG'
         )
         
         self.assertEqual(maintenance.title, 'Screen replacement')
         self.assertEqual(maintenance.get_priority_display(), 'High')
+    
+    def test_facet_values_follow_writes(self):
+        equipment = Equipment.objects.create(
+            type='LAP', brand='Dell', model='XPS 13',
+            serial_number='FACET1', purchase_date=timezone.now().date(),
+            location='Office 101', status='AVA'
+        )
+        self.assertEqual(facet_values(Equipment, 'location'), [('Office 101', 1)])
+        
+        equipment.location = 'Office 202'
+        equipment.save()
+        self.assertEqual(facet_values(Equipment, 'location'), [('Office 202', 1)])
+        
+        equipment.delete()
+        self.assertEqual(facet_values(Equipment, 'location'), [])
+        self.assertEqual(facet_values(Equipment, 'brand'), [])
+    
+    def test_location_filter_offers_every_value(self):
+        FacetValue.objects.bulk_create([
+            FacetValue(facet='equipment.location', value=f'Sala {number:03}', count=number + 1)
+            for number in range(FACET_OPTION_LIMIT + 10)
+        ])
+        lookups = LocationFilter(None, {}, Equipment, None).lookups(None, None)
+        self.assertEqual(len(lookups), FACET_OPTION_LIMIT + 10)
+        self.assertEqual(lookups[-1], ('Sala 000', 'Sala 000 (1)'))
+        # Los conteos de la API siguen limitados a las más frecuentes
+        self.assertEqual(len(facet_options(Equipment)['location']), FACET_OPTION_LIMIT)
+    
+    def test_location_tree_and_rollups(self):
+        for serial, location in [('LOC1', 'Sede Central / Edificio 3 / Piso 2 / Sala 201'),
+                                 ('LOC2', 'Sede Central / Edificio 3 / Piso 1'),
+                                 ('LOC3', 'Sede Central / Edificio 30')]:
+            Equipment.objects.create(
+                type='LAP', brand='Dell', model='XPS 13',
+                serial_number=serial, purchase_date=timezone.now().date(),
+                location=location, status='AVA'
+            )
+        building = Location.objects.get(path='sede-central/edificio-3/')
+        self.assertEqual(building.level, 'BLD')
+        self.assertEqual(Location.objects.get(path='sede-central/edificio-3/piso-2/sala-201/').level, 'ROO')
+        
+        # El rango del subárbol no incluye el "Edificio 30"
+        in_building = Equipment.objects.filter(subtree_q(building.path))
+        self.assertEqual(sorted(in_building.values_list('serial_number', flat=True)), ['LOC1', 'LOC2'])
+        # También con la ruta escrita a mano, sin el separador final
+        in_building = Equipment.objects.filter(subtree_q(' sede-central/edificio-3 '))
+        self.assertEqual(sorted(in_building.values_list('serial_number', flat=True)), ['LOC1', 'LOC2'])
+        self.assertEqual(subtree_counts(building)['total'], 2)
+        self.assertEqual(subtree_counts(Location.objects.get(path='sede-central/'))['total'], 3)
+        
+        equipment = Equipment.objects.get(serial_number='LOC1')
+        equipment.status = 'REP'
+        equipment.save()
+        self.assertEqual(subtree_counts(building)['by_status'], {'AVA': 1, 'REP': 1})
+        
+        equipment.location = 'Sede Central / Edificio 30'
+        equipment.save()
+        self.assertEqual(subtree_counts(building)['total'], 1)
+        
+        equipment.delete()
+        self.assertEqual(subtree_counts(Location.objects.get(path='sede-central/'))['total'], 2)
@@ -0,0 +1,368 @@
+import io
+import json
+import logging
+import multiprocessing
+import threading
+import os
+import tempfile
+from unittest import mock
+
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from ..backends import CompanyEmailBackend
+from .. import sessions
+from ..models import CompanyUser, Equipment, LoginIdentity, MaintenanceLog, SupportTicket
+from ..utils import counting, warmup
+from ..utils.counting import EstimatedCountPaginator, cached_count
+from ..utils.identities import find_login_identity, rebuild_identities
+from ..utils.query_budget import fingerprint
+from ..utils.query_workload import IndexAdvisor
+from ..utils.request_logging import JsonQueueHandler
+from ..utils.token_buckets import TokenBucketTable
+
+
+class CountingTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        for i in range(3):
+            Equipment.objects.create(
+                type='LAP', brand='Dell', model='XPS 13',
+                serial_number=f'CNT{i}', purchase_date='2023-01-01',
+                location='Office 101', status='AVA'
+            )
+
+    def test_cached_count_is_invalidated_on_write(self):
+        queryset = Equipment.objects.filter(status='AVA')
+        self.assertEqual(cached_count(queryset), 3)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_count(queryset), 3)
+
+        # Hasta el commit la generación no cambia
+        with self.captureOnCommitCallbacks(execute=True):
+            Equipment.objects.create(
+                type='DES', brand='HP', model='Z2',
+                serial_number='CNT9', purchase_date='2023-01-01',
+                location='Office 102', status='AVA'
+            )
+            self.assertEqual(cached_count(queryset), 3)
+        self.assertEqual(cached_count(queryset), 4)
+
+    def test_paginator_uses_estimate_for_unfiltered_lists(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Estimación basada en sqlite_stat1')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        with mock.patch.object(counting, 'ESTIMATE_THRESHOLD', 1):
+            paginator = EstimatedCountPaginator(Equipment.objects.all(), 2)
+            self.assertEqual(paginator.count, 3)
+            self.assertTrue(paginator.is_estimate)
+
+            filtered = EstimatedCountPaginator(Equipment.objects.filter(brand='Dell'), 2)
+            self.assertEqual(filtered.count, 3)
+            self.assertFalse(filtered.is_estimate)
+
+            exact = EstimatedCountPaginator(Equipment.objects.all(), 2, exact=True)
+            self.assertEqual(exact.count, 3)
+            self.assertFalse(exact.is_estimate)
+
+
+class IndexAdvisorTestCase(TestCase):
+    def suggestions_for(self, *querysets):
+        advisor = IndexAdvisor(min_hits=1)
+        for queryset in querysets:
+            sql, params = queryset.query.sql_with_params()
+            advisor.add_query(sql, params, route='test')
+        return [str(suggestion) for suggestion in advisor.suggestions()]
+
+    def test_baseline_indexes_cover_dashboard_filters(self):
+        # Los COUNT(*) del dashboard no llevan ORDER BY
+        suggestions = self.suggestions_for(
+            SupportTicket.objects.filter(priority='CRITICAL', status__in=['OPEN', 'IN_PROGRESS']).order_by(),
+            MaintenanceLog.objects.filter(end_date__isnull=True).order_by(),
+            Equipment.objects.filter(status='AVA', type='LAP').order_by(),
+        )
+        self.assertEqual(suggestions, [])
+
+    def test_proposes_composite_and_partial_indexes(self):
+        suggestions = self.suggestions_for(
+            Equipment.objects.filter(brand='Dell', model='XPS 13'),
+            SupportTicket.objects.filter(assigned_to__isnull=True, priority='CRITICAL'),
+            Equipment.objects.filter(Q(brand='Dell') | Q(model='XPS 13')),
+        )
+        self.assertIn('Equipment(brand, model, -created_at)', suggestions)
+        self.assertIn(
+            'SupportTicket(priority, -created_at) WHERE assigned_to__isnull=True', suggestions
+        )
+        self.assertEqual(len(suggestions), 2)
+
+
+def _consume_in_child(path, results):
+    table = TokenBucketTable(path, slots=1024)
+    results.put(sum(table.consume('user_1', 100, 3600)[0] for _ in range(50)))
+
+
+class TokenBucketTableTestCase(SimpleTestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'throttle.bin')
+
+    def test_limit_is_shared_between_tables(self):
+        # Dos tablas sobre el mismo fichero, como dos workers
+        first = TokenBucketTable(self.path, slots=1024)
+        second = TokenBucketTable(self.path, slots=1024)
+        now = 1000.0
+        self.assertEqual([first.consume('user_1', 3, 60, now)[0] for _ in range(2)], [True, True])
+        self.assertTrue(second.consume('user_1', 3, 60, now)[0])
+        allowed, wait = first.consume('user_1', 3, 60, now)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 20.0)
+        self.assertTrue(second.consume('user_2', 3, 60, now)[0])
+        # Se rellena a razón de 3 tokens por minuto
+        self.assertTrue(second.consume('user_1', 3, 60, now + 20)[0])
+
+        # Las cubetas ya llenas se liberan al compactar
+        first.compact(now + 60)
+        self.assertEqual(first.active_buckets(), 1)
+        first.compact(now + 80)
+        self.assertEqual(second.active_buckets(), 0)
+
+    def test_periodic_sweep_compacts_one_stripe_per_call(self):
+        table = TokenBucketTable(self.path, slots=256, compact_interval=60)  # 4 franjas
+        for number in range(40):
+            table.consume(f'user_{number}', 1, 1, 1000.0)  # llenas desde 1001
+        self.assertEqual(table.active_buckets(), 40)
+        table.last_compaction -= 60
+        with mock.patch.object(table, 'compact_stripe', wraps=table.compact_stripe) as compact_stripe:
+            for _ in range(table.stripes + 2):
+                table.maybe_compact()
+        # Un barrido completo, una franja por llamada, y después a esperar el intervalo
+        self.assertEqual([call.args[0] for call in compact_stripe.call_args_list], [0, 1, 2, 3])
+        self.assertEqual(table.active_buckets(), 0)
+
+    def test_full_stripe_evicts_the_bucket_closest_to_full(self):
+        table = TokenBucketTable(self.path, slots=64)  # una sola franja
+        now = 1000.0
+        for number in range(64):
+            table.consume(f'user_{number}', 2, 3600, now + number)
+        self.assertEqual(table.active_buckets(), 64)
+        # Sin sitio la clave nueva también queda limitada
+        self.assertEqual([table.consume('nuevo', 1, 3600, now + 64)[0] for _ in range(2)], [True, False])
+        # Se desalojó la cubeta de user_0, la primera en volver a llenarse
+        self.assertEqual(table.active_buckets(), 64)
+        self.assertEqual([table.consume('user_0', 2, 3600, now + 64)[0] for _ in range(3)], [True, True, False])
+        allowed, _ = table.consume('user_63', 2, 3600, now + 64)
+        self.assertTrue(allowed)
+        self.assertFalse(table.consume('user_63', 2, 3600, now + 64)[0])
+
+    def test_other_configuration_is_replaced_not_truncated(self):
+        old = TokenBucketTable(self.path, slots=64)
+        self.assertTrue(old.consume('user_1', 1, 60, 1000.0)[0])
+        # Otra configuración: fichero nuevo; el mapeado antiguo sigue intacto
+        new = TokenBucketTable(self.path, slots=128)
+        self.assertEqual((new.active_buckets(), old.active_buckets()), (0, 1))
+        self.assertFalse(old.consume('user_1', 1, 60, 1000.0)[0])
+        self.assertEqual(os.path.getsize(self.path), new.size)
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ['throttle.bin'])
+        # Quien abre después con la misma configuración comparte la tabla nueva
+        self.assertTrue(TokenBucketTable(self.path, slots=128).consume('user_1', 1, 60, 1000.0)[0])
+        self.assertFalse(new.consume('user_1', 1, 60, 1000.0)[0])
+
+    def test_limit_is_exact_across_processes(self):
+        TokenBucketTable(self.path, slots=1024)
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        workers = [context.Process(target=_consume_in_child, args=(self.path, results)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        # 4 procesos x 50 peticiones con un límite de 100
+        self.assertEqual(sum(results.get() for _ in workers), 100)
+
+
+class _BlockingHandler(logging.Handler):
+    """Destino que se queda atascado en el primer registro, como un disco lento"""
+    def __init__(self):
+        super().__init__()
+        self.entered = threading.Event()
+        self.unblock = threading.Event()
+        self.records = []
+
+    def emit(self, record):
+        self.entered.set()
+        self.unblock.wait(5)
+        self.records.append(record)
+
+
+class JsonQueueHandlerTestCase(SimpleTestCase):
+    def test_json_lines_with_rotation(self):
+        path = os.path.join(tempfile.mkdtemp(), 'logs', 'django.log')
+        handler = JsonQueueHandler(filename=path, max_bytes=1000, backup_count=2, console=False)
+        log = logging.getLogger('inventory_app.test_json')
+        log.addHandler(handler)
+        log.propagate = False
+        try:
+            for number in range(20):
+                log.warning('registro %d', number, extra={'request_id': 'abc', 'status': 200})
+            try:
+                1 / 0
+            except ZeroDivisionError:
+                log.exception('fallo')
+        finally:
+            log.removeHandler(handler)
+            handler.close()
+
+        self.assertTrue(os.path.exists(f'{path}.1'))
+        with open(path) as handle:
+            entries = [json.loads(line) for line in handle]
+        self.assertEqual(entries[-1]['message'], 'fallo')
+        self.assertIn('ZeroDivisionError', entries[-1]['exception'])
+        self.assertEqual((entries[0]['request_id'], entries[0]['status']), ('abc', 200))
+
+    def test_full_queue_drops_and_counts(self):
+        target = _BlockingHandler()
+        handler = JsonQueueHandler(queue_size=2, handlers=[target])
+        record = lambda message: logging.makeLogRecord({'msg': message, 'levelno': logging.INFO})
+        try:
+            handler.handle(record('primero'))
+            self.assertTrue(target.entered.wait(5))
+            # El destino está atascado: dos caben en la cola y dos se descartan
+            for message in ('segundo', 'tercero', 'cuarto', 'quinto'):
+                handler.handle(record(message))
+            self.assertEqual(handler.dropped, 2)
+            target.unblock.set()
+            handler.listener.queue.join()
+            handler.handle(record('sexto'))
+        finally:
+            target.unblock.set()
+            handler.close()
+
+        self.assertEqual(
+            [record.getMessage() for record in target.records],
+            ['primero', 'segundo', 'tercero', 'Cola de logs llena: 2 registros descartados', 'sexto'],
+        )
+        self.assertEqual(target.records[3].dropped, 2)
+
+
+class StartupTestCase(SimpleTestCase):
+    def test_cold_startup_within_budget(self):
+        # Falla si pandas/reportlab vuelven a importarse al arrancar o si el
+        # arranque supera STARTUP_BUDGET_MS
+        out = io.StringIO()
+        call_command('profile_startup', runs=2, stdout=out)
+        self.assertIn('Startup within budget', out.getvalue())
+        self.assertIn('Cold startup: best', out.getvalue())
+
+
+class WarmupTestCase(TestCase):
+    def test_warm_up_steps(self):
+        compiled, _ = warmup.compile_templates()
+        self.assertGreater(compiled, 20)
+        self.assertGreater(warmup.populate_urls(), 20)
+        self.assertIsNone(warmup.warmup_user())
+
+        admin = User.objects.create_superuser(username='admin', password='Testpass123!')
+        Equipment.objects.create(
+            type='LAP', brand='Dell', model='XPS', serial_number='W1',
+            purchase_date='2023-01-01', location='Office 101', status='AVA'
+        )
+        self.assertEqual(warmup.warmup_user(), admin)
+        self.assertEqual(warmup.render_pages(admin), list(warmup.WARMUP_PAGES))
+
+
+class LoginIdentityTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='Ana', email='ana@gmail.com', password='Testpass123!')
+        self.backend = CompanyEmailBackend()
+    
+    def identifiers(self, user):
+        return set(LoginIdentity.objects.filter(user=user).values_list('identifier', 'company_domain'))
+    
+    def test_identities_follow_user_and_profile(self):
+        self.assertEqual(self.identifiers(self.user), {('Ana', False), ('ana@gmail.com', False)})
+        # Sin email de empresa no se puede iniciar sesión
+        self.assertIsNone(self.backend.authenticate(None, username='Ana', password='Testpass123!'))
+        
+        company_user = CompanyUser.objects.create(
+            user=self.user, department='IT', phone='1', email='Ana@tuempresa.com'
+        )
+        self.assertEqual(self.identifiers(self.user), {
+            ('Ana', True), ('ana@gmail.com', True), ('Ana@tuempresa.com', True),
+        })
+        for identifier in ('Ana', 'ana@gmail.com', 'Ana@tuempresa.com'):
+            with self.assertNumQueries(1):
+                self.assertEqual(find_login_identity(identifier).user, self.user)
+            self.assertEqual(self.backend.authenticate(None, username=identifier, password='Testpass123!'), self.user)
+        self.assertIsNone(self.backend.authenticate(None, username='Ana', password='wrong'))
+        # Como la consulta original, sin ignorar mayúsculas
+        self.assertIsNone(self.backend.authenticate(None, username='ana', password='Testpass123!'))
+        
+        company_user.delete()
+        self.assertEqual(self.identifiers(self.user), {('Ana', False), ('ana@gmail.com', False)})
+        self.user.delete()
+        self.assertFalse(LoginIdentity.objects.exists())
+    
+    def test_ambiguous_identifier_and_rebuild(self):
+        CompanyUser.objects.create(user=self.user, department='IT', phone='1', email='ana@tuempresa.com')
+        other = User.objects.create_user(username='beto', email='ana@gmail.com', password='Testpass123!')
+        CompanyUser.objects.create(user=other, department='IT', phone='2', email='beto@tuempresa.com')
+        # Dos usuarios con el mismo email: como antes, no se autentica ninguno
+        self.assertIsNone(self.backend.authenticate(None, username='ana@gmail.com', password='Testpass123!'))
+        self.assertEqual(self.backend.authenticate(None, username='beto', password='Testpass123!'), other)
+        
+        # Usuarios que solo se distinguen por mayúsculas entran cada uno con el suyo
+        lower = User.objects.create_user(username='ana', email='ana2@gmail.com', password='Otra123!')
+        CompanyUser.objects.create(user=lower, department='IT', phone='3', email='ana2@tuempresa.com')
+        self.assertEqual(self.backend.authenticate(None, username='Ana', password='Testpass123!'), self.user)
+        self.assertEqual(self.backend.authenticate(None, username='ana', password='Otra123!'), lower)
+        
+        expected = set(LoginIdentity.objects.values_list('identifier', 'user_id', 'company_domain'))
+        LoginIdentity.objects.all().delete()
+        self.assertEqual(rebuild_identities(), len(expected))
+        self.assertEqual(set(LoginIdentity.objects.values_list('identifier', 'user_id', 'company_domain')), expected)
+
+
+class SessionStorageTestCase(TestCase):
+    @override_settings(SESSION_COOKIE_MAX_SIZE=300)
+    def test_signed_cookie_size_guard(self):
+        session = sessions.SessionStore()
+        session['_auth_user_id'] = '1'
+        session[sessions.PROFILE_SESSION_KEY] = {'profile': os.urandom(200).hex()}
+        session.save()
+        # La copia del perfil se descarta; la sesión sigue siendo válida
+        self.assertNotIn(sessions.PROFILE_SESSION_KEY, sessions.SessionStore(session.session_key).load())
+        
+        session['notes'] = os.urandom(300).hex()
+        with self.assertRaises(sessions.SessionTooLarge), self.assertLogs('inventory_app.sessions', 'ERROR'):
+            session.save()
+    
+    def test_sweep_sessions_in_batches(self):
+        now = timezone.now()
+        Session.objects.bulk_create(
+            [Session(session_key=f'expired{i}', session_data='', expire_date=now - timedelta(days=1)) for i in range(5)]
+            + [Session(session_key='live', session_data='', expire_date=now + timedelta(days=1))]
+        )
+        call_command('sweep_sessions', batch_size=2, stdout=io.StringIO())
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['live'])
+
+
+class FingerprintTestCase(SimpleTestCase):
+    def test_literals_and_lists_collapse(self):
+        self.assertEqual(
+            fingerprint('SELECT "a"."id" FROM "a" WHERE "a"."id" IN (%s, %s, %s) AND "a"."name" = \'x\' LIMIT 21'),
+            'SELECT "a"."id" FROM "a" WHERE "a"."id" IN (...) AND "a"."name" = ? LIMIT ?',
+        )
+        self.assertEqual(
+            fingerprint('INSERT INTO "t" ("a", "b") VALUES (%s, %s), (%s, %s)'),
+            fingerprint('INSERT INTO "t" ("a", "b") VALUES (%s, %s)'),
+        )
@@ -1,7 +1,22 @@
- from django.test import TestCase, Client
-from django.urls import reverse
+import json
+import multiprocessing
+import os
+import tempfile
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.db import SessionStore
+from django.test import AsyncRequestFactory, TestCase, Client, RequestFactory, override_settings
+from django.urls import resolve, reverse
 from django.contrib.auth.models import User
-from ..models import CompanyUser, Equipment
+from .. import async_views
+from ..models import AuditLog, CompanyUser, Equipment, MaintenanceLog, SupportTicket
+from ..utils import metrics, profiling
+from ..utils.profiles import resolve_company_user
+from ..utils.bulk_api import BULK_MAX_REPEATS
+from ..utils.file_serving import serve_file
+from ..utils.query_budget import UNLIMITED, QueryBudgetExceeded, inspect_queries, inspect_sub_request, view_budget
 
 class ViewTestCase(TestCase):
     def setUp(self):
@@ -45,3 +60,420 @@ class ViewTestCase(TestCase):
         # Test que la API requiere autenticación
         response = self.client.get('/api/v1/equipment/')
         self.assertEqual(response.status_code, 403)  # Forbidden
+
+class AdminBulkActionsTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@tuempresa.com',
+            password='Adminpass123!'
+        )
+        self.company_user = CompanyUser.objects.create(
+            user=self.admin,
+            department='IT',
+            phone='1234567890',
+            email='admin@tuempresa.com'
+        )
+        Equipment.objects.bulk_create([
+            Equipment(
+                type='LAP', brand='Dell', model='XPS 13',
+                serial_number=f'BULK{i}', purchase_date='2023-01-01',
+                location='Office 101', status='AVA'
+            )
+            for i in range(25)
+        ])
+        self.client.force_login(self.admin)
+
+    def test_mark_for_maintenance_select_across(self):
+        response = self.client.post('/admin/inventory_app/equipment/', {
+            'action': 'mark_for_maintenance',
+            '_selected_action': [Equipment.objects.first().pk],
+            'select_across': '1',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(MaintenanceLog.objects.filter(technician=self.company_user).count(), 25)
+        # Se audita la creación de cada mantenimiento, no una reparación del equipo
+        self.assertFalse(AuditLog.objects.filter(action='REP').exists())
+        audited = AuditLog.objects.filter(action='CRE', model_name='MaintenanceLog')
+        self.assertEqual(
+            set(audited.values_list('object_id', flat=True)),
+            set(MaintenanceLog.objects.values_list('pk', flat=True)),
+        )
+        self.assertEqual(audited.count(), 25)
+
+    def test_bulk_status_update_writes_audit_trail(self):
+        pks = list(Equipment.objects.values_list('pk', flat=True)[:3])
+        response = self.client.post('/admin/inventory_app/equipment/', {
+            'action': 'bulk_status_update',
+            '_selected_action': pks,
+            'new_status': 'REP',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Equipment.objects.filter(status='REP').count(), 3)
+        self.assertEqual(AuditLog.objects.filter(action='STA').count(), 3)
+
+    def test_actions_signed_by_requesting_user(self):
+        # Un administrador sin perfil firma con el suyo, nunca con el de otro
+        other = User.objects.create_superuser(username='otro', password='Adminpass123!')
+        self.client.force_login(other)
+        response = self.client.post('/admin/inventory_app/equipment/', {
+            'action': 'bulk_status_update',
+            '_selected_action': [Equipment.objects.first().pk],
+            'new_status': 'REP',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(list(AuditLog.objects.values_list('user__user__username', flat=True)), ['otro'])
+
+class AsyncDashboardApiTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser', email='test@tuempresa.com', password='Testpass123!'
+        )
+        self.company_user = CompanyUser.objects.create(
+            user=self.user, department='IT', phone='1234567890', email='test@tuempresa.com'
+        )
+        self.equipment = Equipment.objects.create(
+            type='LAP', brand='Dell', model='XPS 13', serial_number='ASYNC1',
+            purchase_date='2023-01-01', location='Office 101', status='AVA'
+        )
+        MaintenanceLog.objects.create(
+            equipment=self.equipment, maintenance_type='REP', title='Repair', description='Test',
+            technician=self.company_user, start_date='2023-01-01T10:00:00Z'
+        )
+    
+    def test_dashboard_apis(self):
+        # WSGI (por defecto): vistas síncronas
+        response = self.client.get(reverse('dashboard_stats_api'))
+        self.assertEqual(response.status_code, 302)
+        
+        self.client.force_login(self.user)
+        stats = self.client.get(reverse('dashboard_stats_api')).json()
+        self.assertEqual(stats['equipment'], {'total': 1, 'available': 1, 'in_use': 0, 'in_repair': 0})
+        self.assertEqual(stats['alerts']['maintenance_pending'], 1)
+        
+        charts = self.client.get(reverse('equipment_chart_api')).json()
+        self.assertEqual(charts['by_type'], [{'type': 'LAP', 'count': 1, 'label': 'Laptop'}])
+        
+        activity = self.client.get(reverse('recent_activity_api')).json()
+        self.assertEqual(activity['maintenance'][0]['technician_name'], '')
+    
+    async def test_async_dashboard_apis_match_sync(self):
+        factory = AsyncRequestFactory()
+        anonymous = factory.get('/api/dashboard/stats/')
+        anonymous.user = AnonymousUser()
+        response = await async_views.dashboard_stats_api(anonymous)
+        self.assertEqual(response.status_code, 302)
+        
+        await sync_to_async(self.client.force_login)(self.user)
+        views = (
+            (async_views.dashboard_stats_api, 'dashboard_stats_api'),
+            (async_views.equipment_chart_data_api, 'equipment_chart_api'),
+            (async_views.recent_activity_api, 'recent_activity_api'),
+        )
+        for view, name in views:
+            request = factory.get(reverse(name))
+            request.user = self.user
+            data = json.loads((await view(request)).content)
+            expected = (await sync_to_async(self.client.get)(reverse(name))).json()
+            data.pop('timestamp', None)
+            expected.pop('timestamp', None)
+            self.assertEqual(data, expected)
+
+
+class CompanyUserProfileTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='perfil', password='Testpass123!')
+    
+    def make_request(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        request.session = self.session
+        return request
+    
+    def test_profile_created_and_cached_in_session(self):
+        self.session = SessionStore()
+        self.session[SESSION_KEY] = str(self.user.pk)
+        
+        company_user = resolve_company_user(self.make_request())
+        self.assertEqual(company_user.email, 'perfil@tuempresa.com')
+        self.assertTrue(CompanyUser.objects.filter(user=self.user).exists())
+        
+        # Siguientes peticiones: desde la sesión, sin consultas
+        with self.assertNumQueries(0):
+            cached = resolve_company_user(self.make_request())
+            self.assertEqual((cached.pk, cached.department, cached.user), (company_user.pk, 'IT', self.user))
+        
+        # Un cambio del perfil invalida la copia de la sesión
+        with self.captureOnCommitCallbacks(execute=True):
+            company_user.phone = '555-0100'
+            company_user.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(resolve_company_user(self.make_request()).phone, '555-0100')
+    
+    def test_profile_through_middleware(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('support_ticket_create'), {
+            'title': 'Pantalla', 'description': 'No enciende', 'priority': 'MED',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(CompanyUser.objects.filter(user=self.user).count(), 1)
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='Testpass123!', is_staff=True)
+        self.user = User.objects.create_user(username='plain', password='Testpass123!')
+    
+    def test_metrics_endpoint(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('equipment_list'))
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        
+        # Otro worker que ya volcó sus series
+        other = metrics.WorkerMetrics()
+        other.name = f'worker-{os.getppid()}-0.json'
+        other.record('inventory/equipment/', 'GET', 200, 0.2, 4, 0.01, 100)
+        other.flush(metrics.metrics_dir(), force=True)
+        
+        self.client.force_login(self.admin)
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        route = 'route="inventory/equipment/",method="GET"'
+        totals = metrics.collect()[('inventory/equipment/', 'GET', 200)]
+        self.assertGreaterEqual(totals[metrics.REQUESTS], 2)
+        self.assertIn(f'inventory_http_requests_total{{{route},status="200"}} {totals[metrics.REQUESTS]}', body)
+        self.assertIn(f'inventory_http_request_duration_seconds_bucket{{{route},le="0.25"}}', body)
+        self.assertIn(f'inventory_db_queries_total{{{route}}} {totals[metrics.SQL_QUERIES]}', body)
+        self.assertGreater(totals[metrics.SQL_QUERIES], 4)
+        self.assertGreater(totals[metrics.RESPONSE_BYTES], 100)
+        
+        self.client.logout()
+        with override_settings(METRICS_TOKEN='s3cret'):
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer nope').status_code, 403)
+
+
+    def test_finished_workers_are_retired(self):
+        directory = metrics.metrics_dir()
+        key = ('inventory/retired/', 'GET', 200)
+        
+        def serve_and_exit():
+            metrics.worker().record(*key, 0.1, 2, 0.01, 50)
+            metrics.flush_worker()  # el worker_exit de gunicorn
+        
+        for _ in range(2):
+            child = multiprocessing.get_context('fork').Process(target=serve_and_exit)
+            child.start()
+            child.join()
+            self.assertEqual(child.exitcode, 0)
+        
+        # Los contadores no bajan al desaparecer los workers ni se suman dos veces
+        self.assertEqual(metrics.collect()[key][metrics.REQUESTS], 2)
+        self.assertEqual(metrics.collect()[key][metrics.REQUESTS], 2)
+        self.assertFalse([
+            name for name in os.listdir(directory)
+            if name.startswith('worker-') and str(child.pid) in name
+        ])
+        self.assertTrue(os.path.exists(os.path.join(directory, metrics.RETIRED_FILE)))
+
+
+class QueryBudgetTestCase(TestCase):
+    """
+    QueryInspectionMiddleware hace fallar cualquier petición de los tests con un
+    N+1 o fuera del presupuesto declarado; aquí, listados con bastantes filas
+    """
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='Adminpass123!')
+        technicians = []
+        for i in range(12):
+            user = User.objects.create_user(username=f'tec{i}', first_name=f'Tec {i}')
+            technicians.append(CompanyUser.objects.create(
+                user=user, department='IT', phone=str(i), email=f'tec{i}@tuempresa.com'
+            ))
+        for i, technician in enumerate(technicians):
+            equipment = Equipment.objects.create(
+                type='LAP', brand='Dell', model='XPS 13', serial_number=f'QB{i}',
+                purchase_date='2023-01-01', location='Office 101', status='INU', assigned_to=technician,
+            )
+            MaintenanceLog.objects.create(
+                equipment=equipment, maintenance_type='REP', title='Repair', description='-',
+                technician=technician, start_date='2023-01-01T10:00:00Z',
+            )
+            SupportTicket.objects.create(
+                title='Ticket', description='-', priority='MED', created_by=technician,
+                assigned_to=technician, equipment=equipment,
+            )
+        self.client.force_login(self.admin)
+    
+    def test_lists_within_budget(self):
+        for url in (
+            reverse('dashboard'),
+            reverse('equipment_list'),
+            '/admin/inventory_app/equipment/',
+            '/api/v1/equipment/?fast=0',
+            '/api/v1/maintenance/?fast=0',
+            '/api/v1/support-tickets/',
+        ):
+            response = self.client.get(url, HTTP_ACCEPT='text/html' if 'api' not in url else 'application/json')
+            self.assertEqual(response.status_code, 200, url)
+        
+        admin_page = self.client.get('/admin/inventory_app/equipment/').content.decode()
+        self.assertIn('01/01/2023', admin_page)
+        # Último mantenimiento con una subconsulta por fila de la página, sin agrupar la tabla
+        changelist = self.client.get('/admin/inventory_app/equipment/').context['cl']
+        self.assertNotIn('GROUP BY', str(changelist.result_list.query))
+        self.assertEqual(
+            {equipment.last_maintenance_date.year for equipment in changelist.result_list}, {2023}
+        )
+    
+    def test_inspect_queries_reports_origin(self):
+        with self.assertRaises(QueryBudgetExceeded) as raised:
+            with inspect_queries(max_repeats=5):
+                for equipment in Equipment.objects.all():
+                    equipment.assigned_to.user.username
+        self.assertIn('posible N+1: 12 veces', str(raised.exception))
+        self.assertIn('test_views.py', str(raised.exception))
+        
+        with inspect_queries(max_queries=1, max_repeats=1):
+            list(Equipment.objects.select_related('assigned_to__user'))
+
+
+    def test_bulk_and_batch_budgets(self):
+        # Las acciones masivas tienen su propio presupuesto
+        bulk = resolve('/api/v1/equipment/bulk/').func
+        self.assertEqual(view_budget(bulk, 'POST').max_repeats, BULK_MAX_REPEATS)
+        self.assertEqual(view_budget(bulk, 'GET'), view_budget(resolve('/api/v1/equipment/').func, 'GET'))
+        
+        # Un lote repite las consultas de cada subpetición sin ser un N+1...
+        requests = [{'method': 'GET', 'path': f'/api/v1/equipment/{pk}/'} for pk in Equipment.objects.values_list('pk', flat=True)]
+        response = self.client.post('/api/v1/batch/', {'requests': requests}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({result['status'] for result in response.json()['results']}, {200})
+        
+        # ...pero cada subpetición se comprueba con el presupuesto de su vista
+        with self.assertRaises(QueryBudgetExceeded) as raised:
+            with inspect_queries(max_repeats=UNLIMITED):
+                with inspect_sub_request(resolve('/api/v1/equipment/').func, 'GET', '/api/v1/equipment/'):
+                    for equipment in Equipment.objects.all():
+                        equipment.assigned_to.user.username
+        self.assertIn('GET /api/v1/equipment/: posible N+1: 12 veces', str(raised.exception))
+
+
+@override_settings(PROFILE_RING_SIZE=2)
+class ProfilingTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='Adminpass123!')
+        self.user = User.objects.create_user(username='plain', password='Testpass123!')
+        Equipment.objects.create(
+            type='LAP', brand='Dell', model='XPS 13', serial_number='PROF1',
+            purchase_date='2023-01-01', location='Office 101', status='AVA'
+        )
+    
+    def test_profile_on_demand(self):
+        # Solo administradores
+        self.client.force_login(self.user)
+        self.assertNotIn('X-Profile-Id', self.client.get(reverse('equipment_list'), {'_profile': '1'}))
+        
+        self.client.force_login(self.admin)
+        ids = [
+            self.client.get(reverse('equipment_list'), {'_profile': '1'})['X-Profile-Id'],
+            self.client.get(reverse('equipment_list'), HTTP_X_PROFILE='sample')['X-Profile-Id'],
+            self.client.get(reverse('dashboard'), {'_profile': '1'})['X-Profile-Id'],
+        ]
+        # Anillo de dos perfiles: el primero ya no está
+        self.assertEqual([profile['id'] for profile in profiling.list_profiles()], ids[:0:-1])
+        self.assertIsNone(profiling.load_profile(ids[0]))
+        
+        profile = profiling.load_profile(ids[2])
+        self.assertEqual((profile['mode'], profile['path'], profile['status']), ('cprofile', '/dashboard/?_profile=1', 200))
+        self.assertGreater(profile['sql_count'], 0)
+        self.assertTrue(any('views.py' in row['function'] for row in profile['functions']))
+        self.assertTrue(any('views.py' in query['origin'] for query in profile['queries']))
+        self.assertEqual(profiling.load_profile(ids[1])['mode'], 'sample')
+        
+        response = self.client.get(reverse('custom_admin:profile_list'))
+        self.assertContains(response, reverse('custom_admin:profile_detail', args=[ids[2]]))
+        response = self.client.get(reverse('custom_admin:profile_detail', args=[ids[2]]), {'order': 'total'})
+        self.assertContains(response, 'inventory_app_equipment')
+        self.assertEqual(self.client.get(reverse('custom_admin:profile_detail', args=['..x'])).status_code, 404)
+
+
+class RequestLogTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='plain', password='Testpass123!')
+    
+    def test_request_record(self):
+        self.client.force_login(self.user)
+        with self.assertLogs('inventory_app.requests', 'INFO') as logs:
+            response = self.client.get(reverse('equipment_list'))
+            self.client.get(reverse('equipment_list'), HTTP_X_REQUEST_ID='lb-1234')
+            self.client.get(reverse('equipment_list'), HTTP_X_REQUEST_ID='no válido')
+        first, forwarded, invalid = logs.records
+        self.assertEqual(first.request_id, response['X-Request-ID'])
+        self.assertEqual(
+            (first.user, first.route, first.method, first.status),
+            ('plain', 'inventory/equipment/', 'GET', 200),
+        )
+        self.assertGreater(first.sql_queries, 0)
+        self.assertGreater(first.duration_ms, 0)
+        self.assertEqual(forwarded.request_id, 'lb-1234')
+        self.assertEqual(len(invalid.request_id), 32)
+
+
+class FileServingTestCase(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.root, 'docs'))
+        self.data = bytes(range(256)) * 40
+        with open(os.path.join(self.root, 'docs', 'manual.pdf'), 'wb') as handle:
+            handle.write(self.data)
+        with open(os.path.join(self.root, 'backup_20240101_000000.zip'), 'wb') as handle:
+            handle.write(self.data)
+        self.url = reverse('media', args=['docs/manual.pdf'])
+    
+    def test_media_streaming_and_ranges(self):
+        with override_settings(MEDIA_ROOT=self.root):
+            response = self.client.get(self.url)
+            self.assertTrue(response.streaming)
+            self.assertEqual(b''.join(response.streaming_content), self.data)
+            self.assertEqual((response['Content-Type'], response['Accept-Ranges']), ('application/pdf', 'bytes'))
+            
+            response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.data)}')
+            self.assertEqual(b''.join(response.streaming_content), self.data[100:200])
+            response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+            self.assertEqual(b''.join(response.streaming_content), self.data[-10:])
+            self.assertEqual(self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.data)}-').status_code, 416)
+            # If-Range con otro ETag: el fichero cambió, se envía completo
+            response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"otro"')
+            self.assertEqual(response.status_code, 200)
+            
+            etag = response['ETag']
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.assertEqual(self.client.get(reverse('media', args=['../etc/passwd'])).status_code, 404)
+            self.assertEqual(self.client.get(reverse('media', args=['docs'])).status_code, 404)
+            self.assertEqual(self.client.post(self.url).status_code, 405)
+    
+    def test_sendfile_offload(self):
+        with override_settings(MEDIA_ROOT=self.root, SENDFILE_BACKEND='x-accel-redirect'):
+            response = self.client.get(self.url)
+            self.assertEqual(response['X-Accel-Redirect'], '/protected-media/docs/manual.pdf')
+            self.assertEqual(response.content, b'')
+            # A nginx llega la ruta del fichero comprobado, normalizada
+            request = RequestFactory().get('/media/docs/../docs/manual.pdf')
+            response = serve_file(request, self.root, 'docs/../docs/manual.pdf', accel_prefix='/protected-media/')
+            self.assertEqual(response['X-Accel-Redirect'], '/protected-media/docs/manual.pdf')
+        with override_settings(MEDIA_ROOT=self.root, SENDFILE_BACKEND='x-sendfile'):
+            response = self.client.get(self.url)
+            self.assertEqual(response['X-Sendfile'], os.path.join(self.root, 'docs', 'manual.pdf'))
+    
+    def test_backup_download_is_streamed(self):
+        User.objects.create_user(username='admin', password='Testpass123!', is_staff=True)
+        self.client.login(username='admin', password='Testpass123!')
+        with override_settings(BACKUP_PATH=self.root):
+            response = self.client.get(reverse('download_backup', args=['backup_20240101_000000.zip']))
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="backup_20240101_000000.zip"')
+        self.assertEqual(b''.join(response.streaming_content), self.data)
@@ -0,0 +1,60 @@
+"""
+Throttling de la API con la tabla de cubetas compartida entre workers.
+
+Los throttles de DRF guardan su historial en la caché por defecto, que es
+``LocMemCache`` en cada proceso: con N workers el límite real era N veces el
+configurado. Estas clases usan :class:`utils.token_buckets.TokenBucketTable`
+(un fichero mapeado en memoria en ``THROTTLE_TABLE_PATH``) con las mismas
+tasas y ámbitos (``anon``/``user``) de ``DEFAULT_THROTTLE_RATES``.
+"""
+import os
+import threading
+
+from django.conf import settings
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+
+from .utils.token_buckets import DEFAULT_COMPACT_INTERVAL, DEFAULT_SLOTS, TokenBucketTable
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def bucket_table():
+    """Tabla del proceso actual (se abre de nuevo tras un ``fork``)."""
+    path = getattr(settings, 'THROTTLE_TABLE_PATH', os.path.join(settings.BASE_DIR, 'cache', 'throttle.bin'))
+    key = (os.getpid(), path)
+    table = _tables.get(key)
+    if table is None:
+        with _tables_lock:
+            table = _tables.get(key)
+            if table is None:
+                table = _tables[key] = TokenBucketTable(
+                    path,
+                    slots=getattr(settings, 'THROTTLE_TABLE_SLOTS', DEFAULT_SLOTS),
+                    compact_interval=getattr(settings, 'THROTTLE_COMPACT_INTERVAL', DEFAULT_COMPACT_INTERVAL),
+                )
+    return table
+
+
+class SharedRateThrottleMixin:
+    """``allow_request`` de ``SimpleRateThrottle`` sobre la tabla compartida."""
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        allowed, self.wait_seconds = bucket_table().consume(self.key, self.num_requests, self.duration)
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class SharedAnonRateThrottle(SharedRateThrottleMixin, AnonRateThrottle):
+    pass
+
+
+class SharedUserRateThrottle(SharedRateThrottleMixin, UserRateThrottle):
+    pass
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 from .views import EquipmentListView, EquipmentDetailView, EquipmentCreateView, EquipmentUpdateView
@@ -13,7 +14,7 @@ urlpatterns = [
     path('reports/', views.reports_dashboard, name='reports_dashboard'),
     path('api/equipment-stats/', views.equipment_stats_api, name='equipment_stats_api'),
     path('api/maintenance-stats/', views.maintenance_stats_api, name='maintenance_stats_api'),
-    
+
     # URLs para tickets de soporte
     path('support/tickets/', views.support_ticket_list, name='support_ticket_list'),
     path('support/tickets/new/', views.support_ticket_create, name='support_ticket_create'),
@@ -25,7 +26,7 @@ urlpatterns = [
     path('backup/list/', views.backup_list, name='backup_list'),
     path('backup/download/<str:filename>/', views.download_backup, name='download_backup'),
     path('backup/delete/<str:filename>/', views.delete_backup, name='delete_backup'),
-    
+
     # APIs para dashboard dinámico
     path('api/dashboard/stats/', views.dashboard_stats_api, name='dashboard_stats_api'),
     path('api/dashboard/equipment-chart/', views.equipment_chart_data_api, name='equipment_chart_api'),
@@ -33,4 +34,14 @@ urlpatterns = [
 
     # URL de registro definida aquí también por si acaso
     path('accounts/register/', views.register, name='register'),
-    ]
\ No newline at end of file
+    ]
+
+# Despliegue ASGI: APIs del dashboard asíncronas (ver async_views)
+if settings.ASYNC_API_READS:
+    from . import async_views
+
+    urlpatterns = [
+        path('api/dashboard/stats/', async_views.dashboard_stats_api),
+        path('api/dashboard/equipment-chart/', async_views.equipment_chart_data_api),
+        path('api/dashboard/recent-activity/', async_views.recent_activity_api),
+    ] + urlpatterns
@@ -0,0 +1,161 @@
+"""
+Ejecución de varias peticiones de la API en una sola (``/api/v1/batch/``).
+
+Cada subpetición se resuelve contra las URLs de la API y se ejecuta llamando
+directamente a la vista, en el mismo proceso. La autenticación se hace una vez
+(la de la petición de lote) y se reutiliza con la autenticación forzada de DRF;
+no se vuelven a ejecutar los middlewares ni la sesión. Los permisos, el
+throttling y el presupuesto de consultas de cada vista se aplican igual que
+en una llamada suelta.
+
+Con ``atomic`` todas las subpeticiones comparten una transacción: la primera
+que falla (estado >= 400) deshace las anteriores y las siguientes no se
+ejecutan.
+"""
+from contextlib import nullcontext
+from io import BytesIO
+from urllib.parse import urlencode
+
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import transaction
+from django.urls import Resolver404, resolve
+from rest_framework.views import APIView
+
+from . import fast_json, query_budget
+
+# Máximo de subpeticiones por lote
+BATCH_MAX_REQUESTS = 20
+
+BATCH_METHODS = ('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE')
+API_PREFIX = '/api/v1/'
+
+# Cabeceras de la respuesta que se devuelven con cada resultado
+FORWARDED_HEADERS = ('ETag', 'Last-Modified', 'Location', 'X-Cache')
+
+
+class InvalidBatch(Exception):
+    pass
+
+
+class Rollback(Exception):
+    pass
+
+
+def parse_operations(data):
+    """Validar el cuerpo del lote y devolver ``(operaciones, atomic)``."""
+    if not isinstance(data, dict) or not isinstance(data.get('requests'), list):
+        raise InvalidBatch('Se esperaba un objeto con la lista "requests"')
+    operations = data['requests']
+    if not operations:
+        raise InvalidBatch('El lote está vacío')
+    if len(operations) > BATCH_MAX_REQUESTS:
+        raise InvalidBatch(f'Máximo {BATCH_MAX_REQUESTS} peticiones por lote')
+
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or not isinstance(operation.get('path'), str):
+            raise InvalidBatch(f'Petición {index}: se esperaba un objeto con "path"')
+        method = str(operation.get('method', 'GET')).upper()
+        if method not in BATCH_METHODS:
+            raise InvalidBatch(f'Petición {index}: método {method} no permitido')
+        if not isinstance(operation.get('params', {}), dict) or not isinstance(operation.get('headers', {}), dict):
+            raise InvalidBatch(f'Petición {index}: "params" y "headers" deben ser objetos')
+    return operations, bool(data.get('atomic', False))
+
+
+class BatchExecutor:
+    """Ejecuta las subpeticiones de un lote con el usuario de ``request``."""
+
+    def __init__(self, request):
+        self.request = request
+
+    def build_request(self, operation):
+        method = str(operation.get('method', 'GET')).upper()
+        path, _, query = operation['path'].partition('?')
+        params = operation.get('params') or {}
+        if params:
+            extra = urlencode(params, doseq=True)
+            query = f'{query}&{extra}' if query else extra
+        body = b''
+        if 'body' in operation and method not in ('GET', 'HEAD'):
+            body = fast_json.dumps(operation['body'])
+
+        environ = {
+            key: value for key, value in self.request.META.items()
+            if not key.startswith(('HTTP_IF_', 'CONTENT_'))
+        }
+        environ.update({
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'SCRIPT_NAME': '',
+            'QUERY_STRING': query,
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(body)),
+            'HTTP_ACCEPT': 'application/json',
+            'wsgi.input': BytesIO(body),
+        })
+        environ.setdefault('wsgi.url_scheme', self.request.scheme)
+        for name, value in (operation.get('headers') or {}).items():
+            environ['HTTP_' + name.upper().replace('-', '_')] = str(value)
+
+        sub_request = WSGIRequest(environ)
+        # Autenticación compartida: DRF usa este usuario sin volver a autenticar
+        sub_request._force_auth_user = self.request.user
+        sub_request._force_auth_token = self.request.auth
+        sub_request.user = self.request.user
+        sub_request.session = getattr(self.request, 'session', None)
+        sub_request.company_user = getattr(self.request, 'company_user', None)
+        return sub_request
+
+    def resolve(self, path):
+        path = path.partition('?')[0]
+        if not path.startswith(API_PREFIX):
+            return None
+        try:
+            match = resolve(path)
+        except Resolver404:
+            return None
+        # Con ASGI las lecturas se resuelven a una vista asíncrona: se usa el ViewSet
+        func = getattr(match.func, 'sync_view', match.func)
+        view_class = getattr(func, 'cls', None)
+        if view_class is None or not issubclass(view_class, APIView) or match.url_name == 'api_batch':
+            return None
+        return func, match.args, match.kwargs
+
+    def execute(self, operation):
+        resolved = self.resolve(operation['path'])
+        if resolved is None:
+            return {'status': 404, 'body': {'error': 'Ruta de la API no encontrada'}}
+
+        func, args, kwargs = resolved
+        sub_request = self.build_request(operation)
+        with query_budget.inspect_sub_request(func, sub_request.method, sub_request.path):
+            response = func(sub_request, *args, **kwargs)
+        result = {
+            'status': response.status_code,
+            'body': getattr(response, 'data', None),
+        }
+        headers = {name: response[name] for name in FORWARDED_HEADERS if response.has_header(name)}
+        if headers:
+            result['headers'] = headers
+        return result
+
+    def run(self, operations, atomic=False):
+        """Devolver ``(resultados, deshecho)``."""
+        results = []
+        try:
+            with transaction.atomic() if atomic else nullcontext():
+                for operation in operations:
+                    result = self.execute(operation)
+                    if 'id' in operation:
+                        result['id'] = operation['id']
+                    results.append(result)
+                    if atomic and result['status'] >= 400:
+                        raise Rollback
+        except Rollback:
+            for operation in operations[len(results):]:
+                skipped = {'status': 424, 'body': None}
+                if 'id' in operation:
+                    skipped['id'] = operation['id']
+                results.append(skipped)
+            return results, True
+        return results, False
@@ -0,0 +1,297 @@
+"""
+Escritura masiva de equipos desde la API (alta, actualización parcial y upsert).
+
+Todos los elementos se validan antes de escribir. Los campos se validan con el
+serializer, sin consultas. La unicidad de ``serial_number`` y las claves
+foráneas se comprueban con una consulta por lote. Las filas válidas se escriben
+por bloques con ``bulk_create``/``bulk_update``, con un ``bulk_create`` de
+auditoría por bloque. Como no se emiten señales, las facetas, los conteos por
+ubicación y las generaciones de los conteos cacheados se ajustan a mano, en la
+misma transacción que cada bloque.
+
+Si otra petición da de alta uno de los números de serie entre la validación y
+la escritura, el bloque se reintenta sin esas filas: en un upsert pasan a ser
+actualizaciones y en un alta se devuelven como error.
+"""
+from collections import Counter
+from contextlib import nullcontext
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from ..models import AuditLog, ChangeLog, CompanyUser, Equipment, FacetValue, LocationRollup
+from ..serializers import EquipmentBulkItemSerializer
+from . import facets, locations
+from .bulk_actions import BULK_CHUNK_SIZE
+from .counting import bump_table_generation
+from .sync import record_changes
+
+# Máximo de elementos por petición
+BULK_MAX_ITEMS = 5000
+
+# Repeticiones admitidas de una misma consulta en las acciones masivas: cada
+# bloque repite las suyas, y otra vez si hay que reintentarlo
+BULK_MAX_REPEATS = 2 * -(-BULK_MAX_ITEMS // BULK_CHUNK_SIZE)
+
+# Campos cuyo valor previo se necesita para ajustar facetas y conteos
+SNAPSHOT_FIELDS = ('location', 'brand', 'status', 'type', 'location_path')
+
+
+class EquipmentBulkWriter:
+    """
+    Ejecuta una escritura masiva y acumula un resultado por elemento.
+
+    ``mode`` es ``'create'``, ``'update'`` (parcial, cada elemento con ``id``) o
+    ``'upsert'`` (por ``serial_number``). Con ``atomic=True`` no se escribe nada
+    si algún elemento es inválido.
+    """
+
+    def __init__(self, actor=None, ip_address=None, chunk_size=BULK_CHUNK_SIZE):
+        self.actor = actor
+        self.ip_address = ip_address
+        self.chunk_size = chunk_size
+        self.results = []
+
+    # -------------------------------------------------------------------------
+    # Validación
+    # -------------------------------------------------------------------------
+
+    def _error(self, index, errors):
+        self.results[index] = {'index': index, 'status': 'error', 'errors': errors}
+
+    def _targets(self, items, mode):
+        """Equipo existente de cada elemento (``None`` si es un alta)."""
+        targets = [None] * len(items)
+        if mode == 'update':
+            ids = [item.get('id') for item in items if isinstance(item.get('id'), int)]
+            existing = Equipment.objects.in_bulk(ids)
+            for index, item in enumerate(items):
+                if not isinstance(item.get('id'), int):
+                    self._error(index, {'id': ['Este campo es requerido.']})
+                elif item['id'] not in existing:
+                    self._error(index, {'id': [f"No existe un equipo con id {item['id']}."]})
+                else:
+                    targets[index] = existing[item['id']]
+        elif mode == 'upsert':
+            serials = [item.get('serial_number') for item in items if item.get('serial_number')]
+            existing = Equipment.objects.in_bulk(serials, field_name='serial_number')
+            for index, item in enumerate(items):
+                if not item.get('serial_number'):
+                    self._error(index, {'serial_number': ['Este campo es requerido.']})
+                else:
+                    targets[index] = existing.get(item['serial_number'])
+        return targets
+
+    def validate(self, items, mode):
+        """Devolver ``[(índice, equipo_existente, datos_validados), ...]`` válidos."""
+        self.results = [None] * len(items)
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                self._error(index, {'non_field_errors': ['Se esperaba un objeto.']})
+        objects = [item if isinstance(item, dict) else {} for item in items]
+        targets = self._targets(objects, mode)
+
+        # Un serializer por modo: los campos se construyen una sola vez
+        full = EquipmentBulkItemSerializer(many=True).child
+        partial = EquipmentBulkItemSerializer(many=True, partial=True).child
+
+        validated = []
+        for index, item in enumerate(objects):
+            if self.results[index] is not None:
+                continue
+            target = targets[index]
+            child = partial if target is not None else full
+            try:
+                data = child.run_validation(item)
+            except ValidationError as exc:
+                self._error(index, exc.detail)
+                continue
+            validated.append((index, target, data))
+
+        return self._check_references(validated)
+
+    def _check_references(self, validated):
+        """Unicidad de ``serial_number`` y existencia de ``assigned_to`` (una consulta cada una)."""
+        serials = {data['serial_number'] for _, _, data in validated if 'serial_number' in data}
+        owners = dict(
+            Equipment.objects.filter(serial_number__in=serials).values_list('serial_number', 'pk')
+        ) if serials else {}
+        user_ids = {data['assigned_to'] for _, _, data in validated if data.get('assigned_to')}
+        known_users = set(
+            CompanyUser.objects.filter(pk__in=user_ids).values_list('pk', flat=True)
+        ) if user_ids else set()
+
+        checked, seen = [], set()
+        for index, target, data in validated:
+            errors = {}
+            serial = data.get('serial_number')
+            if serial is not None:
+                owner = owners.get(serial)
+                if serial in seen:
+                    errors['serial_number'] = ['Número de serie repetido en la petición.']
+                elif owner is not None and (target is None or owner != target.pk):
+                    errors['serial_number'] = ['Ya existe un equipo con este número de serie.']
+                seen.add(serial)
+            if data.get('assigned_to') and data['assigned_to'] not in known_users:
+                errors['assigned_to'] = [f"No existe un usuario con id {data['assigned_to']}."]
+            if errors:
+                self._error(index, errors)
+            else:
+                checked.append((index, target, data))
+        return checked
+
+    # -------------------------------------------------------------------------
+    # Escritura
+    # -------------------------------------------------------------------------
+
+    def _chunks(self, rows):
+        for start in range(0, len(rows), self.chunk_size):
+            yield rows[start:start + self.chunk_size]
+
+    def _audit(self, entries):
+        if self.actor is None or not entries:
+            return
+        AuditLog.objects.bulk_create([
+            AuditLog(
+                user=self.actor, action=action, model_name='Equipment',
+                object_id=object_id, details=details, ip_address=self.ip_address,
+            )
+            for action, object_id, details in entries
+        ])
+
+    def _insert(self, chunk):
+        objects = []
+        for _, _, data in chunk:
+            data = dict(data)
+            data['assigned_to_id'] = data.pop('assigned_to', None)
+            objects.append(Equipment(**data))
+        locations.link_locations(objects)
+        with transaction.atomic():
+            Equipment.objects.bulk_create(objects)
+            record_changes(Equipment, [equipment.pk for equipment in objects])
+            self._audit([
+                ('CRE', equipment.pk, f"Equipment created via API (bulk): {equipment}")
+                for equipment in objects
+            ])
+            self._sync_derived(objects, [])
+        return objects
+
+    def _split_taken(self, chunk):
+        """Separar las filas cuyo número de serie ya existe: ``(libres, [(índice, equipo, datos)])``."""
+        owners = Equipment.objects.in_bulk(
+            [data['serial_number'] for _, _, data in chunk], field_name='serial_number'
+        )
+        free = [row for row in chunk if row[2]['serial_number'] not in owners]
+        taken = [
+            (index, owners[data['serial_number']], data)
+            for index, _, data in chunk if data['serial_number'] in owners
+        ]
+        return free, taken
+
+    def _create(self, rows, mode):
+        """Altas por bloques; devuelve las filas que otra petición dio de alta entretanto."""
+        taken = []
+        for chunk in self._chunks(rows):
+            objects = []
+            while chunk:
+                try:
+                    objects = self._insert(chunk)
+                    break
+                except IntegrityError:
+                    chunk, conflicts = self._split_taken(chunk)
+                    if not conflicts:
+                        raise
+                    if mode == 'upsert':
+                        taken.extend(conflicts)
+                    else:
+                        for index, _, _ in conflicts:
+                            self._error(index, {'serial_number': ['Ya existe un equipo con este número de serie.']})
+            for (index, _, _), equipment in zip(chunk, objects):
+                self.results[index] = {
+                    'index': index, 'status': 'created',
+                    'id': equipment.pk, 'serial_number': equipment.serial_number,
+                }
+        return taken
+
+    def _update(self, rows):
+        now = timezone.now()
+        for chunk in self._chunks(rows):
+            fields = {'updated_at'}
+            objects, entries, chunk_changes = [], [], []
+            for _, equipment, data in chunk:
+                previous = {field: getattr(equipment, field) for field in SNAPSHOT_FIELDS}
+                data = dict(data)
+                if 'assigned_to' in data:
+                    data['assigned_to_id'] = data.pop('assigned_to')
+                for field, value in data.items():
+                    setattr(equipment, field, value)
+                fields.update(data)
+                equipment.updated_at = now  # bulk_update no aplica auto_now
+                objects.append(equipment)
+                chunk_changes.append((previous, equipment))
+                entries.append((
+                    'UPD', equipment.pk,
+                    f"Equipment updated via API (bulk): {', '.join(sorted(data)) or 'sin cambios'}",
+                ))
+            relink = [
+                equipment for previous, equipment in chunk_changes
+                if previous['location'] != equipment.location or not equipment.location_path
+            ]
+            if relink:
+                locations.link_locations(relink)
+                fields.update({'location_node', 'location_path'})
+            with transaction.atomic():
+                Equipment.objects.bulk_update(objects, sorted(fields))
+                record_changes(Equipment, [equipment.pk for equipment in objects])
+                self._audit(entries)
+                self._sync_derived([], chunk_changes)
+            for index, equipment, _ in chunk:
+                self.results[index] = {
+                    'index': index, 'status': 'updated',
+                    'id': equipment.pk, 'serial_number': equipment.serial_number,
+                }
+
+    def _sync_derived(self, created, changes):
+        facets.adjust_facets_for_objects(Equipment, created)
+        facets.adjust_facets_for_changes(Equipment, changes)
+
+        deltas = Counter(locations.equipment_rollup_key(equipment) for equipment in created)
+        for previous, equipment in changes:
+            deltas[locations.rollup_key(previous)] -= 1
+            deltas[locations.equipment_rollup_key(equipment)] += 1
+        locations.adjust_rollups(deltas)
+
+        for model in (Equipment, AuditLog, LocationRollup, FacetValue, ChangeLog):
+            bump_table_generation(model._meta.db_table)
+
+    def _skip_rest(self):
+        for index, result in enumerate(self.results):
+            if result is None or result['status'] != 'error':
+                self.results[index] = {'index': index, 'status': 'skipped'}
+
+    def run(self, items, mode, atomic=False):
+        rows = self.validate(items, mode)
+        has_errors = len(rows) < len(items)
+        if atomic and has_errors:
+            self._skip_rest()
+            return self.summary()
+
+        with transaction.atomic() if atomic else nullcontext():
+            taken = self._create([row for row in rows if row[1] is None], mode)
+            self._update([row for row in rows if row[1] is not None] + taken)
+            if atomic and any(result['status'] == 'error' for result in self.results):
+                # Alta simultánea de otra petición: no se escribe nada
+                transaction.set_rollback(True)
+                self._skip_rest()
+        return self.summary()
+
+    def summary(self):
+        statuses = Counter(result['status'] for result in self.results)
+        return {
+            'created': statuses['created'],
+            'updated': statuses['updated'],
+            'errors': statuses['error'],
+            'results': self.results,
+        }
+
@@ -0,0 +1,230 @@
+"""
+ETags y peticiones condicionales para los ViewSets de la API.
+
+- Detalle: ETag fuerte a partir de la versión del objeto (``updated_at`` o, en
+  modelos sin ese campo, la última entrada de ``ChangeLog``) y
+  ``Last-Modified``. La comprobación se hace con una consulta de una columna,
+  antes de cargar y serializar el objeto.
+- Listado: ETag a partir de ``max(updated_at)``, el número de filas y los
+  parámetros de la petición normalizados (filtros, orden y página).
+- Los datos anidados (el usuario asignado, el técnico) no cambian la versión
+  del objeto: el ETag lleva una segunda parte con las generaciones de las
+  tablas de ``response_cache_models`` y de ``auth_user``
+  (``"<versión>-<dependencias>"``).
+- ``If-None-Match``/``If-Modified-Since`` devuelven 304 (evaluación de
+  Django, ``get_conditional_response``). ``If-Match``/``If-Unmodified-Since``
+  en PUT/PATCH devuelven 412 si el propio objeto cambió (control de
+  concurrencia optimista): ``If-Match`` se compara solo con la parte de la
+  versión, para que editar otro usuario no haga fallar la escritura, y la
+  fila queda bloqueada (``select_for_update``) hasta el commit.
+"""
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from ..models import ChangeLog
+from .counting import get_table_generations
+from .sync import SYNC_NAMES
+
+
+def _timestamp(value):
+    return int(value.timestamp()) if value is not None else None
+
+
+def _digest(parts):
+    return hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+
+
+def make_etag(*parts, dependencies=None):
+    digest = _digest(parts)
+    if dependencies is not None:
+        digest = f'{digest}-{_digest(dependencies)[:16]}'
+    return quote_etag(digest)
+
+
+def etag_version(etag):
+    """Parte de la versión de un ETag, sin ``W/`` (compresión) ni dependencias."""
+    return etag.removeprefix('W/').strip('"').split('-')[0]
+
+
+def normalized_params(request):
+    """Parámetros de la petición en forma canónica (orden de claves y valores)."""
+    return tuple(sorted(
+        (key, tuple(sorted(values))) for key, values in request.query_params.lists()
+    ))
+
+
+def latest_change(model, **filters):
+    """``(secuencia, fecha)`` del último cambio registrado de ``model``."""
+    return ChangeLog.objects.filter(model_name=SYNC_NAMES[model], **filters).order_by(
+        '-id'
+    ).values_list('id', 'changed_at').first() or (0, None)
+
+
+class ConditionalRequestMixin:
+    """
+    ETags y precondiciones para ``retrieve``, ``list``, ``update`` y
+    ``partial_update`` de un ModelViewSet.
+
+    ``etag_version_field`` es el campo que cambia con cada escritura; con
+    ``None`` la versión sale de la secuencia de ``ChangeLog``.
+    """
+    etag_version_field = 'updated_at'
+    # Filas del último listado, contadas para el ETag (las reutiliza
+    # ``AsyncReadView`` para no contar dos veces)
+    list_total = None
+
+    # -------------------------------------------------------------------------
+    # Validadores
+    # -------------------------------------------------------------------------
+
+    def dependency_generations(self, model):
+        """Generaciones de las tablas de los datos anidados en la respuesta."""
+        tables = [
+            dependency._meta.db_table
+            for dependency in getattr(self, 'response_cache_models', ())
+            if dependency is not model
+        ]
+        return get_table_generations(tables + [get_user_model()._meta.db_table])
+
+    def get_object_validators(self, lock=False):
+        """
+        ``(etag, last_modified)`` del objeto de la URL, o ``None`` si no existe
+        o si el valor de la URL no es válido para el campo (como
+        ``get_object_or_404`` de DRF: la vista responde entonces el 404 habitual).
+        """
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+            if lock:
+                queryset = queryset.select_for_update(of=('self',))
+            if self.etag_version_field:
+                row = queryset.values_list('pk', self.etag_version_field).first()
+            else:
+                row = queryset.values_list('pk', flat=True).first()
+        except (TypeError, ValueError, ValidationError):
+            return None
+        if row is None:
+            return None
+        model = queryset.model
+        if self.etag_version_field:
+            pk, version = row
+            last_modified = version
+        else:
+            pk = row
+            version, last_modified = latest_change(model, object_id=pk)
+        etag = make_etag(
+            model._meta.label, pk, version, self.representation_key(),
+            dependencies=self.dependency_generations(model),
+        )
+        return etag, _timestamp(last_modified)
+
+    def get_list_validators(self, queryset):
+        model = queryset.model
+        if self.etag_version_field:
+            stats = queryset.order_by().aggregate(
+                version=Max(self.etag_version_field), total=Count('pk')
+            )
+            last_modified = stats['version']
+        else:
+            pks = queryset.order_by().values('pk')
+            stats = {
+                'total': pks.count(),
+                **ChangeLog.objects.filter(
+                    model_name=SYNC_NAMES[model], object_id__in=pks
+                ).aggregate(version=Max('id'), changed_at=Max('changed_at')),
+            }
+            last_modified = stats['changed_at']
+
+        self.list_total = stats['total']
+
+        # Una baja no cambia max(updated_at): se tiene en cuenta la última baja
+        _, last_delete = latest_change(model, operation='D')
+        if last_delete is not None and (last_modified is None or last_delete > last_modified):
+            last_modified = last_delete
+
+        etag = make_etag(
+            model._meta.label, stats['version'], stats['total'],
+            normalized_params(self.request), self.representation_key(),
+            dependencies=self.dependency_generations(model),
+        )
+        return etag, _timestamp(last_modified)
+
+    def representation_key(self):
+        # El navegable y el JSON son representaciones distintas del mismo recurso
+        renderer = getattr(self.request, 'accepted_renderer', None)
+        return renderer.format if renderer is not None else ''
+
+    def check_write_preconditions(self, request, etag, last_modified):
+        """Respuesta 412 si ``If-Match``/``If-Unmodified-Since`` no se cumplen."""
+        if_match = request.META.get('HTTP_IF_MATCH')
+        if if_match:
+            etags = parse_etags(if_match)
+            if '*' in etags or etag_version(etag) in {etag_version(value) for value in etags}:
+                return None
+        elif last_modified is not None:
+            # Sin If-Match, como indica la RFC 9110
+            since = parse_http_date_safe(request.META.get('HTTP_IF_UNMODIFIED_SINCE', ''))
+            if since is None or last_modified <= since:
+                return None
+        else:
+            return None
+        return Response(
+            {'detail': 'El recurso cambió desde que se leyó.'},
+            status=status.HTTP_412_PRECONDITION_FAILED,
+        )
+
+    def set_validators(self, response, etag, last_modified):
+        if 200 <= response.status_code < 300:
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    # -------------------------------------------------------------------------
+    # Acciones
+    # -------------------------------------------------------------------------
+
+    def retrieve(self, request, *args, **kwargs):
+        validators = self.get_object_validators()
+        if validators is None:
+            return super().retrieve(request, *args, **kwargs)  # 404 habitual
+        etag, last_modified = validators
+        conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if conditional is not None:
+            return conditional
+        response = super().retrieve(request, *args, **kwargs)
+        return self.set_validators(response, etag, last_modified)
+
+    def list(self, request, *args, **kwargs):
+        etag, last_modified = self.get_list_validators(self.filter_queryset(self.get_queryset()))
+        conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if conditional is not None:
+            return conditional
+        response = super().list(request, *args, **kwargs)
+        return self.set_validators(response, etag, last_modified)
+
+    def update(self, request, *args, **kwargs):
+        # PUT y PATCH (``partial_update`` delega aquí). La fila queda
+        # bloqueada entre la comprobación y el guardado: otra escritura no
+        # puede colarse en medio
+        with transaction.atomic():
+            validators = self.get_object_validators(lock=True)
+            if validators is not None:
+                failed = self.check_write_preconditions(request, *validators)
+                if failed is not None:
+                    return failed
+            response = super().update(request, *args, **kwargs)
+        validators = self.get_object_validators()
+        if validators is not None:
+            self.set_validators(response, *validators)
+        return response
@@ -0,0 +1,221 @@
+"""
+Conteos aproximados y cacheados para listados paginados.
+
+Con tablas grandes (AuditLog, MaintenanceLog) el ``SELECT COUNT(*)`` que hace
+cada paginador domina el tiempo de respuesta. Este módulo ofrece:
+
+- estimaciones del planificador (``pg_class.reltuples`` en PostgreSQL y
+  ``sqlite_stat1`` en SQLite) para listados sin filtrar;
+- conteos exactos cacheados para combinaciones de filtros frecuentes,
+  invalidados por una generación por tabla que cambia cuando se confirma
+  cada escritura;
+- un paginador que muestra "aprox. N" y solo calcula el conteo exacto cuando
+  se pide explícitamente.
+"""
+import hashlib
+import secrets
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+# Parámetro GET que fuerza el conteo exacto en listados y changelists
+EXACT_COUNT_PARAM = 'exact_count'
+
+# Por debajo de este tamaño el COUNT(*) es barato y no merece estimarse
+ESTIMATE_THRESHOLD = 10000
+
+COUNT_CACHE_TIMEOUT = 60 * 10
+
+
+def _generation_key(table):
+    return f'count-gen:{table}'
+
+
+def generation_cache():
+    # Compartida entre procesos para que una escritura en un worker invalide
+    # lo cacheado por los demás
+    return caches[getattr(settings, 'SHARED_CACHE_ALIAS', 'default')]
+
+
+def _new_generation():
+    # Nunca se repite: si la caché pierde el valor (purga, reinicio) el nuevo
+    # no reutiliza entradas antiguas, y dos escrituras simultáneas en workers
+    # distintos no pueden dejar la misma generación (con ``incr`` en
+    # FileBasedCache, que no es atómico, ambas podían escribir el mismo valor)
+    return int(time.time() * 1000) << 20 | secrets.randbits(20)
+
+
+def get_table_generation(table):
+    """Generación actual de una tabla (cambia con cada escritura)."""
+    return generation_cache().get_or_set(_generation_key(table), _new_generation, timeout=None)
+
+
+def get_table_generations(tables):
+    """Generaciones de varias tablas con una sola lectura de la caché."""
+    keys = {_generation_key(table): table for table in tables}
+    found = generation_cache().get_many(keys)
+    return tuple(found.get(key) or get_table_generation(table) for key, table in keys.items())
+
+
+def bump_table_generation(table, using=None):
+    """
+    Invalidar todo lo cacheado que depende de ``table`` cuando se confirme la
+    transacción en curso (en el acto si no hay ninguna). Antes del commit
+    otra petición aún lee los datos antiguos y los cachearía con la
+    generación nueva.
+    """
+    transaction.on_commit(partial(_set_generation, table), using=using)
+
+
+def _set_generation(table):
+    generation_cache().set(_generation_key(table), _new_generation(), timeout=None)
+
+
+def estimate_table_count(model, using='default'):
+    """
+    Número aproximado de filas según las estadísticas de la base de datos.
+
+    Devuelve ``None`` si el motor no tiene estadísticas para la tabla
+    (por ejemplo, SQLite sin ``ANALYZE``).
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                    [connection.ops.quote_name(table)]
+                )
+            elif connection.vendor == 'sqlite':
+                cursor.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+                )
+                if cursor.fetchone() is None:
+                    return None
+                # La primera cifra de ``stat`` es el número de filas del índice/tabla
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [table])
+                rows = cursor.fetchall()
+                counts = [int(row[0].split()[0]) for row in rows if row[0]]
+                return max(counts) if counts else None
+            else:
+                return None
+            row = cursor.fetchone()
+    except Exception:
+        return None
+
+    if row is None or row[0] is None or row[0] < 0:
+        # reltuples = -1 en tablas nunca analizadas (PostgreSQL 14+)
+        return None
+    return int(row[0])
+
+
+def _queryset_tables(queryset):
+    tables = {queryset.model._meta.db_table}
+    for join in queryset.query.alias_map.values():
+        tables.add(join.table_name)
+    return sorted(tables)
+
+
+def cached_count(queryset, timeout=COUNT_CACHE_TIMEOUT):
+    """
+    ``queryset.count()`` cacheado por SQL y por generación de cada tabla
+    implicada, de modo que cualquier escritura lo invalida.
+    """
+    sql, params = queryset.query.sql_with_params()
+    tables = _queryset_tables(queryset)
+    generations = [f'{table}:{get_table_generation(table)}' for table in tables]
+    digest = hashlib.md5(
+        repr((queryset.db, sql, params, generations)).encode('utf-8')
+    ).hexdigest()
+    key = f'count:{queryset.model._meta.label_lower}:{digest}'
+
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, timeout)
+    return count
+
+
+def is_unfiltered(queryset):
+    query = queryset.query
+    return not query.where and not query.is_sliced and not query.combinator
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginador que evita el COUNT(*) completo.
+
+    - Sin filtros y con tablas grandes usa la estimación del planificador
+      (``is_estimate`` queda a True para mostrar "aprox. N").
+    - Con filtros usa un conteo exacto cacheado.
+    - Con ``exact=True`` siempre hace el conteo exacto.
+    """
+
+    def __init__(self, object_list, per_page, orphans=0,
+                 allow_empty_first_page=True, exact=False):
+        super().__init__(object_list, per_page, orphans, allow_empty_first_page)
+        self.exact = exact
+        self.is_estimate = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if self.exact or not isinstance(queryset, QuerySet):
+            return super().count
+
+        if is_unfiltered(queryset):
+            estimate = estimate_table_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+                self.is_estimate = True
+                return estimate
+
+        return cached_count(queryset)
+
+
+def wants_exact_count(request):
+    return request.GET.get(EXACT_COUNT_PARAM) in ('1', 'true', 'yes')
+
+
+class EstimatedCountListMixin:
+    """Mixin para ``ListView`` que usa :class:`EstimatedCountPaginator`."""
+    paginator_class = EstimatedCountPaginator
+
+    def get_paginator(self, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True, **kwargs):
+        return self.paginator_class(
+            queryset, per_page, orphans=orphans,
+            allow_empty_first_page=allow_empty_first_page,
+            exact=wants_exact_count(self.request),
+            **kwargs
+        )
+
+
+class EstimatedCountAdminMixin:
+    """
+    Mixin para ``ModelAdmin``: paginador con conteo estimado y sin el
+    segundo COUNT(*) de ``show_full_result_count``.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def changelist_view(self, request, extra_context=None):
+        # El ChangeList trata cualquier parámetro desconocido como filtro
+        request._exact_count = wants_exact_count(request)
+        if EXACT_COUNT_PARAM in request.GET:
+            request.GET = request.GET.copy()
+            del request.GET[EXACT_COUNT_PARAM]
+        return super().changelist_view(request, extra_context)
+
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        return self.paginator(
+            queryset, per_page, orphans, allow_empty_first_page,
+            exact=getattr(request, '_exact_count', False)
+        )
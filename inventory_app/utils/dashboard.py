@@ -0,0 +1,122 @@
+"""
+Datos de las APIs del dashboard dinámico.
+
+Las vistas síncronas (``views``, WSGI) y las asíncronas (``async_views``,
+ASGI) hacen las mismas consultas y devuelven el mismo JSON; aquí están las
+consultas y el formato, y cada vista las ejecuta con su ORM.
+"""
+from datetime import timedelta
+
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from ..models import Equipment, MaintenanceLog, SupportTicket
+
+RECENT_LIMIT = 5
+
+
+# -----------------------------------------------------------------------------
+# Estadísticas (una consulta por tabla con conteos condicionales)
+# -----------------------------------------------------------------------------
+
+def equipment_aggregates():
+    today = timezone.now().date()
+    return {
+        'total': Count('id'),
+        'available': Count('id', filter=Q(status='AVA')),
+        'in_use': Count('id', filter=Q(status='INU')),
+        'in_repair': Count('id', filter=Q(status='REP')),
+        'warranty_expiring': Count('id', filter=Q(
+            warranty_expiry__isnull=False,
+            warranty_expiry__range=[today, today + timedelta(days=30)],
+        )),
+    }
+
+
+def ticket_aggregates():
+    return {
+        'open': Count('id', filter=Q(status='OPEN')),
+        'in_progress': Count('id', filter=Q(status='IN_PROGRESS')),
+        'critical': Count('id', filter=Q(priority='CRITICAL', status__in=['OPEN', 'IN_PROGRESS'])),
+    }
+
+
+def pending_maintenance():
+    return MaintenanceLog.objects.filter(end_date__isnull=True)
+
+
+def stats_payload(equipment, tickets, maintenance_pending):
+    return {
+        'equipment': {
+            'total': equipment['total'],
+            'available': equipment['available'],
+            'in_use': equipment['in_use'],
+            'in_repair': equipment['in_repair'],
+        },
+        'tickets': tickets,
+        'alerts': {
+            'warranty_expiring': equipment['warranty_expiring'],
+            'maintenance_pending': maintenance_pending,
+        },
+        'timestamp': timezone.now().isoformat()
+    }
+
+
+# -----------------------------------------------------------------------------
+# Gráficos
+# -----------------------------------------------------------------------------
+
+def equipment_by(field):
+    return Equipment.objects.values(field).annotate(count=Count('id')).order_by('-count')
+
+
+def chart_payload(by_type, by_status):
+    type_display_map = dict(Equipment.EQUIPMENT_TYPES)
+    for item in by_type:
+        item['label'] = type_display_map.get(item['type'], item['type'])
+    status_display_map = dict(Equipment.STATUS_CHOICES)
+    for item in by_status:
+        item['label'] = status_display_map.get(item['status'], item['status'])
+    return {'by_type': by_type, 'by_status': by_status}
+
+
+# -----------------------------------------------------------------------------
+# Actividad reciente
+# -----------------------------------------------------------------------------
+
+def recent_maintenance():
+    # Las relaciones que se muestran van en el select_related: en una vista
+    # asíncrona no hay carga perezosa
+    return MaintenanceLog.objects.select_related(
+        'equipment', 'technician__user'
+    ).order_by('-start_date')[:RECENT_LIMIT]
+
+
+def recent_tickets():
+    return SupportTicket.objects.select_related(
+        'created_by__user', 'equipment'
+    ).order_by('-created_at')[:RECENT_LIMIT]
+
+
+def maintenance_item(maintenance):
+    return {
+        'id': maintenance.id,
+        'title': maintenance.title,
+        'start_date': maintenance.start_date.isoformat(),
+        'maintenance_type': maintenance.maintenance_type,
+        'equipment_brand': maintenance.equipment.brand if maintenance.equipment else 'N/A',
+        'equipment_model': maintenance.equipment.model if maintenance.equipment else 'N/A',
+        'technician_name': maintenance.technician.user.get_full_name() if maintenance.technician else 'N/A'
+    }
+
+
+def ticket_item(ticket):
+    return {
+        'id': ticket.id,
+        'title': ticket.title,
+        'created_at': ticket.created_at.isoformat(),
+        'priority': ticket.priority,
+        'status': ticket.status,
+        'created_by_name': ticket.created_by.user.get_full_name() if ticket.created_by else 'N/A',
+        'equipment_model': ticket.equipment.model if ticket.equipment else 'N/A'
+    }
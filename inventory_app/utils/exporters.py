@@ -1,16 +1,13 @@
  
-import pandas as pd
+# pandas y reportlab se importan dentro de cada exportador: cargarlos cuesta
+# cientos de milisegundos y solo hacen falta al generar un informe
 from io import BytesIO
 from django.http import HttpResponse
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
 from datetime import datetime
 
 def export_equipment_to_excel(queryset):
+    import pandas as pd
+    
     data = []
     for item in queryset:
         data.append({
@@ -55,6 +52,12 @@ def export_equipment_to_excel(queryset):
     return response
 
 def export_equipment_to_pdf(queryset):
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    
     response = HttpResponse(content_type='application/pdf')
     filename = f"equipment_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
@@ -110,6 +113,8 @@ def export_equipment_to_pdf(queryset):
     return response
 
 def export_maintenance_to_excel(queryset):
+    import pandas as pd
+    
     data = []
     for item in queryset:
         data.append({
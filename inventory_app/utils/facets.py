@@ -0,0 +1,150 @@
+"""
+Caché de facetas para filtros de alta cardinalidad.
+
+Los valores distintos de ``Equipment.location``, ``Equipment.brand`` y
+``Component.component_type`` se guardan en ``FacetValue`` con su conteo y se
+actualizan de forma incremental en cada alta, cambio o baja, de modo que los
+filtros del admin y de los listados no calculan un ``DISTINCT`` por petición.
+
+:func:`facet_counts` devuelve, para un queryset ya filtrado, el número de
+resultados de cada opción de filtro con una única consulta de agregación.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+
+from ..models import Component, Equipment, FacetValue
+
+# Campos con faceta cacheada, por modelo
+FACET_FIELDS = {
+    Equipment: ('location', 'brand'),
+    Component: ('component_type',),
+}
+
+# Máximo de opciones por faceta en los conteos de ``facet_counts`` (una
+# columna de agregación por opción); los filtros ofrecen todos los valores
+FACET_OPTION_LIMIT = 50
+
+
+def facet_name(model, field):
+    return f'{model._meta.model_name}.{field}'
+
+
+def adjust_facet(facet, deltas):
+    """Aplicar incrementos ``{valor: delta}`` de forma atómica."""
+    for value, delta in deltas.items():
+        if not delta or value in (None, ''):
+            continue
+        updated = FacetValue.objects.filter(facet=facet, value=value).update(
+            count=F('count') + delta
+        )
+        if not updated and delta > 0:
+            try:
+                with transaction.atomic():
+                    FacetValue.objects.create(facet=facet, value=value, count=delta)
+            except IntegrityError:
+                # Otro proceso creó la fila entre el UPDATE y el INSERT
+                FacetValue.objects.filter(facet=facet, value=value).update(
+                    count=F('count') + delta
+                )
+        elif delta < 0:
+            FacetValue.objects.filter(facet=facet, value=value, count__lte=0).delete()
+
+
+def adjust_facets_for_objects(model, objects, sign=1):
+    """Sumar (o restar con ``sign=-1``) los valores de un lote de objetos."""
+    for field in FACET_FIELDS.get(model, ()):
+        deltas = Counter(getattr(obj, field) for obj in objects)
+        adjust_facet(facet_name(model, field), {value: sign * n for value, n in deltas.items()})
+
+
+def adjust_facets_for_changes(model, changes):
+    """Aplicar los cambios de un lote ``[(valores_previos, objeto), ...]``."""
+    for field in FACET_FIELDS.get(model, ()):
+        deltas = Counter()
+        for previous, obj in changes:
+            if previous[field] != getattr(obj, field):
+                deltas[previous[field]] -= 1
+                deltas[getattr(obj, field)] += 1
+        adjust_facet(facet_name(model, field), deltas)
+
+
+def apply_save(instance, previous, created):
+    model = type(instance)
+    for field in FACET_FIELDS.get(model, ()):
+        new_value = getattr(instance, field)
+        old_value = None if created or previous is None else previous[field]
+        if old_value == new_value:
+            continue
+        deltas = Counter()
+        if old_value is not None:
+            deltas[old_value] -= 1
+        deltas[new_value] += 1
+        adjust_facet(facet_name(model, field), deltas)
+
+
+def rebuild_facets():
+    """Recalcular todas las facetas desde cero (backfill o reparación)."""
+    rebuilt = {}
+    with transaction.atomic():
+        for model, fields in FACET_FIELDS.items():
+            for field in fields:
+                name = facet_name(model, field)
+                FacetValue.objects.filter(facet=name).delete()
+                rows = (
+                    model._default_manager.order_by().values(field)
+                    .annotate(total=Count('pk')).filter(total__gt=0)
+                )
+                FacetValue.objects.bulk_create([
+                    FacetValue(facet=name, value=row[field], count=row['total'])
+                    for row in rows if row[field]
+                ])
+                rebuilt[name] = len(rows)
+    return rebuilt
+
+
+def facet_values(model, field, limit=None):
+    """Valores de una faceta, los más frecuentes primero, como lista de ``(valor, conteo)``."""
+    rows = FacetValue.objects.filter(
+        facet=facet_name(model, field), count__gt=0
+    ).order_by('-count', 'value').values_list('value', 'count')
+    return list(rows[:limit]) if limit else list(rows)
+
+
+def facet_options(model, limit=FACET_OPTION_LIMIT):
+    """
+    Opciones por campo para ``facet_counts``: choices del modelo y, de cada
+    faceta cacheada, solo los ``limit`` valores más frecuentes (cada opción
+    es una columna más de la agregación); ``limit=None`` las incluye todas.
+    """
+    options = {}
+    for field in model._meta.concrete_fields:
+        if field.choices:
+            options[field.name] = [(value, str(label)) for value, label in field.flatchoices]
+    for field in FACET_FIELDS.get(model, ()):
+        options[field] = [(value, value) for value, _ in facet_values(model, field, limit)]
+    return options
+
+
+def facet_counts(queryset, options=None):
+    """
+    Conteo de cada opción de filtro dentro de ``queryset`` en una sola consulta
+    (agregación condicional ``COUNT(...) FILTER (WHERE ...)``).
+    """
+    if options is None:
+        options = facet_options(queryset.model)
+
+    aggregates = {'total': Count('pk')}
+    aliases = []
+    for field, choices in options.items():
+        for value, label in choices:
+            alias = f'facet_{len(aliases)}'
+            aggregates[alias] = Count('pk', filter=Q(**{field: value}))
+            aliases.append((alias, field, value, label))
+
+    result = queryset.order_by().aggregate(**aggregates)
+    counts = {field: [] for field in options}
+    for alias, field, value, label in aliases:
+        counts[field].append({'value': value, 'label': label, 'count': result[alias]})
+    return {'total': result['total'], 'facets': counts}
@@ -0,0 +1,72 @@
+"""
+Codificación JSON rápida con orjson (si está instalado) y respaldo en ``json``.
+
+orjson serializa de forma nativa ``UUID`` y las subclases de ``dict``/``list``
+(``ReturnDict``, ``OrderedDict``...). Lo que no reconoce (``Decimal``, cadenas
+traducibles, ``QuerySet``...) y las fechas y horas (que orjson escribiría con
+microsegundos y no con milisegundos) pasan por el ``default`` del codificador
+equivalente, así que la salida coincide con la del codificador de DRF o con la
+de ``DjangoJSONEncoder`` según el caso.
+
+Única diferencia: orjson escribe ``NaN`` e infinitos como ``null``, mientras
+que DRF (``STRICT_JSON``) los rechaza y ``JsonResponse`` escribe ``NaN``, que
+no es JSON válido. Sin orjson, el respaldo con ``json`` los rechaza como DRF.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from rest_framework.utils.encoders import JSONEncoder as DRFJSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+# Separadores compactos, como ``COMPACT_JSON`` de DRF
+COMPACT_SEPARATORS = (',', ':')
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def dumps(data, encoder_class=DRFJSONEncoder):
+    """Serializar ``data`` a bytes UTF-8 compactos."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, default=encoder_class().default, option=ORJSON_OPTIONS)
+        except TypeError:
+            # Enteros de más de 64 bits u objetos que solo entiende ``json``
+            pass
+    return json.dumps(
+        data, cls=encoder_class, ensure_ascii=False, allow_nan=False, separators=COMPACT_SEPARATORS
+    ).encode('utf-8')
+
+
+def loads(content):
+    """Decodificar JSON desde ``bytes`` o ``str``."""
+    if orjson is not None:
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            pass  # p. ej. enteros enormes: que decida ``json``
+    if isinstance(content, (bytes, bytearray)):
+        content = content.decode('utf-8')
+    return json.loads(content, parse_constant=_reject_constant)
+
+
+def _reject_constant(value):
+    raise ValueError(f'Valor JSON no válido: {value}')
+
+
+class FastJsonResponse(HttpResponse):
+    """``JsonResponse`` con :func:`dumps` y la semántica de ``DjangoJSONEncoder``."""
+
+    def __init__(self, data, encoder=DjangoJSONEncoder, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                'In order to allow non-dict objects to be serialized set the '
+                'safe parameter to False.'
+            )
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data, encoder), **kwargs)
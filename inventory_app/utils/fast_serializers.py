@@ -0,0 +1,204 @@
+"""
+Ruta rápida de lectura para los listados de la API.
+
+``ModelSerializer`` construye una instancia de modelo por fila (y otra por cada
+relación anidada), recorre los atributos campo a campo y llama a cada
+``get_*_display``. :class:`ValuesSerializer` analiza una sola vez el serializer
+original y genera un plan: qué columnas pedir con ``.values()`` (incluidas las
+de las relaciones anidadas, en la misma consulta) y cómo convertir cada una.
+Las etiquetas de los choices salen de mapas precalculados. La salida es idéntica
+a la del serializer original (ver ``test_api``).
+
+Si el serializer usa algo que el plan no sabe reproducir (métodos arbitrarios,
+``SerializerMethodField``...), :func:`build_plan` lanza ``UnsupportedField`` y
+la vista sigue usando el serializer normal.
+"""
+import re
+
+from django.db import models
+from rest_framework import serializers
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.response import Response
+
+DISPLAY_RE = re.compile(r'^get_(?P<field>\w+)_display$')
+
+# Campos cuya representación es el propio valor devuelto por ``.values()``
+IDENTITY_FIELDS = (
+    serializers.CharField, serializers.ChoiceField,
+    serializers.IntegerField, serializers.BooleanField,
+)
+
+
+class UnsupportedField(Exception):
+    pass
+
+
+def _identity(value):
+    return value
+
+
+def _full_name(first_name, last_name):
+    # Igual que ``User.get_full_name``
+    return f'{first_name} {last_name}'.strip()
+
+
+# Métodos sin argumentos que se pueden calcular a partir de columnas
+COMPUTED_SOURCES = {
+    'get_full_name': (('first_name', 'last_name'), _full_name),
+}
+
+
+class ValuePlan:
+    def __init__(self, key, paths, convert):
+        self.key = key
+        self.paths = paths
+        self.convert = convert
+
+
+class NestedPlan:
+    def __init__(self, key, id_path, fields):
+        self.key = key
+        self.id_path = id_path
+        self.fields = fields
+
+
+def _resolve(model, attrs, prefix):
+    """Convertir ``source_attrs`` en (modelo final, ruta ``__`` de la relación)."""
+    path = prefix
+    for attr in attrs:
+        try:
+            field = model._meta.get_field(attr)
+        except Exception:
+            raise UnsupportedField('.'.join(attrs))
+        if not (field.is_relation and (field.many_to_one or field.one_to_one)):
+            raise UnsupportedField('.'.join(attrs))
+        model = field.related_model
+        path += attr + '__'
+    return model, path
+
+
+def build_plan(serializer, model, prefix=''):
+    """Plan de columnas y conversiones para los campos legibles de ``serializer``."""
+    plan = []
+    for field in serializer._readable_fields:
+        attrs = list(field.source_attrs)
+        if isinstance(field, serializers.BaseSerializer):
+            if field.source == '*' or getattr(field, 'many', False):
+                raise UnsupportedField(field.field_name)
+            related, path = _resolve(model, attrs, prefix)
+            plan.append(NestedPlan(
+                field.field_name, path + 'id',
+                build_plan(field, related, path),
+            ))
+            continue
+
+        owner, path = _resolve(model, attrs[:-1], prefix)
+        name = attrs[-1]
+        display = DISPLAY_RE.match(name)
+        if display:
+            model_field = owner._meta.get_field(display.group('field'))
+            labels = {value: str(label) for value, label in model_field.flatchoices}
+            plan.append(ValuePlan(
+                field.field_name, [path + model_field.name],
+                lambda value, labels=labels: labels.get(value, value),
+            ))
+        elif name in COMPUTED_SOURCES:
+            columns, compute = COMPUTED_SOURCES[name]
+            plan.append(ValuePlan(field.field_name, [path + column for column in columns], compute))
+        else:
+            try:
+                model_field = owner._meta.get_field(name)
+            except Exception:
+                raise UnsupportedField(field.field_name)
+            if isinstance(field, PrimaryKeyRelatedField):
+                convert = _identity  # ``.values()`` ya devuelve la clave
+            elif isinstance(field, serializers.RelatedField) or isinstance(model_field, models.ManyToManyField):
+                raise UnsupportedField(field.field_name)
+            elif isinstance(field, IDENTITY_FIELDS):
+                convert = _identity
+            else:
+                convert = field.to_representation
+            plan.append(ValuePlan(field.field_name, [path + name], convert))
+    return plan
+
+
+def plan_paths(plan):
+    paths = []
+    for entry in plan:
+        if isinstance(entry, NestedPlan):
+            paths.append(entry.id_path)
+            paths.extend(plan_paths(entry.fields))
+        else:
+            paths.extend(entry.paths)
+    return list(dict.fromkeys(paths))
+
+
+def render_row(plan, row):
+    data = {}
+    for entry in plan:
+        if isinstance(entry, NestedPlan):
+            data[entry.key] = None if row[entry.id_path] is None else render_row(entry.fields, row)
+        elif len(entry.paths) == 1:
+            value = row[entry.paths[0]]
+            data[entry.key] = None if value is None else entry.convert(value)
+        else:
+            data[entry.key] = entry.convert(*(row[path] for path in entry.paths))
+    return data
+
+
+class ValuesSerializer:
+    """
+    Serializador de sólo lectura a partir de ``.values()``.
+
+    ``ValuesSerializer(EquipmentSerializer)`` analiza el serializer una vez;
+    :meth:`values` proyecta un queryset y :meth:`render` genera las filas.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self.model = serializer_class.Meta.model
+        self.plan = build_plan(serializer_class(), self.model)
+        self.paths = plan_paths(self.plan)
+
+    def values(self, queryset):
+        return queryset.values(*self.paths)
+
+    def render(self, rows):
+        return [render_row(self.plan, row) for row in rows]
+
+    def serialize(self, queryset):
+        return self.render(self.values(queryset))
+
+
+class FastListMixin:
+    """
+    ``list()`` de un ModelViewSet servido desde ``.values()``.
+
+    La vista define ``fast_serializer_class`` (normalmente su
+    ``serializer_class``); si el plan no puede reproducirlo se usa el
+    ``list()`` habitual. ``?fast=0`` fuerza la ruta normal.
+    """
+    fast_serializer_class = None
+    _fast_serializers = {}
+
+    def get_fast_serializer(self):
+        serializer_class = self.fast_serializer_class
+        if serializer_class is None or self.request.query_params.get('fast') == '0':
+            return None
+        if serializer_class not in FastListMixin._fast_serializers:
+            try:
+                FastListMixin._fast_serializers[serializer_class] = ValuesSerializer(serializer_class)
+            except UnsupportedField:
+                FastListMixin._fast_serializers[serializer_class] = None
+        return FastListMixin._fast_serializers[serializer_class]
+
+    def list(self, request, *args, **kwargs):
+        fast = self.get_fast_serializer()
+        if fast is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = fast.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(fast.render(page))
+        return Response(fast.render(queryset))
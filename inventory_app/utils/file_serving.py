@@ -0,0 +1,168 @@
+"""
+Envío de ficheros del disco (media y backups) sin cargarlos en memoria.
+
+``serve_file`` responde con:
+
+- ``304``/``412`` según ``If-None-Match``/``If-Modified-Since`` (ETag a partir
+  del tamaño y la fecha de modificación, sin leer el fichero);
+- con ``SENDFILE_BACKEND`` configurado, una respuesta vacía con
+  ``X-Accel-Redirect`` (nginx) o ``X-Sendfile`` (Apache, lighttpd): el
+  servidor web envía el fichero, también los rangos, y el worker queda libre;
+- si no, el fichero en streaming: completo con ``FileResponse`` (que usa el
+  ``wsgi.file_wrapper`` del servidor, ``sendfile`` en gunicorn) o un único
+  rango de ``Range: bytes=...`` con ``206``, para reanudar descargas y
+  avanzar en vídeos. Varios rangos se responden con el fichero completo.
+
+Nada se indexa al arrancar: cada petición hace un ``stat`` del fichero pedido.
+"""
+import mimetypes
+import os
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.encoding import escape_uri_path
+from django.utils.http import content_disposition_header, http_date, quote_etag
+
+SENDFILE_HEADERS = {
+    'x-accel-redirect': 'X-Accel-Redirect',
+    'x-sendfile': 'X-Sendfile',
+}
+
+BLOCK_SIZE = 64 * 1024
+
+_RANGE = re.compile(r'bytes=(\d*)-(\d*)$')
+
+
+def sendfile_backend():
+    backend = (getattr(settings, 'SENDFILE_BACKEND', '') or '').lower()
+    if backend and backend not in SENDFILE_HEADERS:
+        raise ValueError(f'SENDFILE_BACKEND desconocido: {backend}')
+    return backend
+
+
+def resolve_path(root, path):
+    """Ruta absoluta de ``path`` dentro de ``root``; 404 si sale de él o no es un fichero."""
+    try:
+        full_path = safe_join(root, path)
+        status = os.stat(full_path)
+    except (SuspiciousFileOperation, ValueError, OSError):  # fuera de root, bytes nulos, no existe
+        raise Http404('Fichero no encontrado')
+    if not stat.S_ISREG(status.st_mode):
+        raise Http404('Fichero no encontrado')
+    return full_path, status
+
+
+def parse_range(header, size):
+    """
+    ``(inicio, fin)`` (ambos incluidos) de una cabecera ``Range`` de un solo
+    rango; ``None`` si no hay que aplicarla y ``False`` si no es satisfacible.
+    """
+    match = _RANGE.match(header.replace(' ', ''))
+    if match is None:
+        return None  # sintaxis no reconocida o varios rangos: fichero completo
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        length = int(last)
+        if length == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+class RangeFileWrapper:
+    """Iterar sobre ``length`` bytes de ``handle`` desde ``start``, por bloques."""
+
+    def __init__(self, handle, start, length, block_size=BLOCK_SIZE):
+        self.handle = handle
+        self.remaining = length
+        self.block_size = block_size
+        handle.seek(start)
+
+    def __iter__(self):
+        try:
+            while self.remaining > 0:
+                data = self.handle.read(min(self.block_size, self.remaining))
+                if not data:
+                    break
+                self.remaining -= len(data)
+                yield data
+        finally:
+            self.handle.close()
+
+    def close(self):
+        self.handle.close()
+
+
+def serve_file(request, root, path, accel_prefix=None, as_attachment=False, content_type=None):
+    """
+    Responder con el fichero ``path`` (relativo a ``root``). ``accel_prefix``
+    es la ``location`` interna de nginx que apunta a ``root`` (solo con
+    ``SENDFILE_BACKEND = 'x-accel-redirect'``).
+    """
+    full_path, status = resolve_path(root, path)
+    size = status.st_size
+    etag = quote_etag(f'{status.st_mtime_ns:x}-{size:x}')
+    last_modified = http_date(status.st_mtime)
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(status.st_mtime),
+    )
+    if response is None:
+        # La ruta que se comprobó, no la de la URL (``a/../b`` pasa ``safe_join``)
+        checked_path = os.path.relpath(full_path, root)
+        response = _file_response(request, full_path, checked_path, size, etag, accel_prefix, content_type)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = last_modified
+    if response.status_code in (200, 206):
+        response['Content-Disposition'] = content_disposition_header(as_attachment, os.path.basename(full_path))
+    return response
+
+
+def _file_response(request, full_path, checked_path, size, etag, accel_prefix, content_type):
+    if content_type is None:
+        content_type, _ = mimetypes.guess_type(full_path)
+        content_type = content_type or 'application/octet-stream'
+
+    backend = sendfile_backend()
+    if backend:
+        response = HttpResponse(content_type=content_type)
+        if backend == 'x-accel-redirect':
+            location = (accel_prefix or '/').rstrip('/') + '/' + checked_path.replace(os.sep, '/')
+            response[SENDFILE_HEADERS[backend]] = escape_uri_path(location)
+        else:
+            response[SENDFILE_HEADERS[backend]] = full_path
+        return response
+
+    byte_range = None
+    if request.method in ('GET', 'HEAD') and 'HTTP_RANGE' in request.META:
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if if_range is None or if_range == etag:
+            byte_range = parse_range(request.META['HTTP_RANGE'], size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+    elif byte_range is not None:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            RangeFileWrapper(open(full_path, 'rb'), start, end - start + 1),
+            status=206, content_type=content_type,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,91 @@
+"""
+Tabla de identificadores de inicio de sesión (``LoginIdentity``).
+
+``CompanyEmailBackend`` acepta el nombre de usuario, el email del usuario o el
+email de empresa de su ``CompanyUser``. Buscarlos con un ``OR`` sobre un
+``LEFT JOIN`` no puede usar un único índice; aquí cada identificador tiene
+su fila con el usuario y la comprobación de dominio ya hecha, así que
+autenticar es una búsqueda por igualdad indexada. Los identificadores se
+comparan tal cual, como la consulta original: ``Ana`` y ``ana`` pueden ser
+usuarios distintos.
+
+Las señales de ``User`` y ``CompanyUser`` llaman a :func:`sync_user_identities`;
+``manage.py rebuild_identities`` reconstruye la tabla completa.
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from ..models import CompanyUser, LoginIdentity
+
+COMPANY_EMAIL_SUFFIX = '@tuempresa.com'
+
+# Marca para "perfil no proporcionado" (``None`` significa "sin perfil")
+UNKNOWN = object()
+
+
+def normalize(identifier):
+    # Sin cambiar mayúsculas ni espacios: en minúsculas dos usuarios
+    # distintos compartirían identificador y ninguno podría entrar con él
+    return identifier or ''
+
+
+def login_email(user, company_email=None):
+    """Email que decide el dominio: el de empresa si tiene perfil."""
+    return company_email if company_email is not None else (user.email or '')
+
+
+def identities_for(user, company_email=None):
+    """Conjunto de ``(identificador, es_de_empresa)`` de ``user``."""
+    company_domain = login_email(user, company_email).endswith(COMPANY_EMAIL_SUFFIX)
+    identifiers = {normalize(user.username), normalize(user.email), normalize(company_email)}
+    identifiers.discard('')
+    return {(identifier, company_domain) for identifier in identifiers}
+
+
+def sync_user_identities(user, company_user=UNKNOWN):
+    """Actualizar las filas de ``user``; solo escribe si algo cambió."""
+    if company_user is UNKNOWN:
+        company_user = CompanyUser.objects.filter(user_id=user.pk).only('email').first()
+    wanted = identities_for(user, company_user.email if company_user is not None else None)
+    current = set(LoginIdentity.objects.filter(user_id=user.pk).values_list('identifier', 'company_domain'))
+    if current == wanted:
+        return
+    with transaction.atomic():
+        LoginIdentity.objects.filter(user_id=user.pk).delete()
+        LoginIdentity.objects.bulk_create([
+            LoginIdentity(identifier=identifier, user_id=user.pk, company_domain=company_domain)
+            for identifier, company_domain in wanted
+        ])
+
+
+def rebuild_identities(batch_size=2000):
+    """Reconstruir la tabla completa; devuelve el número de filas."""
+    users = User.objects.order_by('pk').values_list('pk', 'username', 'email', 'companyuser__email')
+    created = 0
+    with transaction.atomic():
+        LoginIdentity.objects.all().delete()
+        batch = []
+        for pk, username, email, company_email in users.iterator(chunk_size=batch_size):
+            user = User(pk=pk, username=username, email=email)
+            batch.extend(
+                LoginIdentity(identifier=identifier, user_id=pk, company_domain=company_domain)
+                for identifier, company_domain in identities_for(user, company_email)
+            )
+            if len(batch) >= batch_size:
+                LoginIdentity.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        LoginIdentity.objects.bulk_create(batch)
+    return created + len(batch)
+
+
+def find_login_identity(identifier):
+    """
+    Fila (con su usuario) de ``identifier``, o ``None`` si no existe o si
+    corresponde a más de un usuario.
+    """
+    identifier = normalize(identifier)
+    if not identifier:
+        return None
+    rows = list(LoginIdentity.objects.filter(identifier=identifier).select_related('user')[:2])
+    return rows[0] if len(rows) == 1 else None
@@ -0,0 +1,210 @@
+"""
+Ubicaciones jerárquicas con ruta materializada y conteos de subárbol.
+
+``Equipment.location`` sigue siendo texto libre; al guardar un equipo el texto
+se interpreta (``"Sede Central / Edificio 3 / Piso 2 / Sala 201"``) y se enlaza
+al nodo hoja de ``Location``, copiando su ruta en ``Equipment.location_path``.
+Así "todo lo del Edificio 3" es una única búsqueda por rango sobre un índice
+(``location_path >= 'sede-central/edificio-3/' AND < 'sede-central/edificio-30'``).
+
+``LocationRollup`` guarda, para cada nodo, el número de equipos de todo su
+subárbol por estado y tipo; se ajusta de forma incremental en cada escritura.
+"""
+import re
+from collections import Counter
+
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Count, F, Q
+from django.utils.text import slugify
+
+from ..models import Equipment, Location, LocationRollup
+
+PATH_SEPARATOR = '/'
+
+# Separadores aceptados entre niveles en el texto libre
+LEVEL_SPLIT_RE = re.compile(r'\s*(?:/|>|»|→|\\|\|)\s*|\s+-\s+|\s*,\s*')
+
+LEVEL_KEYWORDS = (
+    ('SIT', re.compile(r'^(sede|site|campus|planta industrial)\b', re.IGNORECASE)),
+    ('BLD', re.compile(r'^(edificio|edif\.?|building|bldg|torre|bloque|nave)\b', re.IGNORECASE)),
+    ('FLO', re.compile(r'^(piso|planta|floor|nivel|level)\b', re.IGNORECASE)),
+    ('ROO', re.compile(r'^(sala|oficina|office|room|aula|despacho|laboratorio|lab|almac[eé]n)\b', re.IGNORECASE)),
+)
+
+# Nivel por defecto según la profundidad cuando el nombre no lo indica
+LEVELS_BY_DEPTH = ('SIT', 'BLD', 'FLO', 'ROO')
+
+
+def parse_location(text):
+    """Convertir un texto de ubicación en ``[(nombre, nivel), ...]`` de raíz a hoja."""
+    parts = [part.strip() for part in LEVEL_SPLIT_RE.split(text or '') if part and part.strip()]
+    parsed = []
+    for depth, name in enumerate(parts):
+        level = None
+        for code, pattern in LEVEL_KEYWORDS:
+            if pattern.match(name):
+                level = code
+                break
+        if level is None:
+            level = LEVELS_BY_DEPTH[min(depth, len(LEVELS_BY_DEPTH) - 1)]
+        parsed.append((name[:100], level))
+    return parsed
+
+
+def segment(name):
+    return slugify(name)[:40] or 'x'
+
+
+def normalize_path(path):
+    """Ruta de nodo tal como se guarda: sin espacios y terminada en separador."""
+    return path.strip().strip(PATH_SEPARATOR) + PATH_SEPARATOR
+
+
+def subtree_upper_bound(path):
+    """Límite superior exclusivo del rango de un subárbol ('/' + 1 == '0')."""
+    return path[:-1] + chr(ord(PATH_SEPARATOR) + 1)
+
+
+def subtree_q(path, field='location_path', using='default'):
+    """
+    Filtro indexado para todo el subárbol de ``path``.
+
+    ``path`` se normaliza antes: sin el separador final, ``edificio-3``
+    también abarcaría ``edificio-30``. En PostgreSQL el rango depende de la
+    collation (las de glibc/ICU ignoran la puntuación), así que se usa
+    ``LIKE 'ruta%'``, que aprovecha el índice ``varchar_pattern_ops`` que
+    Django crea para los CharField indexados. En SQLite (comparación
+    binaria) se usa el rango.
+    """
+    path = normalize_path(path)
+    if connections[using].vendor == 'postgresql':
+        return Q(**{f'{field}__startswith': path})
+    return Q(**{f'{field}__gte': path, f'{field}__lt': subtree_upper_bound(path)})
+
+
+def ancestor_paths(path):
+    """Rutas de todos los nodos desde la raíz hasta ``path`` (incluido)."""
+    segments = [s for s in path.split(PATH_SEPARATOR) if s]
+    return [
+        PATH_SEPARATOR.join(segments[:i]) + PATH_SEPARATOR
+        for i in range(1, len(segments) + 1)
+    ]
+
+
+def resolve_location(text):
+    """Obtener (o crear) la cadena de nodos de ``text`` y devolver el nodo hoja."""
+    parent = None
+    for depth, (name, level) in enumerate(parse_location(text)):
+        path = (parent.path if parent else '') + segment(name) + PATH_SEPARATOR
+        if len(path) > 255:
+            break
+        node = Location.objects.filter(path=path).first()
+        if node is None:
+            try:
+                with transaction.atomic():
+                    node = Location.objects.create(
+                        name=name, parent=parent, level=level, depth=depth, path=path
+                    )
+            except IntegrityError:
+                node = Location.objects.get(path=path)
+        parent = node
+    return parent
+
+
+def link_locations(equipments):
+    """Enlazar un lote de equipos con sus nodos (una resolución por texto distinto)."""
+    nodes = {}
+    for equipment in equipments:
+        if equipment.location not in nodes:
+            nodes[equipment.location] = resolve_location(equipment.location)
+        node = nodes[equipment.location]
+        equipment.location_node = node
+        equipment.location_path = node.path if node else ''
+
+
+def adjust_rollups(deltas):
+    """
+    Aplicar ``{(location_path, status, type): delta}`` a cada nodo y a todos
+    sus ancestros.
+    """
+    expanded = Counter()
+    for (path, status, type_), delta in deltas.items():
+        if not path or not delta:
+            continue
+        for ancestor in ancestor_paths(path):
+            expanded[(ancestor, status, type_)] += delta
+    if not expanded:
+        return
+
+    ids_by_path = dict(
+        Location.objects.filter(path__in={key[0] for key in expanded}).values_list('path', 'id')
+    )
+    for (path, status, type_), delta in expanded.items():
+        location_id = ids_by_path.get(path)
+        if location_id is None or not delta:
+            continue
+        lookup = {'location_id': location_id, 'status': status, 'type': type_}
+        updated = LocationRollup.objects.filter(**lookup).update(count=F('count') + delta)
+        if not updated and delta > 0:
+            try:
+                with transaction.atomic():
+                    LocationRollup.objects.create(count=delta, **lookup)
+            except IntegrityError:
+                LocationRollup.objects.filter(**lookup).update(count=F('count') + delta)
+
+
+def rollup_key(values):
+    """Clave de ``LocationRollup`` a partir de un dict de valores de un equipo."""
+    return (values.get('location_path') or '', values.get('status'), values.get('type'))
+
+
+def equipment_rollup_key(equipment):
+    return (equipment.location_path or '', equipment.status, equipment.type)
+
+
+def rebuild_rollups():
+    """Recalcular todos los conteos de subárbol desde los equipos."""
+    with transaction.atomic():
+        LocationRollup.objects.all().delete()
+        deltas = Counter()
+        rows = (
+            Equipment.objects.exclude(location_path='').order_by()
+            .values('location_path', 'status', 'type').annotate(total=Count('pk'))
+        )
+        for row in rows:
+            deltas[rollup_key(row)] += row['total']
+        adjust_rollups(deltas)
+
+
+def link_unlinked_equipment():
+    """Enlazar a su nodo los equipos que aún no tienen ``location_path``."""
+    linked = 0
+    for location in Equipment.objects.filter(location_path='').values_list('location', flat=True).distinct():
+        node = resolve_location(location)
+        if node is not None:
+            linked += Equipment.objects.filter(location_path='', location=location).update(
+                location_node=node, location_path=node.path
+            )
+    return linked
+
+
+def subtree_counts(location, status=None, types=None):
+    """Conteos precalculados del subárbol de ``location`` (por estado y tipo)."""
+    rollups = LocationRollup.objects.filter(location=location, count__gt=0)
+    if status:
+        rollups = rollups.filter(status__in=status)
+    if types:
+        rollups = rollups.filter(type__in=types)
+    rollups = list(rollups)
+    return {
+        'total': sum(rollup.count for rollup in rollups),
+        'by_status': dict(_sum_by(rollups, 'status')),
+        'by_type': dict(_sum_by(rollups, 'type')),
+    }
+
+
+def _sum_by(rollups, attr):
+    totals = Counter()
+    for rollup in rollups:
+        totals[getattr(rollup, attr)] += rollup.count
+    return totals
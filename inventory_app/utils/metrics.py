@@ -0,0 +1,380 @@
+"""
+Métricas de peticiones (latencia, SQL, tamaño y estado) en formato Prometheus.
+
+``MetricsMiddleware`` acumula cada petición en las series de su hilo: cada hilo
+escribe solo en su propio diccionario, así que el camino de la petición no
+toma ningún bloqueo. Cada ``METRICS_FLUSH_INTERVAL`` segundos el worker vuelca
+la suma de sus hilos a un fichero propio en ``METRICS_DIR`` (escritura atómica
+con ``os.replace``), y también al terminar (``atexit`` y el ``worker_exit``
+de ``config/gunicorn.conf.py``); ``/metrics`` suma los ficheros de todos los
+workers de gunicorn y los expone en el formato de texto de Prometheus.
+
+Los contadores no deben bajar cuando gunicorn recicla un worker: el fichero
+de un worker que ya no existe se suma a ``retired.json`` (con un bloqueo
+entre procesos y anotando su nombre, para no sumarlo dos veces) antes de
+borrarlo. Los workers se comprueban por pid, así que ``METRICS_DIR`` debe
+ser local a la máquina.
+
+Las series van por ruta (el patrón de URL, no la ruta concreta), método y
+código de estado; el histograma de latencia se agrega por ruta y método.
+"""
+import atexit
+import bisect
+import glob
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+from .fast_json import dumps, loads
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: sin bloqueo entre procesos
+    fcntl = None
+
+# Límites del histograma de latencia (s), los de los clientes de Prometheus
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Posiciones de cada serie: contadores y después los cubos del histograma
+REQUESTS, LATENCY_SUM, SQL_QUERIES, SQL_SECONDS, RESPONSE_BYTES = range(5)
+FIRST_BUCKET = 5
+SERIES_SIZE = FIRST_BUCKET + len(LATENCY_BUCKETS) + 1
+
+UNMATCHED_ROUTE = '<unmatched>'
+
+# Series acumuladas de los workers que ya terminaron
+RETIRED_FILE = 'retired.json'
+
+# ``[consultas, segundos]`` de la petición en curso (también en sync_to_async)
+_current_sql = ContextVar('metrics_sql', default=None)
+
+
+def metrics_dir():
+    return getattr(settings, 'METRICS_DIR', None)
+
+
+def flush_interval():
+    return getattr(settings, 'METRICS_FLUSH_INTERVAL', 10)
+
+
+# -----------------------------------------------------------------------------
+# SQL
+# -----------------------------------------------------------------------------
+
+def sql_timer(execute, sql, params, many, context):
+    totals = _current_sql.get()
+    if totals is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        totals[0] += 1
+        totals[1] += time.perf_counter() - started
+
+
+def install_sql_timer(connection, **kwargs):
+    """Receptor de ``connection_created``: medir todas las consultas."""
+    if sql_timer not in connection.execute_wrappers:
+        # Al principio: ``execute_wrapper()`` saca siempre el último de la lista
+        connection.execute_wrappers.insert(0, sql_timer)
+
+
+def install_sql_timers():
+    for connection in connections.all():
+        install_sql_timer(connection)
+
+
+# -----------------------------------------------------------------------------
+# Series del proceso
+# -----------------------------------------------------------------------------
+
+class WorkerMetrics:
+    """Series de un proceso, repartidas por hilo."""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.name = f'worker-{self.pid}-{int(time.time() * 1000)}.json'
+        self.local = threading.local()
+        self.thread_series = []
+        self.register_lock = threading.Lock()  # solo la primera vez de cada hilo
+        self.last_flush = time.monotonic()
+
+    def series(self):
+        series = getattr(self.local, 'series', None)
+        if series is None:
+            series = self.local.series = {}
+            with self.register_lock:
+                self.thread_series.append(series)
+        return series
+
+    def record(self, route, method, status, duration, sql_queries, sql_seconds, size):
+        key = (route, method, status)
+        series = self.series()
+        values = series.get(key)
+        if values is None:
+            values = series[key] = [0] * SERIES_SIZE
+        values[REQUESTS] += 1
+        values[LATENCY_SUM] += duration
+        values[SQL_QUERIES] += sql_queries
+        values[SQL_SECONDS] += sql_seconds
+        values[RESPONSE_BYTES] += size
+        values[FIRST_BUCKET + bisect.bisect_left(LATENCY_BUCKETS, duration)] += 1
+
+    def snapshot(self):
+        """Suma de todos los hilos: ``{(ruta, método, estado): valores}``."""
+        with self.register_lock:
+            thread_series = list(self.thread_series)
+        totals = {}
+        for series in thread_series:
+            for key, values in series.copy().items():
+                merge(totals, key, values)
+        return totals
+
+    def flush(self, directory, force=False):
+        if not force and time.monotonic() - self.last_flush < flush_interval():
+            return
+        self.last_flush = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        write_atomic(os.path.join(directory, self.name), [[*key, values] for key, values in self.snapshot().items()])
+
+
+def write_atomic(path, data):
+    temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temp_path, 'wb') as handle:
+        handle.write(dumps(data))
+    os.replace(temp_path, path)
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def worker():
+    """Series de este proceso (nuevas tras un ``fork`` de gunicorn)."""
+    global _worker
+    if _worker is None or _worker.pid != os.getpid():
+        with _worker_lock:
+            if _worker is None or _worker.pid != os.getpid():
+                _worker = WorkerMetrics()
+    return _worker
+
+
+def flush_worker():
+    """Volcar las series de este proceso, si las tiene (al terminar el worker)."""
+    directory = metrics_dir()
+    if directory and _worker is not None and _worker.pid == os.getpid():
+        _worker.flush(directory, force=True)
+
+
+# Heredado por los workers tras el ``fork``; ``flush_worker`` comprueba el pid
+atexit.register(flush_worker)
+
+
+def merge(totals, key, values):
+    current = totals.get(key)
+    if current is None:
+        totals[key] = list(values)
+    else:
+        for index, value in enumerate(values):
+            current[index] += value
+
+
+# -----------------------------------------------------------------------------
+# Petición
+# -----------------------------------------------------------------------------
+
+def start_request():
+    return _current_sql.set([0, 0.0])
+
+
+def current_sql():
+    """``(consultas, segundos)`` de la petición en curso, o ``None`` si no se mide."""
+    totals = _current_sql.get()
+    return tuple(totals) if totals is not None else None
+
+
+def finish_request(request, response, started, token):
+    duration = time.perf_counter() - started
+    sql_queries, sql_seconds = _current_sql.get()
+    _current_sql.reset(token)
+
+    match = getattr(request, 'resolver_match', None)
+    route = (match.route or match.view_name) if match is not None else UNMATCHED_ROUTE
+    size = 0 if response.streaming else len(response.content)
+    current = worker()
+    current.record(
+        route, request.method, response.status_code, duration, sql_queries, sql_seconds, size,
+    )
+    directory = metrics_dir()
+    if directory:
+        current.flush(directory)
+
+
+# -----------------------------------------------------------------------------
+# Agregación y exposición
+# -----------------------------------------------------------------------------
+
+def worker_pid(path):
+    """Pid del nombre ``worker-<pid>-<ms>.json``, o ``None`` si no lo tiene."""
+    try:
+        return int(os.path.basename(path).split('-')[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def is_running(pid):
+    if pid is None or pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # existe, pero de otro usuario
+    return True
+
+
+def read_rows(path):
+    with open(path, 'rb') as handle:
+        return loads(handle.read())
+
+
+def retire_workers(directory, paths):
+    """
+    Sumar a ``retired.json`` los ficheros de workers terminados y borrarlos.
+    Los nombres ya sumados quedan anotados: si el proceso muere antes de
+    borrar un fichero, el siguiente no lo vuelve a sumar.
+    """
+    retired_path = os.path.join(directory, RETIRED_FILE)
+    with open(f'{retired_path}.lock', 'a') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            retired = read_rows(retired_path)
+        except FileNotFoundError:
+            retired = {'workers': [], 'series': []}
+        totals = {}
+        for route, method, status, values in retired['series']:
+            merge(totals, (route, method, status), values)
+        folded = set(retired['workers'])
+        pending = []
+        for path in paths:
+            name = os.path.basename(path)
+            if name not in folded:
+                try:
+                    rows = read_rows(path)
+                except FileNotFoundError:
+                    continue  # ya lo retiró otro proceso
+                except ValueError:
+                    rows = []  # fichero dañado: se descarta
+                for route, method, status, values in rows:
+                    merge(totals, (route, method, status), values)
+                folded.add(name)
+            pending.append(path)
+        # Solo se recuerdan los nombres cuyos ficheros aún existen
+        folded = sorted(name for name in folded if os.path.exists(os.path.join(directory, name)))
+        write_atomic(retired_path, {
+            'workers': folded, 'series': [[*key, values] for key, values in totals.items()],
+        })
+        for path in pending:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    return totals
+
+
+def collect():
+    """
+    Series de todos los workers: las de los ya terminados, los ficheros
+    volcados por los demás y este proceso en vivo.
+    """
+    current = worker()
+    totals = {}
+    directory = metrics_dir()
+    if directory:
+        paths = glob.glob(os.path.join(directory, 'worker-*.json'))
+        finished = [
+            path for path in paths
+            if os.path.basename(path) != current.name and not is_running(worker_pid(path))
+        ]
+        if finished:
+            retired = retire_workers(directory, finished)
+        else:
+            try:
+                retired = {
+                    (route, method, status): values
+                    for route, method, status, values in read_rows(os.path.join(directory, RETIRED_FILE))['series']
+                }
+            except (OSError, ValueError):
+                retired = {}
+        for key, values in retired.items():
+            merge(totals, key, values)
+        for path in paths:
+            if os.path.basename(path) == current.name or path in finished:
+                continue
+            try:
+                rows = read_rows(path)
+            except (OSError, ValueError):
+                continue  # borrado o reemplazado por otro proceso
+            for route, method, status, values in rows:
+                merge(totals, (route, method, status), values)
+    for key, values in current.snapshot().items():
+        merge(totals, key, values)
+    return totals
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def labels(**values):
+    return ','.join(f'{name}="{escape_label(value)}"' for name, value in values.items())
+
+
+def render_prometheus(totals):
+    """Texto de exposición de Prometheus (versión 0.0.4)."""
+    by_route = {}
+    for (route, method, status), values in totals.items():
+        merge(by_route, (route, method), values)
+
+    lines = [
+        '# HELP inventory_http_requests_total Peticiones HTTP atendidas.',
+        '# TYPE inventory_http_requests_total counter',
+    ]
+    for (route, method, status), values in sorted(totals.items()):
+        lines.append(
+            f'inventory_http_requests_total{{{labels(route=route, method=method, status=status)}}} '
+            f'{values[REQUESTS]}'
+        )
+
+    lines += [
+        '# HELP inventory_http_request_duration_seconds Latencia de las peticiones HTTP.',
+        '# TYPE inventory_http_request_duration_seconds histogram',
+    ]
+    for (route, method), values in sorted(by_route.items()):
+        route_labels = labels(route=route, method=method)
+        cumulative = 0
+        for index, bound in enumerate((*LATENCY_BUCKETS, '+Inf')):
+            cumulative += values[FIRST_BUCKET + index]
+            lines.append(
+                f'inventory_http_request_duration_seconds_bucket{{{route_labels},le="{bound}"}} {cumulative}'
+            )
+        lines.append(f'inventory_http_request_duration_seconds_sum{{{route_labels}}} {values[LATENCY_SUM]:.6f}')
+        lines.append(f'inventory_http_request_duration_seconds_count{{{route_labels}}} {values[REQUESTS]}')
+
+    counters = (
+        ('inventory_db_queries_total', 'Consultas SQL ejecutadas por las peticiones.', SQL_QUERIES, '{}'),
+        ('inventory_db_query_duration_seconds_total', 'Tiempo en consultas SQL.', SQL_SECONDS, '{:.6f}'),
+        ('inventory_http_response_bytes_total', 'Bytes de respuesta enviados.', RESPONSE_BYTES, '{}'),
+    )
+    for name, help_text, index, number in counters:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for (route, method), values in sorted(by_route.items()):
+            lines.append(f'{name}{{{labels(route=route, method=method)}}} {number.format(values[index])}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,81 @@
+"""
+Perfil de empresa (``CompanyUser``) del usuario de la petición.
+
+``CompanyUserMiddleware`` expone ``request.company_user``, que se resuelve la
+primera vez que se usa y como mucho una vez por petición. En peticiones con
+sesión iniciada el perfil se guarda en la propia sesión junto con su versión;
+mientras la versión no cambie (cualquier escritura del perfil la incrementa)
+se reconstruye sin consultar la base de datos. Los perfiles que faltan se
+crean con ``get_or_create``, que resuelve la carrera entre dos peticiones
+simultáneas del mismo usuario con la restricción única de ``user``.
+"""
+from django.contrib.auth import SESSION_KEY
+
+from ..models import CompanyUser
+from .counting import bump_table_generation, get_table_generation
+
+PROFILE_SESSION_KEY = '_company_user'
+
+# Campos del perfil que se guardan en la sesión
+PROFILE_FIELDS = ('id', 'user_id', 'department', 'phone', 'email')
+
+
+def _version_key(user_id):
+    # Un contador de generación por usuario, en la misma caché compartida que
+    # los de las tablas
+    return f'{CompanyUser._meta.db_table}:{user_id}'
+
+
+def profile_version(user_id):
+    return get_table_generation(_version_key(user_id))
+
+
+def bump_profile_version(user_id):
+    bump_table_generation(_version_key(user_id))
+
+
+def get_or_create_company_user(user):
+    """Devolver ``(perfil, creado)``; el perfil se crea con valores por defecto."""
+    company_user, created = CompanyUser.objects.get_or_create(user=user, defaults={
+        'department': 'IT',
+        'phone': '000-000-0000',
+        'email': f'{user.username}@tuempresa.com',
+    })
+    company_user.user = user  # evita volver a cargar el usuario
+    return company_user, created
+
+
+def _from_session(data, user):
+    fields = [field.attname for field in CompanyUser._meta.concrete_fields if field.attname in data]
+    company_user = CompanyUser.from_db('default', fields, [data[name] for name in fields])
+    company_user.user = user
+    return company_user
+
+
+def resolve_company_user(request):
+    """Perfil del usuario autenticado de ``request`` (``None`` si es anónimo)."""
+    user = request.user
+    if not user.is_authenticated:
+        return None
+
+    session = getattr(request, 'session', None)
+    # Solo se cachea en sesiones iniciadas por este usuario: las peticiones con
+    # token o Basic no deben crear una sesión nueva
+    if session is None or session.get(SESSION_KEY) != str(user.pk):
+        return get_or_create_company_user(user)[0]
+
+    version = profile_version(user.pk)
+    cached = session.get(PROFILE_SESSION_KEY)
+    if cached and cached['user_id'] == user.pk and cached['version'] == version:
+        return _from_session(cached['profile'], user)
+
+    company_user, created = get_or_create_company_user(user)
+    if created:
+        # Crearlo incrementó la versión leída antes
+        version = profile_version(user.pk)
+    session[PROFILE_SESSION_KEY] = {
+        'user_id': user.pk,
+        'version': version,
+        'profile': {field: getattr(company_user, field) for field in PROFILE_FIELDS},
+    }
+    return company_user
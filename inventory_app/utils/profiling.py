@@ -0,0 +1,266 @@
+"""
+Perfilado bajo demanda de peticiones de administradores.
+
+Un administrador lo activa en una petición concreta con la cabecera
+``X-Profile: 1`` o con ``?_profile=1`` (``sample`` en lugar de ``1`` elige el
+muestreador). ``ProfilingMiddleware`` ejecuta la vista bajo:
+
+- ``cProfile`` (por defecto en vistas síncronas): llamadas y tiempos exactos
+  por función, con algo de sobrecoste en código con muchas llamadas.
+- un muestreador de pila (``sample``, y siempre en vistas asíncronas): un hilo
+  lee la pila del hilo de la petición cada ``PROFILE_SAMPLE_INTERVAL``
+  segundos; el sobrecoste es casi nulo y los tiempos son estimados.
+
+Cada perfil se guarda, con las consultas SQL agrupadas por forma, en un
+fichero JSON de ``PROFILE_DIR``; solo se conservan los ``PROFILE_RING_SIZE``
+más recientes. El admin los lista en ``/admin/profiles/``.
+"""
+import cProfile
+import glob
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import query_budget
+from .fast_json import dumps, loads
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_PARAM = '_profile'
+PROFILE_ID = re.compile(r'\d{20}-\d+')
+
+# Funciones y consultas guardadas por perfil
+TOP_FUNCTIONS = 40
+TOP_QUERIES = 25
+
+
+def profile_dir():
+    return getattr(settings, 'PROFILE_DIR', None)
+
+
+def ring_size():
+    return getattr(settings, 'PROFILE_RING_SIZE', 50)
+
+
+def sample_interval():
+    return getattr(settings, 'PROFILE_SAMPLE_INTERVAL', 0.005)
+
+
+def profile_flag(request):
+    flag = (request.META.get(PROFILE_HEADER) or request.GET.get(PROFILE_PARAM) or '').lower()
+    return None if flag in ('', '0', 'false', 'off') else flag
+
+
+def requested_mode(request, is_async=False):
+    """Modo pedido por un administrador, o ``None`` si no se perfila."""
+    flag = profile_flag(request)
+    if flag is None:
+        return None
+    user = getattr(request, 'user', None)
+    if user is None or not (user.is_staff or user.is_superuser):
+        return None
+    return 'sample' if is_async or flag == 'sample' else 'cprofile'
+
+
+def _function_label(filename, line, name):
+    if filename == '~':
+        return name  # funciones internas de C: "<built-in method ...>"
+    try:
+        filename = os.path.relpath(filename, settings.BASE_DIR)
+    except ValueError:
+        pass
+    return f'{filename}:{line}({name})'
+
+
+# -----------------------------------------------------------------------------
+# Perfiladores
+# -----------------------------------------------------------------------------
+
+class CProfiler:
+    mode = 'cprofile'
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def functions(self):
+        stats = pstats.Stats(self.profile).stats
+        rows = [
+            {
+                'function': _function_label(*key),
+                'calls': calls,
+                'self': round(tottime, 6),
+                'total': round(cumtime, 6),
+            }
+            for key, (_, calls, tottime, cumtime, _) in stats.items()
+        ]
+        return sorted(rows, key=lambda row: row['self'], reverse=True)[:TOP_FUNCTIONS]
+
+
+class StackSampler:
+    """Muestreo de la pila de un hilo desde otro hilo (``sys._current_frames``)."""
+    mode = 'sample'
+
+    def __init__(self, interval=None):
+        self.interval = interval or sample_interval()
+        self.thread_id = threading.get_ident()
+        self.own = Counter()  # muestras con la función en ejecución
+        self.inclusive = Counter()  # muestras con la función en la pila
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            code = frame.f_code
+            self.own[(code.co_filename, code.co_firstlineno, code.co_name)] += 1
+            seen = set()
+            while frame is not None:
+                code = frame.f_code
+                key = (code.co_filename, code.co_firstlineno, code.co_name)
+                if key not in seen:  # recursión: una vez por muestra
+                    seen.add(key)
+                    self.inclusive[key] += 1
+                frame = frame.f_back
+
+    def functions(self):
+        rows = [
+            {
+                'function': _function_label(*key),
+                'calls': None,
+                'self': round(self.own[key] * self.interval, 6),
+                'total': round(count * self.interval, 6),
+            }
+            for key, count in self.inclusive.items()
+        ]
+        return sorted(rows, key=lambda row: (row['self'], row['total']), reverse=True)[:TOP_FUNCTIONS]
+
+
+def make_profiler(mode):
+    return CProfiler() if mode == 'cprofile' else StackSampler()
+
+
+# -----------------------------------------------------------------------------
+# Anillo en disco
+# -----------------------------------------------------------------------------
+
+def build_profile(request, response, profiler, inspector, duration):
+    queries = [
+        {
+            'sql': shape,
+            'count': count,
+            'seconds': round(inspector.seconds[shape], 6),
+            'origin': inspector.origins[shape].most_common(1)[0][0],
+        }
+        for shape, count in inspector.shapes.items()
+    ]
+    queries.sort(key=lambda query: query['seconds'], reverse=True)
+    now = timezone.now()
+    return {
+        'id': f'{now:%Y%m%d%H%M%S%f}-{os.getpid()}',
+        'created_at': now.isoformat(),
+        'method': request.method,
+        'path': request.get_full_path(),
+        'status': response.status_code,
+        'user': request.user.get_username(),
+        'mode': profiler.mode,
+        'duration': round(duration, 6),
+        'sql_count': inspector.count,
+        'sql_seconds': round(sum(inspector.seconds.values()), 6),
+        'functions': profiler.functions(),
+        'queries': queries[:TOP_QUERIES],
+    }
+
+
+def save_profile(profile):
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{profile['id']}.json")
+    with open(f'{path}.tmp', 'wb') as handle:
+        handle.write(dumps(profile))
+    os.replace(f'{path}.tmp', path)
+
+    # Anillo: los nombres empiezan por la fecha, se borran los más antiguos
+    paths = sorted(glob.glob(os.path.join(directory, '*.json')))
+    for old in paths[:max(0, len(paths) - ring_size())]:
+        try:
+            os.remove(old)
+        except FileNotFoundError:
+            pass  # otro worker ya lo borró
+
+
+def list_profiles():
+    """Perfiles guardados, del más reciente al más antiguo (sin el detalle)."""
+    directory = profile_dir()
+    profiles = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.json')), reverse=True):
+        profile = _read(path)
+        if profile is not None:
+            profile.pop('functions', None)
+            profile.pop('queries', None)
+            profiles.append(profile)
+    return profiles
+
+
+def load_profile(profile_id):
+    if not PROFILE_ID.fullmatch(profile_id or ''):
+        return None
+    return _read(os.path.join(profile_dir(), f'{profile_id}.json'))
+
+
+def _read(path):
+    try:
+        with open(path, 'rb') as handle:
+            return loads(handle.read())
+    except (OSError, ValueError):
+        return None
+
+
+# -----------------------------------------------------------------------------
+# Petición
+# -----------------------------------------------------------------------------
+
+class ProfiledRequest:
+    def __init__(self, request, mode):
+        self.request = request
+        self.profiler = make_profiler(mode)
+
+    def __enter__(self):
+        self.inspector, self.token = query_budget.push_inspector()
+        self.started = time.perf_counter()
+        self.profiler.start()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.profiler.stop()
+        self.duration = time.perf_counter() - self.started
+        query_budget.pop_inspector(self.token)
+        return False
+
+    def finish(self, response):
+        profile = build_profile(self.request, response, self.profiler, self.inspector, self.duration)
+        save_profile(profile)
+        response['X-Profile-Id'] = profile['id']
+        return response
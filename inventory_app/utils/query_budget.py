@@ -0,0 +1,288 @@
+"""
+Detección de N+1 y presupuestos de consultas por vista.
+
+Cada consulta se reduce a su huella (``fingerprint``): el SQL sin literales ni
+listas de parámetros, de modo que ``... WHERE id = 1`` y ``... WHERE id = 2``
+cuentan como la misma forma. Una forma que se repite muchas veces en una
+petición es casi siempre un N+1 (una consulta por fila de un listado).
+
+Las vistas declaran su presupuesto con :func:`query_budget`::
+
+    @query_budget(max_queries=12)
+    def dashboard(request): ...
+
+(también las acciones de un ViewSet, con su propio presupuesto) y
+``QueryInspectionMiddleware`` lo comprueba: en los tests lanza
+:class:`QueryBudgetExceeded` (toda la suite hace de vigilante) y en producción
+registra la infracción, con la línea de código que originó la consulta, para
+una fracción ``QUERY_INSPECTION_SAMPLE_RATE`` de las peticiones. En tests
+concretos, :func:`inspect_queries` hace lo mismo sobre un bloque de código.
+Las subpeticiones de un lote se comprueban cada una con el presupuesto de su
+vista (:class:`inspect_sub_request`).
+"""
+import logging
+import os
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from . import metrics, query_workload
+
+logger = logging.getLogger('inventory_app.queries')
+
+# Repeticiones de una misma forma a partir de las que se considera N+1
+DEFAULT_MAX_REPEATS = 10
+
+# Sin límite de repeticiones (vistas que se comprueban por partes)
+UNLIMITED = float('inf')
+
+# Inspectores activos (anidables: el middleware, un ``inspect_queries``, el perfilador...)
+_current = ContextVar('query_inspectors', default=())
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*\?\s*,?)+\)', re.IGNORECASE)
+_VALUES_LIST = re.compile(r'\bVALUES\s*(\((?:\s*\?\s*,?)+\)\s*,?\s*)+', re.IGNORECASE)
+_SPACES = re.compile(r'\s+')
+
+# Código que no es "origen" de una consulta: bibliotecas y los demás
+# ``execute_wrapper`` de la aplicación
+_LIBRARY_PATHS = tuple(
+    os.sep + part + os.sep for part in ('django', 'rest_framework', 'django_filters', 'asgiref')
+)
+_WRAPPER_FILES = {__file__, metrics.__file__, query_workload.__file__}
+
+
+def fingerprint(sql):
+    """Forma de la consulta: sin literales y con las listas ``IN``/``VALUES`` colapsadas."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _VALUES_LIST.sub('VALUES (...) ', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def query_origin():
+    """``fichero:línea en función`` del primer marco de la aplicación."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename not in _WRAPPER_FILES and not any(part in filename for part in _LIBRARY_PATHS) \
+                and 'site-packages' not in filename and not filename.startswith('<'):
+            return f'{os.path.relpath(filename, settings.BASE_DIR)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return 'desconocido'
+
+
+# -----------------------------------------------------------------------------
+# Presupuesto e inspección
+# -----------------------------------------------------------------------------
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryBudget:
+    """
+    Máximo de consultas y de repeticiones de una misma forma. ``methods``
+    limita el máximo de consultas a esos métodos HTTP (por defecto, lecturas);
+    la detección de N+1 se aplica siempre.
+    """
+
+    def __init__(self, max_queries=None, max_repeats=None, methods=('GET', 'HEAD')):
+        self.max_queries = max_queries
+        self.max_repeats = max_repeats
+        self.methods = methods
+
+    def for_method(self, method):
+        if self.methods is None or method in self.methods:
+            return self
+        return QueryBudget(max_repeats=self.max_repeats)
+
+    def __repr__(self):
+        return f'QueryBudget(max_queries={self.max_queries}, max_repeats={self.max_repeats})'
+
+
+def query_budget(max_queries=None, max_repeats=None, methods=('GET', 'HEAD')):
+    """Declarar el presupuesto de una vista (función, clase o ViewSet)."""
+    def decorator(view):
+        view.query_budget = QueryBudget(max_queries, max_repeats, methods)
+        return view
+    return decorator
+
+
+def view_budget(view_func, method=None):
+    """Presupuesto declarado por la vista resuelta (o por su acción), si lo hay."""
+    actions = getattr(view_func, 'actions', None)  # ViewSets de DRF: método -> acción
+    if actions and method:
+        action = getattr(view_func.cls, actions.get(method.lower(), ''), None)
+        budget = getattr(action, 'query_budget', None)
+        if budget is not None:
+            return budget
+    for candidate in (
+        view_func,
+        getattr(view_func, 'view_class', None),
+        getattr(view_func, 'cls', None),  # ViewSets de DRF
+    ):
+        budget = getattr(candidate, 'query_budget', None)
+        if budget is not None:
+            return budget
+    sync_view = getattr(view_func, 'sync_view', None)  # AsyncReadView
+    return view_budget(sync_view, method) if sync_view is not None else None
+
+
+class QueryInspector:
+    """Huellas, tiempos y origen de las consultas de un bloque o una petición."""
+
+    def __init__(self):
+        self.count = 0
+        self.shapes = Counter()
+        self.seconds = Counter()
+        self.origins = defaultdict(Counter)
+        self.sub_problems = []  # infracciones de subpeticiones (lotes)
+
+    def record(self, sql, duration):
+        shape = fingerprint(sql)
+        self.count += 1
+        self.shapes[shape] += 1
+        self.seconds[shape] += duration
+        self.origins[shape][query_origin()] += 1
+
+    def repeated(self, max_repeats):
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > max_repeats]
+
+    def violations(self, budget=None):
+        budget = budget or QueryBudget()
+        max_repeats = budget.max_repeats if budget.max_repeats is not None else DEFAULT_MAX_REPEATS
+        problems = list(self.sub_problems)
+        if budget.max_queries is not None and self.count > budget.max_queries:
+            problems.append(f'{self.count} consultas (presupuesto: {budget.max_queries})')
+        for shape, count in self.repeated(max_repeats):
+            problems.append(
+                f'posible N+1: {count} veces ({self.seconds[shape] * 1000:.1f} ms) desde '
+                f'{self.origins[shape].most_common(1)[0][0]}: {shape[:300]}'
+            )
+        return problems
+
+
+def inspector_wrapper(execute, sql, params, many, context):
+    inspectors = _current.get()
+    if not inspectors:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        for inspector in inspectors:
+            inspector.record(sql, duration)
+
+
+def push_inspector():
+    """Activar un inspector nuevo; devuelve ``(inspector, token)``."""
+    install_inspectors()
+    inspector = QueryInspector()
+    return inspector, _current.set(_current.get() + (inspector,))
+
+
+def pop_inspector(token):
+    _current.reset(token)
+
+
+def install_inspector(connection, **kwargs):
+    """Receptor de ``connection_created``."""
+    if inspector_wrapper not in connection.execute_wrappers:
+        # Al principio: ``execute_wrapper()`` saca siempre el último de la lista
+        connection.execute_wrappers.insert(0, inspector_wrapper)
+
+
+# Conexiones nuevas de cualquier hilo (también las de ``sync_to_async``)
+connection_created.connect(install_inspector)
+
+
+def install_inspectors():
+    """Conexiones ya abiertas en este hilo."""
+    for connection in connections.all():
+        install_inspector(connection)
+
+
+class inspect_queries(ContextDecorator):
+    """
+    Inspeccionar las consultas de un bloque (``with``) o de una función
+    (decorador) y lanzar :class:`QueryBudgetExceeded` si se sale del
+    presupuesto o hay formas repetidas más de ``max_repeats`` veces.
+    """
+
+    def __init__(self, max_queries=None, max_repeats=None, budget=None):
+        self.budget = budget or QueryBudget(max_queries, max_repeats)
+
+    def __enter__(self):
+        self.inspector, self.token = push_inspector()
+        return self.inspector
+
+    def __exit__(self, exc_type, exc, traceback):
+        pop_inspector(self.token)
+        if exc_type is None:
+            problems = self.inspector.violations(self.budget)
+            if problems:
+                raise QueryBudgetExceeded('\n'.join(problems))
+        return False
+
+
+class inspect_sub_request:
+    """
+    Comprobar las consultas de una subpetición con el presupuesto de su vista
+    y anotar las infracciones en los inspectores activos (solo si la petición
+    que la contiene se está inspeccionando).
+    """
+
+    def __init__(self, view_func, method, path):
+        self.view_func = view_func
+        self.method = method
+        self.path = path
+
+    def __enter__(self):
+        self.parents = _current.get()
+        if self.parents:
+            self.inspector, self.token = push_inspector()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if not self.parents:
+            return False
+        pop_inspector(self.token)
+        budget = view_budget(self.view_func, self.method)
+        if budget is not None:
+            budget = budget.for_method(self.method)
+        problems = self.inspector.violations(budget)
+        for parent in self.parents:
+            parent.sub_problems.extend(f'{self.method} {self.path}: {problem}' for problem in problems)
+        return False
+
+
+# -----------------------------------------------------------------------------
+# Petición
+# -----------------------------------------------------------------------------
+
+def finish_request(request, inspector, token, raise_errors=False):
+    pop_inspector(token)
+    match = getattr(request, 'resolver_match', None)
+    budget = view_budget(match.func, request.method) if match is not None else None
+    if budget is not None:
+        budget = budget.for_method(request.method)
+    problems = inspector.violations(budget)
+    if not problems:
+        return
+    route = match.route if match is not None else request.path
+    if raise_errors:
+        raise QueryBudgetExceeded(f'{request.method} {route}:\n' + '\n'.join(problems))
+    logger.warning('Consultas fuera de presupuesto en %s %s:\n%s', request.method, route, '\n'.join(problems))
@@ -0,0 +1,381 @@
+"""
+Captura de la carga real de consultas SQL y asesor de índices.
+
+``QueryWorkloadRecorder`` se instala con ``connection.execute_wrapper`` (desde
+``QueryWorkloadMiddleware`` o con :func:`capture_workload`) y guarda cada
+consulta con sus parámetros en un fichero JSON Lines. ``IndexAdvisor`` lee ese
+fichero, extrae por tabla las columnas filtradas por igualdad, por rango y de
+ordenación, y propone índices compuestos o parciales que no estén ya cubiertos
+por los índices existentes del modelo.
+"""
+import json
+import os
+import random
+import re
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.db import connection, models
+
+# =============================================================================
+# CAPTURA
+# =============================================================================
+
+_write_lock = threading.Lock()
+
+
+def _json_param(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def append_workload(path, entries, route=''):
+    """Añadir entradas al log (una escritura por petición, modo append)."""
+    if not entries:
+        return
+    payload = ''.join(
+        json.dumps({'route': route, **entry}, ensure_ascii=False) + '\n' for entry in entries
+    )
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with _write_lock:
+        with open(path, 'a', encoding='utf-8') as fh:
+            fh.write(payload)
+
+
+class QueryWorkloadRecorder:
+    """``execute_wrapper`` que acumula las consultas SELECT ejecutadas."""
+
+    def __init__(self):
+        self.entries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            self.entries.append({
+                'sql': sql,
+                'params': [_json_param(p) for p in (params or ())],
+            })
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def capture_workload(path, route='', using=connection):
+    """Capturar la carga de consultas de un bloque de código en ``path``."""
+    recorder = QueryWorkloadRecorder()
+    with using.execute_wrapper(recorder):
+        yield recorder
+    append_workload(path, recorder.entries, route)
+
+
+def should_sample(rate):
+    return rate >= 1 or random.random() < rate
+
+
+# =============================================================================
+# ANÁLISIS
+# =============================================================================
+
+COLUMN_RE = r'"(?P<table>\w+)"\."(?P<column>\w+)"'
+PREDICATE_RE = re.compile(
+    COLUMN_RE + r'\s+(?P<op>=|<=|>=|<|>|IN \((?P<in>[^)]*)\)|IS NOT NULL|IS NULL|BETWEEN|LIKE)'
+)
+ORDER_RE = re.compile(COLUMN_RE + r'(?:\s+(?P<dir>ASC|DESC))?')
+FROM_RE = re.compile(r'\bFROM "(\w+)"')
+CLAUSE_END_RE = re.compile(r'\s(GROUP BY|ORDER BY|HAVING|LIMIT|OFFSET)\s')
+
+# Conjuntos de valores pequeños que justifican un índice parcial
+PARTIAL_MAX_VALUES = 4
+
+
+def _split_top_level(text, separator):
+    parts, depth, start, i = [], 0, 0, 0
+    size = len(separator)
+    while i < len(text):
+        char = text[i]
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif depth == 0 and text.startswith(separator, i):
+            parts.append(text[start:i])
+            start = i + size
+            i += size
+            continue
+        i += 1
+    parts.append(text[start:])
+    return [part.strip() for part in parts]
+
+
+def _wrapped_in_parens(text):
+    if not (text.startswith('(') and text.endswith(')')):
+        return False
+    depth = 0
+    for i, char in enumerate(text):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth == 0 and i < len(text) - 1:
+                return False
+    return True
+
+
+def _strip_parens(text):
+    text = text.strip()
+    while _wrapped_in_parens(text):
+        text = text[1:-1].strip()
+    return text
+
+
+class QueryShape:
+    """Predicados indexables de una consulta para una tabla concreta."""
+
+    def __init__(self, table):
+        self.table = table
+        self.equality = []
+        self.ranges = []
+        self.order = []
+        self.partial = []  # (columna, 'in', valores) | (columna, 'isnull', bool)
+
+    def key(self):
+        return (
+            self.table, tuple(self.equality), tuple(self.ranges),
+            tuple(self.order), tuple(self.partial),
+        )
+
+
+def parse_query(sql, params):
+    """Extraer las formas indexables (una por tabla) de una consulta SELECT."""
+    from_match = FROM_RE.search(sql)
+    if not from_match:
+        return []
+    main_table = from_match.group(1)
+
+    shapes = {}
+
+    def shape_for(table):
+        if table not in shapes:
+            shapes[table] = QueryShape(table)
+        return shapes[table]
+
+    where_index = sql.find(' WHERE ')
+    if where_index != -1:
+        where = sql[where_index + len(' WHERE '):]
+        end = CLAUSE_END_RE.search(where)
+        if end:
+            where = where[:end.start()]
+        where_offset = where_index + len(' WHERE ')
+
+        for conjunct in _split_top_level(_strip_parens(where), ' AND '):
+            conjunct = _strip_parens(conjunct)
+            # Una disyunción no puede aprovechar un índice compuesto
+            if len(_split_top_level(conjunct, ' OR ')) > 1 or conjunct.startswith('NOT '):
+                continue
+            match = PREDICATE_RE.match(conjunct)
+            if not match:
+                continue
+            table, column, op = match.group('table'), match.group('column'), match.group('op')
+            position = sql.find(conjunct, where_offset)
+            param_index = sql.count('%s', 0, position if position != -1 else 0)
+            shape = shape_for(table)
+
+            if op == '=':
+                shape.equality.append(column)
+            elif op.startswith('IN ('):
+                size = match.group('in').count('%s')
+                values = tuple(sorted(str(v) for v in params[param_index:param_index + size]))
+                if 0 < size <= PARTIAL_MAX_VALUES and len(values) == size:
+                    shape.partial.append((column, 'in', values))
+                else:
+                    shape.equality.append(column)
+            elif op == 'IS NULL':
+                shape.partial.append((column, 'isnull', True))
+            elif op == 'IS NOT NULL':
+                shape.partial.append((column, 'isnull', False))
+            elif op == 'LIKE':
+                value = params[param_index] if param_index < len(params) else ''
+                # Solo un prefijo fijo ('abc%') puede usar un índice B-tree
+                if isinstance(value, str) and value and not value.startswith('%'):
+                    shape.ranges.append(column)
+            else:
+                shape.ranges.append(column)
+
+    order_index = sql.find(' ORDER BY ')
+    if order_index != -1:
+        order = sql[order_index + len(' ORDER BY '):]
+        end = re.search(r'\s(LIMIT|OFFSET)\s', order)
+        if end:
+            order = order[:end.start()]
+        for match in ORDER_RE.finditer(order):
+            if match.group('table') == main_table:
+                prefix = '-' if match.group('dir') == 'DESC' else ''
+                shape_for(main_table).order.append(prefix + match.group('column'))
+
+    return [
+        shape for shape in shapes.values()
+        if shape.equality or shape.ranges or shape.order or shape.partial
+    ]
+
+
+def load_workload(path):
+    with open(path, encoding='utf-8') as fh:
+        for line in fh:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def _condition_key(condition):
+    """Forma canónica de un Q para comparar condiciones de índices parciales."""
+    if condition is None:
+        return None
+    children = []
+    for child in condition.children:
+        if isinstance(child, models.Q):
+            children.append(_condition_key(child))
+        else:
+            lookup, value = child
+            if isinstance(value, (list, tuple, set)):
+                value = tuple(sorted(str(v) for v in value))
+            children.append((lookup, value))
+    return (condition.connector, condition.negated, tuple(sorted(children, key=repr)))
+
+
+class IndexSuggestion:
+    def __init__(self, model, fields, condition=None, hits=0, routes=()):
+        self.model = model
+        self.fields = list(fields)
+        self.condition = condition
+        self.hits = hits
+        self.routes = sorted(routes)
+
+    def build_index(self):
+        index = models.Index(fields=self.fields, condition=self.condition, name='pending')
+        if self.condition is not None:
+            # El nombre autogenerado no depende de la condición: distinguir parciales
+            index.suffix = 'pix'
+        index.set_name_with_model(self.model)
+        return index
+
+    def __str__(self):
+        text = f'{self.model.__name__}({", ".join(self.fields)})'
+        if self.condition is not None:
+            lookups = ' AND '.join(f'{lookup}={value!r}' for lookup, value in self.condition.children)
+            text += f' WHERE {lookups}'
+        return text
+
+
+class IndexAdvisor:
+    """Agrega formas de consulta y propone índices no cubiertos."""
+
+    def __init__(self, app_label='inventory_app', min_hits=1):
+        self.app_label = app_label
+        self.min_hits = min_hits
+        self.shapes = Counter()
+        self.routes = defaultdict(set)
+        self.models_by_table = {
+            model._meta.db_table: model
+            for model in apps.get_app_config(app_label).get_models()
+        }
+
+    def add_query(self, sql, params=(), route=''):
+        for shape in parse_query(sql, list(params or ())):
+            if shape.table in self.models_by_table:
+                self.shapes[shape.key()] += 1
+                if route:
+                    self.routes[shape.key()].add(route)
+
+    def add_workload(self, entries):
+        for entry in entries:
+            self.add_query(entry['sql'], entry.get('params') or (), entry.get('route', ''))
+
+    def _field_name(self, model, column):
+        for field in model._meta.concrete_fields:
+            if field.column == column:
+                return field.name
+        return None
+
+    def existing_indexes(self, model):
+        """Listas de columnas (con su condición) ya indexadas en el modelo."""
+        existing = []
+        for index in model._meta.indexes:
+            columns = [
+                model._meta.get_field(name.lstrip('-')).column for name in index.fields
+            ]
+            existing.append((columns, index.condition))
+        for field in model._meta.concrete_fields:
+            if field.primary_key or field.unique or field.db_index:
+                existing.append(([field.column], None))
+        for fields in model._meta.unique_together:
+            existing.append(([model._meta.get_field(name).column for name in fields], None))
+        return existing
+
+    def _is_covered(self, model, columns, condition, condition_only=False):
+        wanted = _condition_key(condition)
+        for existing_columns, existing_condition in self.existing_indexes(model):
+            same_condition = existing_condition is not None and _condition_key(existing_condition) == wanted
+            # Un índice parcial con la misma condición ya sirve para contarla
+            if condition_only and same_condition:
+                return True
+            if existing_columns[:len(columns)] != columns:
+                continue
+            if existing_condition is None or same_condition:
+                return True
+        return False
+
+    def suggestions(self):
+        proposals = {}
+        for key, hits in self.shapes.items():
+            if hits < self.min_hits:
+                continue
+            table, equality, ranges, order, partial = key
+            model = self.models_by_table[table]
+
+            fields = []
+            for column in list(equality) + list(ranges[:1]):
+                name = self._field_name(model, column)
+                if name and name not in fields:
+                    fields.append(name)
+            if not ranges:
+                # El orden solo aprovecha el índice tras las igualdades
+                for column in order:
+                    name = self._field_name(model, column.lstrip('-'))
+                    if name and name not in fields and ('-' + name) not in fields:
+                        fields.append(('-' if column.startswith('-') else '') + name)
+
+            condition = None
+            for column, kind, value in partial:
+                name = self._field_name(model, column)
+                if not name:
+                    continue
+                if kind == 'isnull' and value is False and name in fields:
+                    # Un rango o igualdad sobre la columna ya excluye los NULL
+                    continue
+                q = models.Q(**{f'{name}__in': list(value)}) if kind == 'in' else models.Q(**{f'{name}__isnull': value})
+                condition = q if condition is None else condition & q
+
+            condition_only = not fields
+            if condition_only:
+                if condition is None:
+                    continue
+                # Índice parcial sobre la propia columna del predicado
+                fields = [self._field_name(model, partial[0][0])]
+
+            columns = [model._meta.get_field(name.lstrip('-')).column for name in fields]
+            if self._is_covered(model, columns, condition, condition_only):
+                continue
+
+            proposal_key = (table, tuple(fields), str(condition))
+            if proposal_key in proposals:
+                proposals[proposal_key].hits += hits
+                proposals[proposal_key].routes = sorted(set(proposals[proposal_key].routes) | self.routes[key])
+            else:
+                proposals[proposal_key] = IndexSuggestion(
+                    model, fields, condition, hits, self.routes[key]
+                )
+
+        return sorted(proposals.values(), key=lambda s: -s.hits)
@@ -0,0 +1,287 @@
+"""
+Registro estructurado (JSON) que no bloquea las peticiones.
+
+``RequestLogMiddleware`` asigna a cada petición un identificador (el
+``X-Request-ID`` recibido o uno nuevo, devuelto en la respuesta) y al terminar
+registra en ``inventory_app.requests`` la ruta, el usuario, el estado, la
+duración y las consultas SQL (si ``MetricsMiddleware`` está activo).
+``RequestContextFilter`` añade el identificador, el usuario y la ruta a
+cualquier otro registro emitido durante la petición.
+
+En producción todos los registros pasan por ``JsonQueueHandler``: el hilo de
+la petición solo mete el registro en una cola acotada y un ``QueueListener``
+(un hilo por worker) lo formatea en JSON y lo escribe en el fichero, con
+rotación por tamaño, y en la consola. Si el disco se atasca y la cola se
+llena, los registros por debajo de ERROR se descartan y se cuentan (el
+siguiente registro que entra va precedido de un aviso con el total) y los de
+ERROR o superior esperan como mucho ``block_timeout`` segundos.
+"""
+import copy
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from django.utils.functional import SimpleLazyObject, empty
+
+from . import metrics
+from .fast_json import dumps
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: sin bloqueo entre procesos
+    fcntl = None
+
+logger = logging.getLogger('inventory_app.requests')
+
+REQUEST_ID_HEADER = 'HTTP_X_REQUEST_ID'
+REQUEST_ID = re.compile(r'[\w.-]{1,64}', re.ASCII)
+
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_BLOCK_TIMEOUT = 0.1
+
+# Petición en curso (también en ``sync_to_async``)
+_current_request = ContextVar('log_request', default=None)
+
+
+def request_user(request):
+    """Nombre del usuario, sin cargar la sesión si la petición aún no lo hizo."""
+    user = request.__dict__.get('user')
+    if user is None or (isinstance(user, SimpleLazyObject) and user._wrapped is empty):
+        return None
+    return user.get_username() if user.is_authenticated else None
+
+
+def request_route(request):
+    match = getattr(request, 'resolver_match', None)
+    return (match.route or match.view_name) if match is not None else None
+
+
+# -----------------------------------------------------------------------------
+# Formato
+# -----------------------------------------------------------------------------
+
+class RequestContextFilter(logging.Filter):
+    """Identificador, usuario y ruta de la petición en curso."""
+
+    def filter(self, record):
+        request = _current_request.get()
+        if request is not None:
+            record.request_id = request.request_id
+            if getattr(record, 'user', None) is None:
+                record.user = request_user(request)
+            if getattr(record, 'route', None) is None:
+                record.route = request_route(request)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Un objeto JSON por línea."""
+    FIELDS = (
+        'request_id', 'user', 'route', 'method', 'path', 'status',
+        'duration_ms', 'sql_queries', 'sql_ms', 'dropped',
+    )
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process,
+        }
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = record.stack_info
+        return dumps(entry).decode()
+
+
+# -----------------------------------------------------------------------------
+# Escritura
+# -----------------------------------------------------------------------------
+
+class SharedRotatingFileHandler(RotatingFileHandler):
+    """
+    Rotación por tamaño con varios workers escribiendo en el mismo fichero:
+    la rotación se hace con un bloqueo entre procesos y, si otro worker ya
+    rotó, se reabre el fichero en lugar de seguir escribiendo en el antiguo.
+    """
+
+    def reopen_if_rotated(self):
+        if self.stream is None:
+            return False
+        try:
+            current = os.stat(self.baseFilename)
+            opened = os.fstat(self.stream.fileno())
+            if (current.st_dev, current.st_ino) == (opened.st_dev, opened.st_ino):
+                return False
+        except FileNotFoundError:
+            pass
+        self.stream.close()
+        self.stream = self._open()
+        return True
+
+    def shouldRollover(self, record):
+        self.reopen_if_rotated()
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        with open(f'{self.baseFilename}.lock', 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            # Otro worker pudo rotar mientras se esperaba el bloqueo
+            if not self.reopen_if_rotated():
+                super().doRollover()
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)  # la cola puede estar llena: esperar
+
+
+def build_targets(filename=None, max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT, console=True):
+    targets = []
+    if filename:
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        targets.append(SharedRotatingFileHandler(
+            filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True,
+        ))
+    if console:
+        targets.append(logging.StreamHandler())
+    formatter = JsonFormatter()
+    for target in targets:
+        target.setFormatter(formatter)
+    return targets
+
+
+class JsonQueueHandler(QueueHandler):
+    """
+    Encolar los registros para que un hilo aparte los escriba en ``handlers``
+    (por defecto, fichero con rotación y consola en JSON). El hilo se arranca
+    con el primer registro de cada proceso: tras el ``fork`` de gunicorn el
+    del proceso padre no existe.
+    """
+
+    def __init__(self, filename=None, max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT,
+                 console=True, queue_size=DEFAULT_QUEUE_SIZE, block_timeout=DEFAULT_BLOCK_TIMEOUT,
+                 handlers=None):
+        super().__init__(queue.Queue(queue_size))
+        self.queue_size = queue_size
+        self.block_timeout = block_timeout
+        self.targets = handlers if handlers is not None else build_targets(
+            filename, max_bytes, backup_count, console,
+        )
+        self.listener = None
+        self.pid = None
+        self.start_lock = threading.Lock()
+        self.drop_lock = threading.Lock()
+        self.dropped = 0  # total del proceso
+        self.unreported = 0  # descartados aún sin aviso
+
+    def start_listener(self):
+        if self.pid == os.getpid():
+            return
+        with self.start_lock:
+            if self.pid != os.getpid():
+                self.queue = queue.Queue(self.queue_size)
+                self.listener = _Listener(self.queue, *self.targets, respect_handler_level=True)
+                self.listener.start()
+                self.pid = os.getpid()
+
+    def prepare(self, record):
+        # Como ``QueueHandler.prepare``, pero conservando mensaje y traza por
+        # separado para el JSON
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self.start_listener()
+        if self.unreported:
+            self.report_drops()
+        try:
+            if record.levelno >= logging.ERROR:
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            with self.drop_lock:
+                self.dropped += 1
+                self.unreported += 1
+
+    def report_drops(self):
+        with self.drop_lock:
+            count, self.unreported = self.unreported, 0
+        if not count:
+            return
+        record = logging.LogRecord(
+            'inventory_app.logging', logging.WARNING, __file__, 0,
+            'Cola de logs llena: %d registros descartados', (count,), None,
+        )
+        record.dropped = count
+        try:
+            self.queue.put_nowait(self.prepare(record))
+        except queue.Full:
+            with self.drop_lock:
+                self.unreported += count
+
+    def close(self):
+        if self.listener is not None and self.pid == os.getpid():
+            self.listener.stop()  # vacía la cola antes de cerrar
+        self.listener = self.pid = None
+        for target in self.targets:
+            target.close()
+        super().close()
+
+
+# -----------------------------------------------------------------------------
+# Petición
+# -----------------------------------------------------------------------------
+
+def start_request(request):
+    request_id = request.META.get(REQUEST_ID_HEADER, '')
+    request.request_id = request_id if REQUEST_ID.fullmatch(request_id) else uuid.uuid4().hex
+    return _current_request.set(request), time.perf_counter()
+
+
+def finish_request(request, response, started, token):
+    duration = time.perf_counter() - started
+    response['X-Request-ID'] = request.request_id
+    if logger.isEnabledFor(logging.INFO):
+        extra = {
+            'request_id': request.request_id,
+            'user': request_user(request),
+            'route': request_route(request),
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+        }
+        sql = metrics.current_sql()
+        if sql is not None:
+            extra['sql_queries'], extra['sql_ms'] = sql[0], round(sql[1] * 1000, 2)
+        logger.info('%s %s %s %.1f ms', request.method, request.path, response.status_code,
+                    duration * 1000, extra=extra)
+    _current_request.reset(token)
+    return response
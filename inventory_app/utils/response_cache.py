@@ -0,0 +1,94 @@
+"""
+Caché compartida de respuestas de la API para listados y acciones de consulta.
+
+Los mismos listados filtrados (``?status=OPEN&priority=CRITICAL``) se piden una
+y otra vez desde dashboards e integraciones. La respuesta se guarda en la caché
+``shared`` (en disco, común a todos los workers) con una clave formada por:
+
+- la vista y la acción;
+- los parámetros normalizados (orden de claves y valores indiferente);
+- el ámbito de permisos del usuario y el formato de salida;
+- la generación de cada tabla de la que depende la respuesta.
+
+Al confirmarse, cualquier escritura cambia la generación de su tabla (señales
+o ``bump_table_generation`` en las escrituras masivas), así que las claves
+antiguas dejan de usarse sin borrar nada explícitamente.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from .counting import get_table_generations
+
+CACHE_KEY_PREFIX = 'api-response'
+
+
+def response_cache():
+    return caches[getattr(settings, 'SHARED_CACHE_ALIAS', 'default')]
+
+
+def cache_response(view_method):
+    """Cachear una acción de un ViewSet con :class:`ResponseCacheMixin`."""
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: view_method(self, request, *args, **kwargs))
+    return wrapper
+
+
+class ResponseCacheMixin:
+    """
+    Cachea ``list`` y las acciones decoradas con :func:`cache_response`.
+
+    ``response_cache_models`` son los modelos cuyo contenido aparece en la
+    respuesta (incluidos los anidados); por defecto el del queryset.
+    """
+    response_cache_models = ()
+
+    def get_cache_scope(self):
+        # Las vistas no filtran por usuario: basta con distinguir el personal
+        user = self.request.user
+        if user.is_superuser:
+            return 'superuser'
+        return 'staff' if user.is_staff else 'user'
+
+    def get_response_cache_key(self, request):
+        models = self.response_cache_models or (self.get_queryset().model,)
+        params = sorted(
+            (key, tuple(sorted(values))) for key, values in request.query_params.lists()
+        )
+        renderer = getattr(request, 'accepted_renderer', None)
+        parts = (
+            self.basename, self.action, params, self.get_cache_scope(),
+            renderer.format if renderer is not None else '',
+            request.get_host(),  # los enlaces de paginación son absolutos
+            get_table_generations(model._meta.db_table for model in models),
+        )
+        digest = hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+        return f'{CACHE_KEY_PREFIX}:{self.basename}:{self.action}:{digest}'
+
+    def cached_response(self, request, compute):
+        if request.method not in ('GET', 'HEAD'):
+            return compute()
+
+        key = self.get_response_cache_key(request)
+        cache = response_cache()
+        cached = cache.get(key)
+        if cached is not None:
+            status_code, data = cached
+            response = Response(data, status=status_code)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = compute()
+        if response.status_code == 200 and isinstance(response, Response):
+            timeout = getattr(settings, 'API_RESPONSE_CACHE_TIMEOUT', 300)
+            cache.set(key, (response.status_code, response.data), timeout)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        parent = super()
+        return self.cached_response(request, lambda: parent.list(request, *args, **kwargs))
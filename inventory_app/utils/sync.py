@@ -0,0 +1,210 @@
+"""
+Sincronización incremental para clientes sin conexión (tablets de campo).
+
+Cada alta, modificación o baja de los modelos sincronizables añade una fila a
+``ChangeLog``. El cliente guarda un cursor opaco (la última posición recibida)
+y en cada sincronización pide los cambios posteriores: el coste es
+proporcional al número de cambios, no al tamaño del inventario. Las bajas se
+entregan como lápidas (solo el ``id``).
+
+La posición no es el ``id``: los ids se reparten al insertar y una
+transacción larga puede confirmar el 10 después de que otra haya confirmado
+el 11; un cursor que ya pasó del 11 nunca vería el 10. Por eso cada lectura
+numera antes (``sequence``) los cambios ya confirmados que aún no tienen
+número, con números mayores que cualquiera asignado y de uno en uno (ver
+:func:`number_changes`): el orden de la secuencia es el de confirmación.
+
+Las escrituras que no emiten señales (``bulk_create``/``bulk_update``) deben
+registrar sus cambios con :func:`record_changes`.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.db.models import Exists, F, Max, OuterRef
+from django.utils import timezone
+
+from ..models import ChangeLog, ChangeSequence, Component, Equipment, MaintenanceLog, SupportTicket
+from ..serializers import (
+    ComponentSerializer, EquipmentSerializer, MaintenanceLogSerializer, SupportTicketSerializer,
+)
+
+# Nombre público de cada modelo sincronizable: (modelo, serializer, select_related)
+SYNC_MODELS = {
+    'equipment': (Equipment, EquipmentSerializer, ('assigned_to__user',)),
+    'component': (Component, ComponentSerializer, ()),
+    'maintenance': (MaintenanceLog, MaintenanceLogSerializer, (
+        'equipment__assigned_to__user', 'technician__user',
+    )),
+    'ticket': (SupportTicket, SupportTicketSerializer, (
+        'created_by__user', 'assigned_to__user', 'equipment__assigned_to__user',
+    )),
+}
+SYNC_NAMES = {model: name for name, (model, _, _) in SYNC_MODELS.items()}
+
+SYNC_PAGE_SIZE = 500
+SYNC_MAX_PAGE_SIZE = 2000
+
+# Cambios numerados como mucho por lectura
+NUMBERING_BATCH_SIZE = 10000
+
+CURSOR_SALT = 'inventory_app.sync'
+
+
+class CursorExpired(Exception):
+    """El cursor es anterior a las lápidas conservadas: hay que resincronizar."""
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def tombstone_retention_days():
+    return getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 90)
+
+
+# =============================================================================
+# REGISTRO DE CAMBIOS
+# =============================================================================
+
+def record_change(instance, operation='U'):
+    ChangeLog.objects.create(
+        model_name=SYNC_NAMES[type(instance)], object_id=instance.pk, operation=operation
+    )
+
+
+def record_changes(model, pks, operation='U'):
+    """Registrar los cambios de una escritura masiva con un solo INSERT."""
+    ChangeLog.objects.bulk_create([
+        ChangeLog(model_name=SYNC_NAMES[model], object_id=pk, operation=operation)
+        for pk in pks
+    ])
+
+
+def _lock_sequence():
+    """Bloquear el contador hasta el commit y devolver el último número asignado."""
+    # Una escritura como primera sentencia: bloquea la fila en PostgreSQL y
+    # toma el bloqueo de escritura en SQLite, donde select_for_update no hace nada
+    if not ChangeSequence.objects.filter(pk=1).update(value=F('value')):
+        last = ChangeLog.objects.aggregate(last=Max('sequence'))['last']
+        ChangeSequence.objects.create(pk=1, value=last or 0)
+    return ChangeSequence.objects.values_list('value', flat=True).get(pk=1)
+
+
+def number_changes(batch_size=NUMBERING_BATCH_SIZE):
+    """
+    Numerar los cambios confirmados que aún no tienen ``sequence``.
+
+    Solo se ven los cambios ya confirmados, y la numeración se hace de uno en
+    uno con el contador bloqueado, así que cualquier cambio que se confirme
+    después recibirá un número mayor. Devuelve ``True`` si quedan cambios sin
+    numerar (más de ``batch_size``).
+    """
+    pending = ChangeLog.objects.filter(sequence__isnull=True)
+    if not pending.exists():
+        return False
+    with transaction.atomic():
+        last = _lock_sequence()
+        ids = list(pending.order_by('id').values_list('id', flat=True)[:batch_size + 1])
+        if not ids:
+            return False
+        more = len(ids) > batch_size
+        first, ids = ids[0], ids[:batch_size]
+        # Una sola sentencia: id + desplazamiento es único y mayor que ``last``.
+        # Los ids menores que ``first`` que se confirmen ahora quedan para la
+        # siguiente numeración
+        offset = last + 1 - first
+        ChangeLog.objects.filter(
+            sequence__isnull=True, id__gte=first, id__lte=ids[-1]
+        ).update(sequence=F('id') + offset)
+        ChangeSequence.objects.filter(pk=1).update(value=ids[-1] + offset)
+    return more
+
+
+# =============================================================================
+# CURSOR
+# =============================================================================
+
+def encode_cursor(sequence):
+    return signing.dumps([sequence, int(time.time())], salt=CURSOR_SALT)
+
+
+def decode_cursor(cursor):
+    """Posición de la secuencia de un cursor (0 si no hay cursor)."""
+    if not cursor:
+        return 0
+    try:
+        sequence, issued_at = signing.loads(cursor, salt=CURSOR_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        raise InvalidCursor(cursor)
+    # Las lápidas más antiguas que la retención se purgan: un cursor emitido
+    # antes no vería esas bajas
+    if issued_at < time.time() - tombstone_retention_days() * 86400:
+        raise CursorExpired(cursor)
+    return sequence
+
+
+# =============================================================================
+# LECTURA
+# =============================================================================
+
+def collect_changes(since=0, limit=SYNC_PAGE_SIZE, names=None):
+    """
+    Cambios posteriores a la posición ``since``: ``(cambios, posición, hay_más)``.
+
+    Dentro de una página solo cuenta la última operación de cada objeto. Las
+    altas y modificaciones se serializan con una consulta por modelo.
+    """
+    names = [name for name in (names or SYNC_MODELS) if name in SYNC_MODELS]
+    unnumbered = number_changes()
+    entries = list(
+        ChangeLog.objects.filter(sequence__gt=since, model_name__in=names)
+        .order_by('sequence').values_list('sequence', 'model_name', 'object_id', 'operation')[:limit + 1]
+    )
+    has_more = len(entries) > limit or unnumbered
+    entries = entries[:limit]
+
+    latest = {}
+    for _, name, object_id, operation in entries:
+        latest[(name, object_id)] = operation
+
+    changes = {}
+    for name in names:
+        model, serializer_class, related = SYNC_MODELS[name]
+        upserts = [pk for (entry_name, pk), op in latest.items() if entry_name == name and op == 'U']
+        deletes = [pk for (entry_name, pk), op in latest.items() if entry_name == name and op == 'D']
+        objects = list(model.objects.filter(pk__in=upserts).select_related(*related).order_by('pk'))
+        # Un objeto ya borrado cuya baja llega en una página posterior
+        found = {obj.pk for obj in objects}
+        deletes.extend(pk for pk in upserts if pk not in found)
+        changes[name] = {
+            'upserts': serializer_class(objects, many=True).data,
+            'deletes': sorted(deletes),
+        }
+
+    position = entries[-1][0] if entries else since
+    return changes, position, has_more
+
+
+# =============================================================================
+# MANTENIMIENTO
+# =============================================================================
+
+def prune_changelog(retention_days=None):
+    """
+    Compactar la secuencia: borrar las entradas superadas por otra posterior del
+    mismo objeto y las lápidas más antiguas que la retención.
+    """
+    if retention_days is None:
+        retention_days = tombstone_retention_days()
+    superseded = ChangeLog.objects.filter(Exists(
+        ChangeLog.objects.filter(
+            model_name=OuterRef('model_name'), object_id=OuterRef('object_id'), id__gt=OuterRef('id')
+        )
+    ))
+    superseded_count, _ = superseded.delete()
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    tombstones_count, _ = ChangeLog.objects.filter(operation='D', changed_at__lt=cutoff).delete()
+    return superseded_count, tombstones_count
@@ -0,0 +1,252 @@
+"""
+Tabla de cubetas de tokens compartida por todos los procesos del servidor.
+
+Un fichero mapeado en memoria (``mmap``) con una tabla hash de tamaño fijo:
+cada ranura guarda el resumen de la clave, los tokens disponibles, el instante
+de la última actualización y el instante en que la cubeta vuelve a estar llena.
+Todos los workers de gunicorn mapean el mismo fichero, así que el límite es
+exacto entre procesos, y cada consulta cuesta unos microsegundos (sin red ni
+base de datos).
+
+La tabla se divide en franjas de ``STRIPE_SLOTS`` ranuras. Cada clave vive en
+una franja fija, que se bloquea durante la actualización: con ``fcntl``
+(rango de bytes) entre procesos y con un ``threading.Lock`` entre hilos del
+mismo proceso. Una cubeta llena equivale a una ausente, así que las ranuras
+llenas se reutilizan (compactación) cuando la franja se queda sin sitio y en
+un barrido periódico, que avanza una franja por llamada para que ninguna
+petición pague el de toda la tabla. Si todas las cubetas de la franja están activas se
+desaloja la que antes volverá a estar llena: su clave pierde lo consumido,
+pero la nueva sí queda limitada.
+
+Un fichero nuevo o de otra configuración se sustituye por uno preparado
+aparte (``os.replace``), nunca se trunca: los procesos que ya lo tienen
+mapeado siguen con el antiguo en lugar de leer ceros o recibir ``SIGBUS``.
+"""
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: solo exclusión entre hilos
+    fcntl = None
+
+MAGIC = b'TBKT0001'
+HEADER = struct.Struct('<8sII')          # magia, número de ranuras, reservado
+SLOT = struct.Struct('<16sddd')          # clave, tokens, última actualización, llena en
+EMPTY_KEY = bytes(16)
+STRIPE_SLOTS = 64
+
+DEFAULT_SLOTS = 65536
+DEFAULT_COMPACT_INTERVAL = 60
+
+
+def key_digest(key):
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+    return digest if digest != EMPTY_KEY else b'\x01' + digest[1:]
+
+
+class TokenBucketTable:
+    """
+    Cubetas de tokens en ``path``. ``consume(clave, capacidad, periodo)``
+    descuenta un token de una cubeta que se rellena con ``capacidad`` tokens
+    por ``periodo`` segundos.
+    """
+
+    def __init__(self, path, slots=DEFAULT_SLOTS, compact_interval=DEFAULT_COMPACT_INTERVAL):
+        self.path = path
+        self.slots = max(STRIPE_SLOTS, slots - slots % STRIPE_SLOTS)
+        self.stripes = self.slots // STRIPE_SLOTS
+        self.compact_interval = compact_interval
+        self.size = HEADER.size + self.slots * SLOT.size
+        self.stripe_locks = [threading.Lock() for _ in range(self.stripes)]
+        self.last_compaction = time.monotonic()
+        self.sweep_lock = threading.Lock()
+        self.next_stripe = 0  # siguiente franja del barrido en curso
+        self._open()
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        while True:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            self._lock_range(0, HEADER.size)
+            try:
+                # Otro proceso pudo sustituir el fichero mientras se esperaba
+                # el bloqueo: entonces se abre el nuevo
+                current = self._is_current()
+                ready = current and self._has_table()
+                if ready:
+                    self.map = mmap.mmap(self.fd, self.size)
+                elif current:
+                    self._replace_file()  # fichero nuevo o de otra configuración
+            finally:
+                self._unlock_range(0, HEADER.size)
+            if ready:
+                return
+            os.close(self.fd)
+
+    def _is_current(self):
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        opened = os.fstat(self.fd)
+        return (current.st_dev, current.st_ino) == (opened.st_dev, opened.st_ino)
+
+    def _has_table(self):
+        header = os.pread(self.fd, HEADER.size, 0)
+        return (
+            len(header) == HEADER.size and HEADER.unpack(header)[:2] == (MAGIC, self.slots)
+            and os.fstat(self.fd).st_size == self.size
+        )
+
+    def _replace_file(self):
+        """Tabla vacía en un fichero temporal que sustituye de una vez a ``path``."""
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or None, prefix='.throttle-')
+        try:
+            try:
+                os.ftruncate(fd, self.size)
+                os.pwrite(fd, HEADER.pack(MAGIC, self.slots, 0), 0)
+            finally:
+                os.close(fd)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def close(self):
+        self.map.close()
+        os.close(self.fd)
+
+    # -------------------------------------------------------------------------
+    # Bloqueos
+    # -------------------------------------------------------------------------
+
+    def _lock_range(self, start, length):
+        if fcntl is not None:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, length, start, os.SEEK_SET)
+
+    def _unlock_range(self, start, length):
+        if fcntl is not None:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, length, start, os.SEEK_SET)
+
+    def _stripe_bounds(self, stripe):
+        start = HEADER.size + stripe * STRIPE_SLOTS * SLOT.size
+        return start, start + STRIPE_SLOTS * SLOT.size
+
+    # -------------------------------------------------------------------------
+    # Ranuras
+    # -------------------------------------------------------------------------
+
+    def _find(self, digest, start, end):
+        """Offset de la ranura de ``digest`` (o de una libre) en la franja."""
+        position = start
+        while True:
+            position = self.map.find(digest, position, end)
+            if position < 0:
+                return -1
+            if (position - start) % SLOT.size == 0:
+                return position
+            position += 1  # coincidencia no alineada con una ranura
+
+    def _reclaim(self, start, end, now):
+        """Vaciar las ranuras cuyas cubetas ya están llenas; devolver la primera libre."""
+        free = -1
+        for offset in range(start, end, SLOT.size):
+            key, _, _, full_at = SLOT.unpack_from(self.map, offset)
+            if key != EMPTY_KEY and full_at <= now:
+                SLOT.pack_into(self.map, offset, EMPTY_KEY, 0.0, 0.0, 0.0)
+                key = EMPTY_KEY
+            if key == EMPTY_KEY and free < 0:
+                free = offset
+        return free
+
+    def _evict(self, start, end):
+        """Ranura de la cubeta que antes volverá a estar llena."""
+        return min(
+            range(start, end, SLOT.size),
+            key=lambda offset: SLOT.unpack_from(self.map, offset)[3],
+        )
+
+    def consume(self, key, capacity, period, now=None):
+        """Devolver ``(permitido, segundos_de_espera)``."""
+        now = time.time() if now is None else now
+        rate = capacity / period
+        digest = key_digest(key)
+        stripe = int.from_bytes(digest[:4], 'little') % self.stripes
+        start, end = self._stripe_bounds(stripe)
+
+        with self.stripe_locks[stripe]:
+            self._lock_range(start, end - start)
+            try:
+                offset = self._find(digest, start, end)
+                if offset >= 0:
+                    _, tokens, updated, _ = SLOT.unpack_from(self.map, offset)
+                    tokens = min(capacity, tokens + (now - updated) * rate)
+                else:
+                    offset = self._find(EMPTY_KEY, start, end)
+                    if offset < 0:
+                        offset = self._reclaim(start, end, now)
+                    if offset < 0:
+                        offset = self._evict(start, end)  # franja llena de cubetas activas
+                    tokens = float(capacity)
+
+                allowed = tokens >= 1
+                if allowed:
+                    tokens -= 1
+                full_at = now + (capacity - tokens) / rate
+                SLOT.pack_into(self.map, offset, digest, tokens, now, full_at)
+            finally:
+                self._unlock_range(start, end - start)
+
+        self.maybe_compact()
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+    def compact_stripe(self, stripe, now=None):
+        """Vaciar en una franja las ranuras de cubetas ya llenas."""
+        now = time.time() if now is None else now
+        start, end = self._stripe_bounds(stripe)
+        with self.stripe_locks[stripe]:
+            self._lock_range(start, end - start)
+            try:
+                self._reclaim(start, end, now)
+            finally:
+                self._unlock_range(start, end - start)
+
+    def compact(self, now=None):
+        """Vaciar en toda la tabla las ranuras de cubetas ya llenas."""
+        for stripe in range(self.stripes):
+            self.compact_stripe(stripe, now)
+        self.last_compaction = time.monotonic()
+
+    def maybe_compact(self):
+        """
+        Barrido periódico por partes: cada ``compact_interval`` segundos se
+        recorre la tabla, una franja en cada llamada.
+        """
+        if not self.compact_interval:
+            return
+        if self.next_stripe == 0 and time.monotonic() - self.last_compaction < self.compact_interval:
+            return
+        if not self.sweep_lock.acquire(blocking=False):
+            return  # otro hilo avanza el barrido
+        try:
+            stripe = self.next_stripe
+            self.next_stripe = (stripe + 1) % self.stripes
+            if self.next_stripe == 0:
+                self.last_compaction = time.monotonic()
+        finally:
+            self.sweep_lock.release()
+        self.compact_stripe(stripe)
+
+    def active_buckets(self):
+        return sum(
+            1 for offset in range(HEADER.size, self.size, SLOT.size)
+            if self.map[offset:offset + 16] != EMPTY_KEY
+        )
@@ -0,0 +1,135 @@
+"""
+Calentamiento del proceso antes de atender peticiones.
+
+Con ``preload_app`` gunicorn carga la aplicación en el proceso maestro y los
+workers la heredan con ``fork``, compartiendo la memoria (copy-on-write)
+mientras no se escriba en ella. ``warm_up`` hace en el maestro, una vez por
+despliegue, lo que de otro modo pagaría la primera petición de cada worker:
+
+- compilar todas las plantillas (el cargador con caché las guarda ya
+  compiladas);
+- poblar el resolvedor de URLs, que importa todas las vistas;
+- leer de la caché compartida las generaciones de todas las tablas;
+- servir una vez las páginas de ``WARMUP_PAGES`` (dashboard y listados) como
+  un administrador y sin sesión: deja en la caché del proceso los conteos de
+  los paginadores e inicializa el resto de estructuras perezosas de Django y
+  de la aplicación.
+
+Ver ``config/gunicorn.conf.py``.
+"""
+import logging
+import os
+import time
+from functools import partial
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.test import RequestFactory
+from django.urls import get_resolver, resolve, reverse
+from django.utils.functional import SimpleLazyObject
+
+from .counting import get_table_generations
+from .profiles import resolve_company_user
+
+logger = logging.getLogger(__name__)
+
+WARMUP_PAGES = ('dashboard', 'equipment_list', 'support_ticket_list')
+
+TEMPLATE_EXTENSIONS = ('.html', '.txt', '.xml')
+
+
+def template_names(engine):
+    """Nombres de todas las plantillas que encuentran los cargadores del motor."""
+    names = set()
+    for loader in engine.template_loaders:
+        for inner in getattr(loader, 'loaders', [loader]):  # cached.Loader envuelve a los demás
+            for directory in inner.get_dirs():
+                for root, _, files in os.walk(directory):
+                    for filename in files:
+                        if filename.endswith(TEMPLATE_EXTENSIONS):
+                            names.add(os.path.relpath(os.path.join(root, filename), directory))
+    return sorted(names)
+
+
+def compile_templates():
+    """Compilar todas las plantillas; devuelve ``(compiladas, con errores)``."""
+    compiled = failed = 0
+    for backend in engines.all():
+        engine = getattr(backend, 'engine', None)
+        if engine is None:
+            continue  # otros motores (Jinja2) compilan a su manera
+        for name in template_names(engine):
+            try:
+                engine.get_template(name)
+                compiled += 1
+            except (TemplateDoesNotExist, TemplateSyntaxError):
+                failed += 1  # fragmentos o plantillas de apps no instaladas
+    return compiled, failed
+
+
+def populate_urls():
+    resolver = get_resolver()
+    resolver.reverse_dict  # noqa: B018 - puebla el resolvedor e importa las vistas
+    return len(resolver.reverse_dict)
+
+
+def prime_generations():
+    """Generaciones de todas las tablas de la aplicación en la caché compartida."""
+    tables = [model._meta.db_table for model in apps.get_app_config('inventory_app').get_models()]
+    get_table_generations(tables)
+    return len(tables)
+
+
+def warmup_user():
+    User = get_user_model()
+    return User.objects.filter(is_active=True, is_superuser=True).order_by('pk').first()
+
+
+def render_pages(user, pages=WARMUP_PAGES):
+    """
+    Servir cada página directamente con su vista: sin middlewares, así que
+    no se crea sesión ni se registran métricas. Devuelve las que respondieron 200.
+    """
+    factory = RequestFactory()
+    served = []
+    for name in pages:
+        request = factory.get(reverse(name))
+        request.user = user
+        request.company_user = SimpleLazyObject(partial(resolve_company_user, request))
+        match = resolve(request.path_info)
+        request.resolver_match = match
+        response = match.func(request, *match.args, **match.kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        if response.status_code == 200:
+            served.append(name)
+    return served
+
+
+def warm_up():
+    """Calentar el proceso; los fallos se registran, nunca impiden arrancar."""
+    started = time.perf_counter()
+    summary = {}
+    steps = (
+        ('templates', compile_templates),
+        ('urls', populate_urls),
+        ('generations', prime_generations),
+    )
+    for name, step in steps:
+        try:
+            summary[name] = step()
+        except Exception:
+            logger.exception('Calentamiento: falló el paso %s', name)
+    try:
+        user = warmup_user()
+        summary['pages'] = render_pages(user) if user is not None else []
+    except Exception:
+        logger.exception('Calentamiento: falló el paso pages')
+    finally:
+        # El maestro no debe pasar conexiones abiertas a los workers
+        connections.close_all()
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+    logger.info('Calentamiento completado: %s', summary)
+    return summary
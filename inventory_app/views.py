@@ -2,38 +2,34 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, HttpResponseForbidden
 from django.db import models
 from django.db.models import Q, Count, Sum
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
 from datetime import timedelta
+from django.views.decorators.http import require_safe
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
 from .models import Equipment, MaintenanceLog, CompanyUser, AuditLog, SupportTicket
 from .forms import EquipmentForm, MaintenanceForm, UserRegistrationForm, SupportTicketForm, SupportTicketUpdateForm
+from .utils.counting import EstimatedCountListMixin
+from .utils.facets import facet_values
+from .utils.file_serving import serve_file
+from .utils.fast_json import FastJsonResponse
+from .utils.locations import subtree_q
+from .utils.query_budget import query_budget
+from .utils import dashboard as dashboard_data
+from .utils import metrics as metrics_utils
 from django.http import HttpResponse
+import logging
 import os
 import zipfile
 from datetime import datetime
 from django.conf import settings
 
-# Función helper para obtener o crear CompanyUser
-def get_or_create_companyuser(user):
-    """
-    Obtener el CompanyUser asociado a un usuario, o crearlo si no existe
-    """
-    try:
-        return user.companyuser
-    except CompanyUser.DoesNotExist:
-        # Crear un CompanyUser por defecto
-        company_user = CompanyUser.objects.create(
-            user=user,
-            department='IT',
-            phone='000-000-0000',
-            email=f'{user.username}@tuempresa.com'
-        )
-        return company_user
-    
+logger = logging.getLogger(__name__)
+
 def is_admin(user):
     return user.is_superuser or user.is_staff
 
@@ -46,6 +42,7 @@ def get_client_ip(request):
     return ip
 
 @login_required
+@query_budget(max_queries=15)
 def dashboard(request):
     # Estadísticas en tiempo real
     total_equipment = Equipment.objects.count()
@@ -121,110 +118,52 @@ def dashboard(request):
 @login_required
 def dashboard_stats_api(request):
     """
-    API para obtener estadísticas actualizadas del dashboard
+    API para obtener estadísticas actualizadas del dashboard (una consulta por
+    tabla con conteos condicionales). Con ASGI la sirve
+    ``async_views.dashboard_stats_api``
     """
-    stats = {
-        'equipment': {
-            'total': Equipment.objects.count(),
-            'available': Equipment.objects.filter(status='AVA').count(),
-            'in_use': Equipment.objects.filter(status='INU').count(),
-            'in_repair': Equipment.objects.filter(status='REP').count(),
-        },
-        'tickets': {
-            'open': SupportTicket.objects.filter(status='OPEN').count(),
-            'in_progress': SupportTicket.objects.filter(status='IN_PROGRESS').count(),
-            'critical': SupportTicket.objects.filter(priority='CRITICAL', status__in=['OPEN', 'IN_PROGRESS']).count(),
-        },
-        'alerts': {
-            'warranty_expiring': Equipment.objects.filter(
-                warranty_expiry__isnull=False,
-                warranty_expiry__range=[timezone.now().date(), timezone.now().date() + timedelta(days=30)]
-            ).count(),
-            'maintenance_pending': MaintenanceLog.objects.filter(end_date__isnull=True).count(),
-        },
-        'timestamp': timezone.now().isoformat()
-    }
-    return JsonResponse(stats)
+    equipment = Equipment.objects.aggregate(**dashboard_data.equipment_aggregates())
+    tickets = SupportTicket.objects.aggregate(**dashboard_data.ticket_aggregates())
+    return FastJsonResponse(dashboard_data.stats_payload(
+        equipment, tickets, dashboard_data.pending_maintenance().count()
+    ))
 
 @login_required
 def equipment_chart_data_api(request):
     """
-    API para datos de gráficos de equipos (CORREGIDO)
+    API para datos de gráficos de equipos
     """
-    equipment_by_type = list(Equipment.objects.values('type').annotate(
-        count=Count('id')
-    ).order_by('-count'))
-    
-    type_display_map = dict(Equipment.EQUIPMENT_TYPES)
-    for item in equipment_by_type:
-        item['label'] = type_display_map.get(item['type'], item['type'])
-    
-    equipment_by_status = list(Equipment.objects.values('status').annotate(
-        count=Count('id')
-    ).order_by('-count'))
-    
-    status_display_map = dict(Equipment.STATUS_CHOICES)
-    for item in equipment_by_status:
-        item['label'] = status_display_map.get(item['status'], item['status'])
-    
-    return JsonResponse({
-        'by_type': equipment_by_type,
-        'by_status': equipment_by_status
-    })
+    return FastJsonResponse(dashboard_data.chart_payload(
+        list(dashboard_data.equipment_by('type')), list(dashboard_data.equipment_by('status'))
+    ))
 
 @login_required
 def recent_activity_api(request):
     """
-    API para actividad reciente (CORREGIDO - alternativa sin models.F)
+    API para actividad reciente
     """
-    # Usar una alternativa a models.F para evitar el error
-    recent_maintenance = []
-    maintenance_logs = MaintenanceLog.objects.select_related('equipment', 'technician').order_by('-start_date')[:5]
-    
-    for maintenance in maintenance_logs:
-        recent_maintenance.append({
-            'id': maintenance.id,
-            'title': maintenance.title,
-            'start_date': maintenance.start_date.isoformat(),
-            'maintenance_type': maintenance.maintenance_type,
-            'equipment_brand': maintenance.equipment.brand if maintenance.equipment else 'N/A',
-            'equipment_model': maintenance.equipment.model if maintenance.equipment else 'N/A',
-            'technician_name': maintenance.technician.user.get_full_name() if maintenance.technician else 'N/A'
-        })
-    
-    recent_tickets = []
-    tickets = SupportTicket.objects.select_related('created_by', 'equipment').order_by('-created_at')[:5]
-    
-    for ticket in tickets:
-        recent_tickets.append({
-            'id': ticket.id,
-            'title': ticket.title,
-            'created_at': ticket.created_at.isoformat(),
-            'priority': ticket.priority,
-            'status': ticket.status,
-            'created_by_name': ticket.created_by.user.get_full_name() if ticket.created_by else 'N/A',
-            'equipment_model': ticket.equipment.model if ticket.equipment else 'N/A'
-        })
-    
-    return JsonResponse({
-        'maintenance': recent_maintenance,
-        'tickets': recent_tickets
+    return FastJsonResponse({
+        'maintenance': [dashboard_data.maintenance_item(m) for m in dashboard_data.recent_maintenance()],
+        'tickets': [dashboard_data.ticket_item(t) for t in dashboard_data.recent_tickets()]
     })
     
-class EquipmentListView(LoginRequiredMixin, ListView):
+@query_budget(max_queries=12)
+class EquipmentListView(LoginRequiredMixin, EstimatedCountListMixin, ListView):
     model = Equipment
     template_name = 'equipment_list.html'
     context_object_name = 'equipment_list'
     paginate_by = 20
     
     def get_queryset(self):
-        queryset = super().get_queryset().select_related('assigned_to')
+        # La plantilla muestra el nombre del usuario asignado
+        queryset = super().get_queryset().select_related('assigned_to__user')
         
         # Filtros
         query = self.request.GET.get('q')
         status_filter = self.request.GET.get('status')
         type_filter = self.request.GET.get('type')
         location_filter = self.request.GET.get('location')
+        location_path = self.request.GET.get('location_path')
         
         if query:
             queryset = queryset.filter(
@@ -243,6 +182,10 @@ class EquipmentListView(LoginRequiredMixin, ListView):
         if location_filter:
             queryset = queryset.filter(location__icontains=location_filter)
         
+        if location_path:
+            # Todo el subárbol (p. ej. un edificio completo) con un rango indexado
+            queryset = queryset.filter(subtree_q(location_path))
+        
         return queryset
     
     def get_context_data(self, **kwargs):
@@ -251,6 +194,12 @@ class EquipmentListView(LoginRequiredMixin, ListView):
         context['status_filter'] = self.request.GET.get('status', '')
         context['type_filter'] = self.request.GET.get('type', '')
         context['location_filter'] = self.request.GET.get('location', '')
+        context['location_options'] = [value for value, _ in facet_values(Equipment, 'location')]
+
+        # Rango de páginas resumido: con conteos estimados puede haber miles de páginas
+        page_obj = context.get('page_obj')
+        if page_obj is not None:
+            context['page_range'] = page_obj.paginator.get_elided_page_range(page_obj.number)
         return context
 
 class EquipmentDetailView(LoginRequiredMixin, DetailView):
@@ -280,7 +229,7 @@ class EquipmentCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
         response = super().form_valid(form)
         
         # Obtener o crear CompanyUser para el usuario actual
-        company_user = get_or_create_companyuser(self.request.user)
+        company_user = self.request.company_user
         
         # Registrar en auditoría
         AuditLog.objects.create(
@@ -314,7 +263,7 @@ class EquipmentUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         response = super().form_valid(form)
         
         # Obtener o crear CompanyUser para el usuario actual
-        company_user = get_or_create_companyuser(self.request.user)
+        company_user = self.request.company_user
         
         # Registrar en auditoría
         AuditLog.objects.create(
@@ -342,7 +291,7 @@ def equipment_delete(request, pk):
     equipment = get_object_or_404(Equipment, pk=pk)
     if request.method == 'POST':
         # Obtener o crear CompanyUser para el usuario actual
-        company_user = get_or_create_companyuser(request.user)
+        company_user = request.company_user
         
         # Registrar en auditoría antes de eliminar
         AuditLog.objects.create(
@@ -369,8 +318,8 @@ def maintenance_create(request, equipment_id):
             maintenance = form.save(commit=False)
             maintenance.equipment = equipment
             
-            # CORREGIDO: Usar la función helper
-            company_user = get_or_create_companyuser(request.user)
+            # Perfil del usuario actual (se crea si no existe)
+            company_user = request.company_user
             maintenance.technician = company_user
             
             maintenance.save()
@@ -456,7 +405,7 @@ def reports_dashboard(request):
 @login_required
 def equipment_stats_api(request):
     stats = Equipment.objects.values('type').annotate(count=Count('id'))
-    return JsonResponse(list(stats), safe=False)
+    return FastJsonResponse(list(stats), safe=False)
 
 @login_required
 def maintenance_stats_api(request):
@@ -466,7 +415,7 @@ def maintenance_stats_api(request):
     ).values('start_date__month').annotate(total_cost=Sum('cost')).order_by('start_date__month')
     
     data = [{'month': item['start_date__month'], 'cost': float(item['total_cost'] or 0)} for item in stats]
-    return JsonResponse(data, safe=False)
+    return FastJsonResponse(data, safe=False)
 
 # Support Ticket Views
 @login_required
@@ -496,7 +445,7 @@ def support_ticket_create(request):
             ticket = form.save(commit=False)
             
             # Obtener o crear CompanyUser para el usuario actual
-            company_user = get_or_create_companyuser(request.user)
+            company_user = request.company_user
             ticket.created_by = company_user
             
             ticket.save()
@@ -530,7 +479,7 @@ def support_ticket_detail(request, pk):
             
             # Registrar en auditoría
             AuditLog.objects.create(
-                user=request.user.companyuser,
+                user=request.company_user,
                 action='UPD',
                 model_name='SupportTicket',
                 object_id=ticket.id,
@@ -560,7 +509,7 @@ def support_ticket_update(request, pk):
             form.save()
             
             # Obtener o crear CompanyUser para el usuario actual
-            company_user = get_or_create_companyuser(request.user)
+            company_user = request.company_user
             
             # Registrar en auditoría
             AuditLog.objects.create(
@@ -576,6 +525,31 @@ def support_ticket_update(request, pk):
     
     return redirect('support_ticket_detail', pk=ticket.pk)
 
+def metrics(request):
+    """
+    Métricas de todas las peticiones en formato Prometheus. Solo para
+    administradores o con ``Authorization: Bearer <METRICS_TOKEN>``.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    allowed = bool(token) and constant_time_compare(authorization, f'Bearer {token}')
+    if not allowed and not is_admin(request.user):
+        return HttpResponseForbidden('Solo administradores')
+    
+    return HttpResponse(
+        metrics_utils.render_prometheus(metrics_utils.collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+@require_safe
+def media(request, path):
+    """
+    Ficheros subidos (MEDIA_ROOT), públicos como cuando los servía WhiteNoise
+    pero sin indexar el directorio al arrancar: en streaming, con Range y, si
+    está configurado SENDFILE_BACKEND, enviados por el servidor web.
+    """
+    return serve_file(request, settings.MEDIA_ROOT, path, accel_prefix=settings.MEDIA_ACCEL_PREFIX)
+
 @login_required
 @user_passes_test(is_admin)
 def backup_database(request):
@@ -587,14 +561,14 @@ def backup_database(request):
             # Crear directorio de backups si no existe
             if not os.path.exists(settings.BACKUP_PATH):
                 os.makedirs(settings.BACKUP_PATH)
-                print(f"Directorio de backups creado: {settings.BACKUP_PATH}")
+                logger.info("Directorio de backups creado: %s", settings.BACKUP_PATH)
             
             # Nombre del archivo de backup
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             backup_filename = f"backup_{timestamp}.zip"
             backup_path = os.path.join(settings.BACKUP_PATH, backup_filename)
             
-            print(f"Creando backup en: {backup_path}")
+            logger.info("Creando backup en: %s", backup_path)
             
             # Crear archivo ZIP
             with zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
@@ -603,9 +577,9 @@ def backup_database(request):
                 if os.path.exists(db_path):
                     # Usar el nombre de archivo correcto para la base de datos
                     zipf.write(db_path, 'db.sqlite3')
-                    print(f"Base de datos agregada al backup: {db_path}")
+                    logger.info("Base de datos agregada al backup: %s", db_path)
                 else:
-                    print(f"Advertencia: No se encontró la base de datos en {db_path}")
+                    logger.warning("No se encontró la base de datos en %s", db_path)
                 
                 # Backup de archivos media si existen
                 if hasattr(settings, 'MEDIA_ROOT') and os.path.exists(settings.MEDIA_ROOT):
@@ -615,23 +589,21 @@ def backup_database(request):
                             # Crear una ruta relativa para el archivo en el ZIP
                             arcname = os.path.join('media', os.path.relpath(file_path, settings.MEDIA_ROOT))
                             zipf.write(file_path, arcname)
-                    print("Archivos media agregados al backup")
+                    logger.info("Archivos media agregados al backup")
             
             # Verificar que el backup se creó correctamente
             if os.path.exists(backup_path):
                 file_size = os.path.getsize(backup_path)
                 messages.success(request, f'Backup creado exitosamente: {backup_filename} ({file_size} bytes)')
-                print(f"Backup creado exitosamente: {backup_path} ({file_size} bytes)")
+                logger.info("Backup creado exitosamente: %s (%d bytes)", backup_path, file_size)
             else:
                 messages.error(request, 'Error: El archivo de backup no se creó')
-                print("Error: El archivo de backup no se creó")
+                logger.error("El archivo de backup no se creó: %s", backup_path)
             
         except Exception as e:
             error_msg = f'Error al crear backup: {str(e)}'
             messages.error(request, error_msg)
-            print(f"Error en backup: {error_msg}")
-            import traceback
-            print(traceback.format_exc())
+            logger.exception("Error en backup")
     
     # Redirigir de vuelta a la página de reportes
     return redirect('reports_dashboard')
@@ -697,11 +669,12 @@ def download_backup(request, filename):
             messages.error(request, f'Backup no encontrado: {filename}')
             return redirect('backup_list')
         
-        # Crear respuesta de descarga
-        with open(backup_path, 'rb') as f:
-            response = HttpResponse(f.read(), content_type='application/zip')
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-            return response
+        # En streaming (los backups crecen con la base de datos y los media) y
+        # reanudable con Range
+        return serve_file(
+            request, settings.BACKUP_PATH, filename, accel_prefix=settings.BACKUP_ACCEL_PREFIX,
+            as_attachment=True, content_type='application/zip',
+        )
             
     except Exception as e:
         messages.error(request, f'Error al descargar backup: {str(e)}')
@@ -735,22 +708,6 @@ def delete_backup(request, filename):
     
     return redirect('backup_list')
 
-def get_or_create_companyuser(user):
-    """
-    Obtener el CompanyUser asociado a un usuario, o crearlo si no existe
-    """
-    try:
-        return user.companyuser
-    except CompanyUser.DoesNotExist:
-        # Crear un CompanyUser por defecto
-        company_user = CompanyUser.objects.create(
-            user=user,
-            department='IT',  # Departamento por defecto
-            phone='000-000-0000',  # Teléfono por defecto
-            email=f'{user.username}@tuempresa.com'  # Email por defecto
-        )
-        return company_user
-    
 def register(request):
     """
     Vista para registro de nuevos usuarios
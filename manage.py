@@ -5,8 +5,9 @@ import sys
 
 def main():
     """Run administrative tasks."""
-    # Establece el módulo de configuración por defecto
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    # Establece el módulo de configuración por defecto (los tests, con el suyo)
+    default_settings = 'config.test_settings' if sys.argv[1:2] == ['test'] else 'config.settings'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', default_settings)
     
     try:
         from django.core.management import execute_from_command_line